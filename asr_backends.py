@@ -0,0 +1,251 @@
+"""
+ASR backends.
+
+Every engine takes 16 kHz mono float32 audio and returns text, so the
+scheduler, the worker pool and the server can switch engines from
+settings.json without code changes. The text is a Transcript, a str that
+also carries the language it was decoded in and how confident the engine
+was:
+
+    "asr_backend": "whisper"          reference openai-whisper (PyTorch, fp32 on CPU)
+    "asr_backend": "faster-whisper"   CTranslate2 engine, int8 on CPU by default
+
+New engines are added with register_backend().
+"""
+import os
+
+from json_handle import read_settings
+
+# Same thresholds whisper.transcribe uses to blank out non-speech segments
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+class Transcript(str):
+    """
+    Recognized text plus decoding metadata. Behaves exactly like the text.
+
+    Attributes:
+        language (str): Language the clip was decoded in (detected or forced)
+        language_probability (float): Detection confidence, None when the language was forced
+        avg_logprob (float): Mean token log probability, None if unknown
+        segments (tuple): (text, avg_logprob) per decoded segment; a single-window
+            decode is one segment holding the whole text
+    """
+
+    def __new__(cls, text, language=None, language_probability=None, avg_logprob=None, segments=None):
+        transcript = super().__new__(cls, text)
+        transcript.language = language
+        transcript.language_probability = language_probability
+        transcript.avg_logprob = avg_logprob
+        if segments is None:
+            segments = ((text, avg_logprob),) if text else ()
+        transcript.segments = tuple(segments)
+        return transcript
+
+    def __reduce__(self):
+        # Keep the metadata when results cross process boundaries (ASR worker pool)
+        return (Transcript, (str(self), self.language, self.language_probability, self.avg_logprob, self.segments))
+
+
+class ASRBackend:
+    name = "base"
+    supports_batching = False
+
+    def __init__(self, model="base", beam_size=1, threads=0, compute_type="default", device=None):
+        """
+        Load an ASR model.
+
+        Args:
+            model (str): Model name or path
+            beam_size (int): Beam width, 1 for greedy decoding
+            threads (int): CPU threads for inference, 0 lets the engine decide
+            compute_type (str): Numeric precision (engine specific, e.g. int8, float16)
+            device (str): Device to run on, None lets the engine decide
+        """
+        self.model_name = model
+        self.beam_size = beam_size
+        self.threads = threads
+        self.compute_type = compute_type
+        self.device = device
+
+    def transcribe(self, audio, language=None):
+        """
+        Transcribe one clip.
+
+        Args:
+            audio (np.ndarray): 16 kHz mono float32 samples
+            language (str): Language code, None to detect it
+
+        Returns:
+            Transcript: The recognized text (empty if no speech)
+        """
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios, language=None):
+        """Transcribe several clips; engines that can batch override this."""
+        return [self.transcribe(audio, language) for audio in audios]
+
+    def describe(self):
+        return f"{self.name} '{self.model_name}' ({self.compute_type}, beam {self.beam_size})"
+
+
+class WhisperBackend(ASRBackend):
+    name = "whisper"
+    supports_batching = True
+
+    def __init__(self, model="base", beam_size=1, threads=0, compute_type="default", device=None):
+        super().__init__(model, beam_size, threads, compute_type, device)
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model, device=device)
+        self.fp16 = self.model.device.type == "cuda" and compute_type != "float32"
+        self.compute_type = "float16" if self.fp16 else "float32"
+
+    def _beam_options(self):
+        return {"beam_size": self.beam_size} if self.beam_size > 1 else {}
+
+    def transcribe(self, audio, language=None):
+        result = self.model.transcribe(audio, language=language, fp16=self.fp16, **self._beam_options())
+        segments = result.get("segments") or []
+        avg_logprob = sum(segment["avg_logprob"] for segment in segments) / len(segments) if segments else None
+        return Transcript(
+            result["text"].strip(),
+            result.get("language") or language,
+            None,
+            avg_logprob,
+            [(segment["text"].strip(), segment["avg_logprob"]) for segment in segments if segment["text"].strip()]
+        )
+
+    def transcribe_batch(self, audios, language=None):
+        """Pad clips to Whisper's 30 s window and decode them in one forward pass."""
+        import torch
+        import whisper
+
+        texts = [None] * len(audios)
+        short = []
+        for index, audio in enumerate(audios):
+            # Clips longer than one window need the full sliding-window transcribe
+            if len(audio) > whisper.audio.N_SAMPLES:
+                texts[index] = self.transcribe(audio, language)
+            else:
+                short.append(index)
+        if not short:
+            return texts
+
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(audios[index])),
+                n_mels=self.model.dims.n_mels
+            )
+            for index in short
+        ]).to(self.model.device)
+
+        options = whisper.DecodingOptions(
+            language=language, fp16=self.fp16, without_timestamps=True, **self._beam_options()
+        )
+        results = whisper.decode(self.model, mels, options)
+
+        for index, result in zip(short, results):
+            # language_probs is only filled in when Whisper had to detect the language
+            probability = result.language_probs.get(result.language) if result.language_probs else None
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                text = ""
+            else:
+                text = result.text.strip()
+            texts[index] = Transcript(text, result.language, probability, result.avg_logprob)
+        return texts
+
+
+class FasterWhisperBackend(ASRBackend):
+    name = "faster-whisper"
+
+    def __init__(self, model="base", beam_size=1, threads=0, compute_type="int8", device=None):
+        if compute_type == "default":
+            compute_type = "int8"
+        super().__init__(model, beam_size, threads, compute_type, device)
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            model,
+            device=device or "cpu",
+            compute_type=compute_type,
+            cpu_threads=threads,
+        )
+
+    def transcribe(self, audio, language=None):
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=self.beam_size,
+            no_speech_threshold=NO_SPEECH_THRESHOLD,
+            log_prob_threshold=LOGPROB_THRESHOLD,
+            condition_on_previous_text=False,
+        )
+        # segments is a generator; decoding happens while it is consumed
+        segments = list(segments)
+        avg_logprob = sum(segment.avg_logprob for segment in segments) / len(segments) if segments else None
+        return Transcript(
+            "".join(segment.text for segment in segments).strip(),
+            info.language,
+            None if language else info.language_probability,
+            avg_logprob,
+            [(segment.text.strip(), segment.avg_logprob) for segment in segments if segment.text.strip()]
+        )
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def register_backend(name, backend_class):
+    """Make an ASRBackend subclass selectable by name in settings.json."""
+    BACKENDS[name] = backend_class
+
+
+def backend_options():
+    """ASR backend selection and tuning read from settings.json."""
+    return {
+        "backend": read_settings("asr_backend"),
+        "beam_size": read_settings("asr_beam_size"),
+        "threads": read_settings("asr_threads"),
+        "compute_type": read_settings("asr_compute_type"),
+    }
+
+
+def create_backend(model="base", backend=None, beam_size=None, threads=None, compute_type=None, device=None):
+    """
+    Build the configured ASR backend. Arguments left as None come from settings.json.
+
+    Args:
+        model (str): Model name, e.g. tiny, base, small
+        backend (str): Backend name, see BACKENDS
+        beam_size (int): Beam width
+        threads (int): CPU threads, 0 = engine default
+        compute_type (str): Precision, e.g. int8, int8_float32, float32, default
+        device (str): Device, None lets the engine decide
+
+    Returns:
+        ASRBackend: Loaded backend
+    """
+    settings = backend_options()
+    backend = backend or settings["backend"]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend}'. Available: {', '.join(BACKENDS)}")
+
+    threads = settings["threads"] if threads is None else threads
+    if threads == "auto":
+        threads = os.cpu_count() or 0
+
+    return BACKENDS[backend](
+        model=model,
+        beam_size=settings["beam_size"] if beam_size is None else beam_size,
+        threads=int(threads),
+        compute_type=settings["compute_type"] if compute_type is None else compute_type,
+        device=device,
+    )
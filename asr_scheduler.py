@@ -0,0 +1,198 @@
+"""
+Dynamic batching scheduler for ASR inference.
+
+Clips submitted from several callers (wake-word windows, command recordings,
+server sessions) are collected for a short window, padded to Whisper's 30 s
+input and decoded in a single forward pass. Each caller gets its own result
+back through a future. Backends that cannot batch get the clips one by one.
+Other work that needs the loaded model (wake-word scoring) is queued with
+run() and executed on the same thread between batches, so the model is
+never used from two threads at once.
+"""
+import concurrent.futures
+import queue
+import threading
+import time
+
+from asr_backends import create_backend
+from json_handle import read_settings
+
+SAMPLE_RATE = 16000
+
+
+class _Request:
+    __slots__ = ("audio", "language", "future", "submitted_at")
+
+    def __init__(self, audio, language):
+        self.audio = audio
+        self.language = language
+        self.future = concurrent.futures.Future()
+        self.submitted_at = time.perf_counter()
+
+
+class _Call:
+    __slots__ = ("function", "future")
+
+    def __init__(self, function):
+        self.function = function
+        self.future = concurrent.futures.Future()
+
+
+class WhisperBatchScheduler:
+    def __init__(self, model="base", batch_window_ms=30, max_batch_size=8, device=None, backend=None):
+        """
+        Collect pending clips and run them through the ASR backend as one batch.
+
+        Args:
+            model (str): Whisper model name
+            batch_window_ms (float): How long to wait for more clips after the first arrives
+            max_batch_size (int): Upper bound on clips decoded together
+            device (str): Torch device, None lets the backend choose
+            backend (str): ASR backend name, None uses "asr_backend" from settings.json
+        """
+        self.model_name = model
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.device = device
+        self.backend_name = backend
+
+        self.backend = None
+        self.requests = queue.Queue()
+        self.stats = {"batches": 0, "clips": 0, "max_batch": 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """Number of clips waiting to be decoded."""
+        return self.requests.qsize()
+
+    def submit(self, audio, language=None):
+        """
+        Queue a clip for recognition.
+
+        Args:
+            audio (np.ndarray): 16 kHz mono float32 samples
+            language (str): Language code, None to let Whisper detect it
+
+        Returns:
+            concurrent.futures.Future: Resolves to the transcript string
+        """
+        self._ensure_worker()
+        request = _Request(audio, language)
+        self.requests.put(request)
+        return request.future
+
+    def transcribe(self, audio, language=None, timeout=None):
+        """Blocking helper: submit a clip and wait for its transcript."""
+        return self.submit(audio, language).result(timeout=timeout)
+
+    def run(self, function):
+        """
+        Run function(backend) on the scheduler thread, between batches.
+
+        Args:
+            function (callable): Receives the loaded ASRBackend
+
+        Returns:
+            concurrent.futures.Future: Resolves to the function's return value
+        """
+        self._ensure_worker()
+        call = _Call(function)
+        self.requests.put(call)
+        return call.future
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name=f"asr-{self.model_name}", daemon=True)
+                self._thread.start()
+
+    def _load_model(self):
+        self.backend = create_backend(self.model_name, backend=self.backend_name, device=self.device)
+        if not self.backend.supports_batching:
+            # Nothing to gain from waiting for company
+            self.batch_window = 0.0
+            self.max_batch_size = 1
+        print(f"ASR backend ready: {self.backend.describe()}")
+
+    def _collect_batch(self):
+        """Block for the first clip, then gather more until the window closes or the batch is full."""
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        try:
+            self._load_model()
+        except Exception as e:
+            print(f"❌ Could not load ASR model '{self.model_name}': {e}")
+            # Fail everything that is (or will be) waiting instead of hanging callers
+            while True:
+                request = self.requests.get()
+                request.future.set_exception(e)
+
+        while True:
+            batch = self._collect_batch()
+            calls = [request for request in batch if isinstance(request, _Call)]
+            for call in calls:
+                try:
+                    call.future.set_result(call.function(self.backend))
+                except Exception as e:
+                    call.future.set_exception(e)
+            batch = [request for request in batch if not isinstance(request, _Call)]
+            if not batch:
+                continue
+
+            # Decoding options are shared by a batch, so split by requested language
+            by_language = {}
+            for request in batch:
+                by_language.setdefault(request.language, []).append(request)
+            for language, requests in by_language.items():
+                try:
+                    self._run_batch(requests, language)
+                except Exception as e:
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+
+            self.stats["batches"] += 1
+            self.stats["clips"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+    def _run_batch(self, requests, language):
+        texts = self.backend.transcribe_batch([request.audio for request in requests], language)
+        for request, text in zip(requests, texts):
+            request.future.set_result(text)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model="base"):
+    """
+    Shared scheduler for a Whisper model, configured from settings.json.
+
+    Args:
+        model (str): Whisper model name
+
+    Returns:
+        WhisperBatchScheduler: One instance per model name per process
+    """
+    with _schedulers_lock:
+        if model not in _schedulers:
+            _schedulers[model] = WhisperBatchScheduler(
+                model=model,
+                batch_window_ms=read_settings("asr_batch_window_ms"),
+                max_batch_size=read_settings("asr_max_batch_size")
+            )
+        return _schedulers[model]
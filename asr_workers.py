@@ -0,0 +1,444 @@
+"""
+Process-pool ASR workers.
+
+ASR decoding runs in separate processes so it never competes with the
+GIL-bound capture, playback and asyncio loop in the main process. Each
+worker keeps its model resident. Audio is handed over through a
+preallocated multiprocessing.shared_memory block split into fixed slots:
+the caller writes float32 samples into a free slot and only the slot index
+travels over the job queue, so no AudioData/WAV bytes are pickled.
+Transcripts come back on a result queue. Wake-word scoring jobs (see
+wake_verifier.py) run on the same resident models.
+
+Each worker has its own job queue and the parent records which worker a
+job was handed to before queueing it, so when a worker dies every job it
+held is known and goes to another worker. A worker reports "ready" once
+its model is loaded, or why loading failed. Dead workers are restarted
+with back-off; when none of them can load the model the pool gives up and
+fails every queued clip with the load error. A clip that is not back by
+its deadline fails, and the worker stuck on it is restarted.
+"""
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from json_handle import read_settings
+
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = np.dtype(np.float32).itemsize
+
+
+def _worker_main(worker_id, model_name, backend, shm_name, slot_samples, jobs, results):
+    """Worker process: load the model once, then transcribe slots as jobs arrive."""
+    from asr_backends import create_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            engine = create_backend(model_name, backend=backend)
+        except Exception as e:
+            # Reported rather than raised, so the pool can tell a bad setup from a crash
+            results.put(("failed", worker_id, None, f"{type(e).__name__}: {e}"))
+            return
+        results.put(("ready", worker_id, None, None))
+
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            job_id, slot, n_samples, language, phrases = job
+            try:
+                # View straight into shared memory, no copy on the way in
+                audio = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf,
+                                   offset=slot * slot_samples * SAMPLE_BYTES)
+                if phrases is None:
+                    result = engine.transcribe(audio, language=language)
+                else:
+                    from wake_verifier import score_wake_phrases
+
+                    result = score_wake_phrases(engine, audio, phrases, language)
+                del audio
+                results.put(("done", worker_id, job_id, result))
+            except Exception as e:
+                results.put(("error", worker_id, job_id, f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+class _Job:
+    __slots__ = ("future", "slot", "n_samples", "language", "phrases", "attempts", "worker", "sequence",
+                 "deadline")
+
+    def __init__(self, slot, n_samples, language, phrases=None, deadline=None):
+        self.future = concurrent.futures.Future()
+        self.slot = slot
+        self.n_samples = n_samples
+        self.language = language
+        # Wake-word phrases to score instead of transcribing, None for a transcription
+        self.phrases = phrases
+        self.attempts = 0
+        # Worker whose queue holds the job, and its place in that queue; None while waiting for a worker
+        self.worker = None
+        self.sequence = 0
+        # time.monotonic() by which the result must be back, None for no limit
+        self.deadline = deadline
+
+
+class ASRWorkerPool:
+    def __init__(self, model="base", num_workers=None, max_clip_seconds=30, slots=None, max_attempts=2,
+                 backend=None, max_restarts=3, result_timeout=120.0):
+        """
+        Start a pool of ASR worker processes.
+
+        Args:
+            model (str): ASR model name each worker loads
+            num_workers (int): Worker processes, None sizes the pool to the host's cores
+            max_clip_seconds (float): Longest clip a shared-memory slot can hold
+            slots (int): Number of audio slots, None means two per worker
+            max_attempts (int): How many times a job is tried if its worker crashes
+            backend (str): ASR backend name, None uses "asr_backend" from settings.json
+            max_restarts (int): Failed starts in a row before a worker is not restarted again
+            result_timeout (float): Seconds a clip may take from submit to result before its future
+                fails and the worker holding it is restarted, None for no limit
+        """
+        self.model = model
+        self.backend = backend
+        self.num_workers = num_workers or default_worker_count()
+        self.slot_samples = int(max_clip_seconds * SAMPLE_RATE)
+        self.num_slots = slots or self.num_workers * 2
+        self.max_attempts = max_attempts
+        self.max_restarts = max_restarts
+        self.result_timeout = result_timeout
+
+        # spawn: forking a process that already holds torch/audio threads is unsafe
+        self.ctx = multiprocessing.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=self.num_slots * self.slot_samples * SAMPLE_BYTES)
+        self.results = self.ctx.Queue()
+
+        # Waiting for a free slot is the pool's backpressure
+        self.free_slots = queue.Queue()
+        for slot in range(self.num_slots):
+            self.free_slots.put(slot)
+
+        self.pending = {}
+        self.job_ids = itertools.count()
+        self.sequences = itertools.count(1)
+        # Jobs submitted while no worker process is running, handed out when one starts
+        self.waiting = []
+        self.lock = threading.Lock()
+        self.closing = False
+        self.restarts = 0
+
+        # Startup state: set once a worker has loaded the model, or the pool has given up
+        self.settled = threading.Event()
+        self.load_error = None
+        self.failed = None
+
+        self.workers = {}
+        self.job_queues = {}
+        self.loaded = {}
+        self.start_failures = {}
+        self.restart_at = {}
+        # Workers terminated for holding an expired clip; the clips behind it are not to blame
+        self.stopped = set()
+        for worker_id in range(self.num_workers):
+            self.start_failures[worker_id] = 0
+            self._start_worker(worker_id)
+
+        threading.Thread(target=self._collect_results, name="asr-results", daemon=True).start()
+        threading.Thread(target=self._monitor_workers, name="asr-monitor", daemon=True).start()
+
+    def _start_worker(self, worker_id):
+        # A fresh queue per start: whatever the dead process left in the old one is redispatched from pending
+        jobs = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.model, self.backend, self.shm.name, self.slot_samples, jobs, self.results),
+            name=f"asr-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        with self.lock:
+            self.job_queues[worker_id] = jobs
+            self.workers[worker_id] = process
+            self.loaded[worker_id] = False
+            waiting, self.waiting = self.waiting, []
+        for job_id, job in waiting:
+            self._dispatch(job_id, job)
+
+    def _slot_view(self, slot):
+        return np.ndarray((self.slot_samples,), dtype=np.float32, buffer=self.shm.buf,
+                          offset=slot * self.slot_samples * SAMPLE_BYTES)
+
+    def submit(self, audio, language=None, phrases=None):
+        """
+        Queue a clip for recognition in a worker process.
+
+        Args:
+            audio (np.ndarray): 16 kHz mono float32 samples
+            language (str): Language code, None to let Whisper detect it
+            phrases (tuple): Score these wake-word phrases instead of transcribing (see score_wake)
+
+        Returns:
+            concurrent.futures.Future: Resolves to the transcript string, or fails with the
+                load error once no worker can load the model
+        """
+        if self.failed is not None:
+            future = concurrent.futures.Future()
+            future.set_exception(self.failed)
+            return future
+        if len(audio) > self.slot_samples:
+            print(f"⚠️ Clip of {len(audio) / SAMPLE_RATE:.1f}s truncated to "
+                  f"{self.slot_samples / SAMPLE_RATE:.0f}s for ASR worker")
+        n_samples = min(len(audio), self.slot_samples)
+
+        slot = self.free_slots.get()
+        self._slot_view(slot)[:n_samples] = audio[:n_samples]
+
+        deadline = time.monotonic() + self.result_timeout if self.result_timeout else None
+        job = _Job(slot, n_samples, language, phrases, deadline)
+        with self.lock:
+            # Checked under the lock so a clip cannot slip in after the pool gave up
+            failed = self.failed
+            if failed is None:
+                job_id = next(self.job_ids)
+                self.pending[job_id] = job
+        if failed is not None:
+            self.free_slots.put(slot)
+            job.future.set_exception(failed)
+            return job.future
+        self._dispatch(job_id, job)
+        return job.future
+
+    def transcribe(self, audio, language=None, timeout=None):
+        """Blocking helper: submit a clip and wait for its transcript."""
+        return self.submit(audio, language).result(timeout=timeout)
+
+    def score_wake(self, audio, phrases, language):
+        """
+        Score a wake window against wake-word phrases on a worker's resident model.
+
+        Returns:
+            concurrent.futures.Future: Resolves to (best phrase, per-token log-likelihood ratio)
+        """
+        return self.submit(audio, language, tuple(phrases))
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until a worker has loaded the model.
+
+        Args:
+            timeout (float): Seconds to wait, None waits until a worker is ready or the pool gives up
+
+        Returns:
+            bool: True once a worker is ready, False if the timeout passed first
+
+        Raises:
+            RuntimeError: No worker could load the model
+        """
+        settled = self.settled.wait(timeout)
+        if self.failed is not None:
+            raise self.failed
+        return settled
+
+    def _dispatch(self, job_id, job):
+        """Hand a job to the running worker holding the fewest, recording the assignment before queueing it."""
+        with self.lock:
+            if job_id not in self.pending:
+                return
+            running = [worker_id for worker_id, process in self.workers.items() if process is not None]
+            if not running:
+                job.worker = None
+                self.waiting.append((job_id, job))
+                return
+            held = {worker_id: 0 for worker_id in running}
+            for other in self.pending.values():
+                if other.worker in held:
+                    held[other.worker] += 1
+            # Workers that have loaded the model first, then the least busy
+            worker_id = min(running, key=lambda w: (not self.loaded[w], held[w]))
+            job.worker = worker_id
+            job.sequence = next(self.sequences)
+            jobs = self.job_queues[worker_id]
+        jobs.put((job_id, job.slot, job.n_samples, job.language, job.phrases))
+
+    def _finish(self, job_id, result=None, error=None):
+        with self.lock:
+            job = self.pending.pop(job_id, None)
+        if job is None:
+            return
+        self.free_slots.put(job.slot)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def _collect_results(self):
+        while True:
+            try:
+                kind, worker_id, job_id, payload = self.results.get()
+            except (EOFError, OSError):
+                return
+
+            if kind == "ready":
+                self.loaded[worker_id] = True
+                self.start_failures[worker_id] = 0
+                self.settled.set()
+            elif kind == "failed":
+                self.load_error = payload
+            elif kind == "done":
+                self._finish(job_id, result=payload)
+            elif kind == "error":
+                self._finish(job_id, error=RuntimeError(f"ASR worker {worker_id}: {payload}"))
+
+    def _monitor_workers(self):
+        """Restart dead workers with back-off, retry the job each one held, and give up if none can load."""
+        while not self.closing and self.failed is None:
+            time.sleep(0.5)
+            now = time.monotonic()
+            for worker_id, process in list(self.workers.items()):
+                if self.closing:
+                    return
+                if process is None:
+                    if worker_id in self.restart_at and now >= self.restart_at[worker_id]:
+                        del self.restart_at[worker_id]
+                        self.restarts += 1
+                        self._start_worker(worker_id)
+                elif not process.is_alive():
+                    self._worker_exited(worker_id, process, now)
+
+            if all(process is None for process in self.workers.values()) and not self.restart_at:
+                self._give_up()
+            else:
+                self._expire_jobs(now)
+
+    def _expire_jobs(self, now):
+        """Fail clips past their deadline, and restart a worker that is stuck on one."""
+        with self.lock:
+            expired = [(job_id, job) for job_id, job in self.pending.items()
+                       if job.deadline is not None and now >= job.deadline]
+            stuck = {job.worker for job_id, job in expired if job.worker is not None and
+                     job is self._current_job(job.worker)}
+        for job_id, job in expired:
+            self._finish(job_id, error=TimeoutError(
+                f"ASR result not back within {self.result_timeout:.0f}s"
+            ))
+        for worker_id in stuck:
+            process = self.workers.get(worker_id)
+            if process is not None and process.is_alive():
+                print(f"⚠️ ASR worker {worker_id} stuck on a clip, restarting it")
+                self.stopped.add(worker_id)
+                process.terminate()
+
+    def _current_job(self, worker_id):
+        """The job a worker is working on: the oldest one still in its queue. Call with the lock held."""
+        held = [job for job in self.pending.values() if job.worker == worker_id]
+        return min(held, key=lambda job: job.sequence) if held else None
+
+    def _worker_exited(self, worker_id, process, now):
+        with self.lock:
+            self.workers[worker_id] = None
+            stopped = worker_id in self.stopped
+            self.stopped.discard(worker_id)
+            current = self._current_job(worker_id) if self.loaded[worker_id] and not stopped else None
+            orphaned = [(job_id, job) for job_id, job in self.pending.items() if job.worker == worker_id]
+            for job_id, job in orphaned:
+                job.worker = None
+
+        if self.loaded[worker_id]:
+            self.start_failures[worker_id] = 0
+            reason = f"exited (code {process.exitcode})"
+        else:
+            # Died before "ready": a missing package, bad model name or out of memory while loading
+            self.start_failures[worker_id] += 1
+            reason = f"could not load '{self.model}' ({self.load_error or f'exit code {process.exitcode}'})"
+
+        if self.start_failures[worker_id] >= self.max_restarts:
+            print(f"❌ ASR worker {worker_id} {reason}, giving up after {self.start_failures[worker_id]} attempts")
+        else:
+            delay = min(30.0, 0.5 * 2 ** self.start_failures[worker_id])
+            self.restart_at[worker_id] = now + delay
+            print(f"❌ ASR worker {worker_id} {reason}, restarting in {delay:.1f}s...")
+
+        # Only the clip being decoded can have caused the crash; the ones queued behind it just move
+        for job_id, job in sorted(orphaned, key=lambda item: item[1].sequence):
+            if job is current:
+                job.attempts += 1
+            if job.attempts >= self.max_attempts:
+                self._finish(job_id, error=RuntimeError(
+                    f"ASR worker {worker_id} crashed {job.attempts} times on this clip"
+                ))
+            else:
+                self._dispatch(job_id, job)
+
+    def _give_up(self):
+        """No worker can run: fail every queued clip, and every later one, with the load error."""
+        error = RuntimeError(f"No ASR worker could load '{self.model}': {self.load_error or 'workers keep exiting'}")
+        with self.lock:
+            self.failed = error
+            pending = list(self.pending.values())
+            self.pending.clear()
+            self.waiting = []
+        for job in pending:
+            self.free_slots.put(job.slot)
+            job.future.set_exception(error)
+        self.settled.set()
+        print(f"❌ {error}")
+
+    def close(self):
+        """Stop all workers and release the shared memory block."""
+        self.closing = True
+        running = [(self.job_queues[worker_id], process) for worker_id, process in self.workers.items()
+                   if process is not None]
+        for jobs, _ in running:
+            jobs.put(None)
+        running = [process for _, process in running]
+        for process in running:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        with self.lock:
+            for job in self.pending.values():
+                job.future.set_exception(RuntimeError("ASR worker pool closed"))
+            self.pending.clear()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def default_worker_count():
+    """Leave a core for capture/playback and cap at 4 resident models."""
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(model="base"):
+    """
+    Shared worker pool for a Whisper model, sized from settings.json.
+
+    Args:
+        model (str): Whisper model name
+
+    Returns:
+        ASRWorkerPool: One pool per model name per process
+    """
+    with _pools_lock:
+        if model not in _pools:
+            workers = read_settings("asr_workers")
+            _pools[model] = ASRWorkerPool(
+                model=model,
+                num_workers=None if workers == "auto" else int(workers)
+            )
+        pool = _pools[model]
+    # Surface a model that cannot load here, instead of as a hang on the first clip
+    pool.wait_ready()
+    return pool
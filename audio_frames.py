@@ -0,0 +1,299 @@
+"""
+Zero-copy audio frames from capture to model input.
+
+An AudioFrame is a preallocated float32 buffer that the capture layer
+decodes PCM chunks straight into, one chunk at a time, as they arrive. The
+ASR engines get a view of the filled part, so an utterance is never joined
+into one bytes object, wrapped in AudioData and decoded again. Captured at
+16 kHz, the frame already is the model input; other rates are resampled
+once when the samples are read. Nothing is packed into AudioData (and from
+there into FLAC/WAV) unless a network engine such as the Google fallback
+actually runs, through to_audio_data().
+
+Frames are reused: the wake-word loop keeps one, and command capture
+borrows from a small pool, so steady-state capture allocates nothing but
+the chunks PyAudio returns.
+"""
+import contextlib
+import math
+import queue
+
+import numpy as np
+
+from audio_preprocess import SAMPLE_RATE, pcm_to_float32, resample
+
+# Full-scale value of each PCM sample width, used to report energy in PCM units like audioop.rms
+_FULL_SCALE = {1: 128.0, 2: 32768.0, 4: 2147483648.0}
+
+
+class AudioFrame:
+    def __init__(self, max_seconds=30.0, sample_rate=SAMPLE_RATE, initial_seconds=None):
+        """
+        Preallocated mono float32 audio buffer.
+
+        Args:
+            max_seconds (float): Longest audio the frame can hold; further samples are dropped
+            sample_rate (int): Rate of the PCM that will be appended
+            initial_seconds (float): Allocate this much up front and grow on demand up to
+                max_seconds, None allocates max_seconds straight away
+        """
+        self.max_seconds = max_seconds
+        self.sample_rate = sample_rate
+        self.buffer = np.zeros(int((initial_seconds or max_seconds) * sample_rate), dtype=np.float32)
+        self.length = 0
+        self.truncated = False
+
+    @property
+    def capacity(self):
+        """Most samples the frame can hold at its sample rate."""
+        return int(self.max_seconds * self.sample_rate)
+
+    @property
+    def seconds(self):
+        return self.length / self.sample_rate
+
+    @property
+    def full(self):
+        return self.length >= self.capacity
+
+    def clear(self, sample_rate=None):
+        """Empty the frame for a new utterance, keeping its buffer."""
+        if sample_rate and sample_rate != self.sample_rate:
+            self.sample_rate = sample_rate
+            self.buffer = np.zeros(min(len(self.buffer), self.capacity), dtype=np.float32)
+        self.length = 0
+        self.truncated = False
+
+    def _reserve(self, n_samples):
+        """Make room for n_samples more, growing the buffer geometrically; returns how many fit."""
+        n_samples = min(n_samples, self.capacity - self.length)
+        needed = self.length + n_samples
+        if needed > len(self.buffer):
+            grown = np.zeros(min(self.capacity, max(needed, 2 * len(self.buffer))), dtype=np.float32)
+            grown[:self.length] = self.buffer[:self.length]
+            self.buffer = grown
+        return max(0, n_samples)
+
+    def append_pcm(self, pcm, sample_width=2, channels=1):
+        """
+        Decode a PCM chunk into the end of the frame.
+
+        16-bit mono, the format microphones and clients deliver, is converted in
+        place in the frame's buffer with no intermediate arrays.
+
+        Args:
+            pcm (bytes | memoryview): Little-endian PCM at the frame's sample rate
+            sample_width (int): Bytes per sample
+            channels (int): Interleaved channel count
+
+        Returns:
+            np.ndarray: View of the samples just written (shorter than the chunk if the frame filled up)
+        """
+        if sample_width == 2 and channels == 1:
+            source = np.frombuffer(pcm, dtype="<i2")
+        else:
+            source = pcm_to_float32(pcm, self.sample_rate, sample_width, channels, target_rate=self.sample_rate)
+
+        n_samples = self._reserve(len(source))
+        if n_samples < len(source):
+            self.truncated = True
+        written = self.buffer[self.length:self.length + n_samples]
+        written[:] = source[:n_samples]
+        if source.dtype != np.float32:
+            written *= 1.0 / 32768.0
+        self.length += n_samples
+        return written
+
+    def trim_end(self, n_samples):
+        """Drop n_samples from the end (trailing silence after the phrase)."""
+        self.length = max(0, self.length - n_samples)
+
+    def samples(self):
+        """
+        The frame as model input.
+
+        Returns:
+            np.ndarray: 16 kHz mono float32; a view into the frame when captured at 16 kHz,
+                so it is only valid until the frame is cleared or reused
+        """
+        view = self.buffer[:self.length]
+        return view if self.sample_rate == SAMPLE_RATE else resample(view, self.sample_rate)
+
+    def to_pcm16(self):
+        """16-bit PCM bytes at the frame's sample rate."""
+        return (np.clip(self.buffer[:self.length], -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+    def to_audio_data(self):
+        """
+        Encode the frame for engines that need speech_recognition AudioData (network fallbacks).
+
+        Returns:
+            sr.AudioData: 16-bit PCM copy of the frame
+        """
+        import speech_recognition as sr
+
+        return sr.AudioData(self.to_pcm16(), self.sample_rate, 2)
+
+    @classmethod
+    def from_audio_data(cls, audio):
+        """Frame holding a copy of an existing AudioData."""
+        frame = cls(max_seconds=len(audio.frame_data) / (audio.sample_rate * audio.sample_width) + 0.1,
+                    sample_rate=audio.sample_rate)
+        frame.append_pcm(audio.frame_data, audio.sample_width)
+        return frame
+
+
+def as_float32(audio):
+    """16 kHz float32 samples from an AudioFrame or a speech_recognition AudioData."""
+    if isinstance(audio, AudioFrame):
+        return audio.samples()
+    return pcm_to_float32(audio.frame_data, audio.sample_rate, audio.sample_width)
+
+
+def as_audio_data(audio):
+    """AudioData for network engines from an AudioFrame (encoded now) or an AudioData (as is)."""
+    return audio.to_audio_data() if isinstance(audio, AudioFrame) else audio
+
+
+def listen_into(recognizer, source, frame, timeout=None, phrase_time_limit=None):
+    """
+    Capture one phrase into frame, with speech_recognition's Recognizer.listen endpointing.
+
+    Uses the recognizer's energy_threshold (adjusted dynamically when
+    dynamic_energy_threshold is on), pause_threshold, phrase_threshold and
+    non_speaking_duration, so it is a drop-in replacement for listen(). While
+    waiting for speech, the pre-roll is kept in a ring at the start of the
+    frame; it is rotated into place once, when speech starts.
+
+    Args:
+        recognizer (sr.Recognizer): Source of the endpointing settings
+        source (sr.Microphone): Opened audio source
+        frame (AudioFrame): Frame to fill; it is cleared first
+        timeout (float): Seconds to wait for speech to start, None waits forever
+        phrase_time_limit (float): Longest phrase in seconds, None is limited only by the frame
+
+    Returns:
+        AudioFrame: The filled frame
+
+    Raises:
+        sr.WaitTimeoutError: No speech started within timeout
+    """
+    import speech_recognition as sr
+
+    frame.clear(source.SAMPLE_RATE)
+    chunk = source.CHUNK
+    seconds_per_buffer = chunk / source.SAMPLE_RATE
+    pause_buffer_count = int(math.ceil(recognizer.pause_threshold / seconds_per_buffer))
+    phrase_buffer_count = int(math.ceil(recognizer.phrase_threshold / seconds_per_buffer))
+    non_speaking_buffer_count = int(math.ceil(recognizer.non_speaking_duration / seconds_per_buffer))
+    # Recognizer.listen keeps non_speaking_duration of audio before the onset, onset chunk included
+    ring_slots = max(1, non_speaking_buffer_count)
+    scale = _FULL_SCALE[source.SAMPLE_WIDTH]
+
+    def energy(samples):
+        # audioop.rms equivalent on the float view, without a temporary array
+        return math.sqrt(float(np.dot(samples, samples)) / len(samples)) * scale if len(samples) else 0.0
+
+    elapsed_time = 0.0
+    while True:
+        # Wait for speech: each chunk goes into the next ring slot at the start of the frame
+        chunks_heard = 0
+        while True:
+            elapsed_time += seconds_per_buffer
+            if timeout and elapsed_time > timeout:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+            pcm = source.stream.read(chunk)
+            if len(pcm) == 0:
+                break
+            frame.length = (chunks_heard % ring_slots) * chunk
+            written = frame.append_pcm(pcm, source.SAMPLE_WIDTH)
+            chunks_heard += 1
+            level = energy(written)
+            if level > recognizer.energy_threshold:
+                break
+            if recognizer.dynamic_energy_threshold:
+                damping = recognizer.dynamic_energy_adjustment_damping ** seconds_per_buffer
+                target_energy = level * recognizer.dynamic_energy_ratio
+                recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+
+        # Put the pre-roll in chronological order; the onset chunk is the newest
+        kept = min(chunks_heard, ring_slots)
+        frame.length = kept * chunk
+        oldest = chunks_heard % ring_slots if chunks_heard > ring_slots else 0
+        if oldest:
+            frame.buffer[:frame.length] = np.roll(frame.buffer[:frame.length], -oldest * chunk)
+
+        # Read the phrase until enough silence follows it
+        pause_count = phrase_count = 0
+        phrase_start_time = elapsed_time
+        while True:
+            elapsed_time += seconds_per_buffer
+            if phrase_time_limit and elapsed_time - phrase_start_time > phrase_time_limit:
+                break
+            pcm = source.stream.read(chunk)
+            if len(pcm) == 0:
+                break
+            written = frame.append_pcm(pcm, source.SAMPLE_WIDTH)
+            phrase_count += 1
+            if energy(written) > recognizer.energy_threshold:
+                pause_count = 0
+            else:
+                pause_count += 1
+            if pause_count > pause_buffer_count or frame.full:
+                break
+
+        # Too short to be a phrase: keep waiting, unless the stream ended
+        phrase_count -= pause_count
+        if phrase_count >= phrase_buffer_count or len(pcm) == 0 or frame.full:
+            break
+
+    # Keep only non_speaking_duration of the trailing silence
+    frame.trim_end(max(0, pause_count - non_speaking_buffer_count) * chunk)
+    return frame
+
+
+def record_into(source, frame, seconds, clear=True):
+    """
+    Read a fixed duration from an opened source into frame, like Recognizer.record.
+
+    Args:
+        source (sr.Microphone): Opened audio source
+        frame (AudioFrame): Frame to fill
+        seconds (float): How much audio to read
+        clear (bool): Empty the frame first; False appends to what it already holds
+
+    Returns:
+        AudioFrame: The filled frame
+    """
+    if clear:
+        frame.clear(source.SAMPLE_RATE)
+    for _ in range(int(math.ceil(seconds * source.SAMPLE_RATE / source.CHUNK))):
+        pcm = source.stream.read(source.CHUNK)
+        if len(pcm) == 0:
+            break
+        frame.append_pcm(pcm, source.SAMPLE_WIDTH)
+    return frame
+
+
+class AudioFramePool:
+    def __init__(self, count=2, max_seconds=60.0, initial_seconds=10.0):
+        """
+        Reusable frames for captures that may overlap (e.g. several threads recording).
+
+        Args:
+            count (int): Frames kept; acquiring more waits for one to be released
+            max_seconds (float): Capacity of each frame
+            initial_seconds (float): Buffer allocated up front per frame
+        """
+        self.frames = queue.Queue()
+        for _ in range(count):
+            self.frames.put(AudioFrame(max_seconds, initial_seconds=initial_seconds))
+
+    @contextlib.contextmanager
+    def frame(self):
+        """Borrow a frame for the duration of a with-block."""
+        frame = self.frames.get()
+        try:
+            yield frame
+        finally:
+            self.frames.put(frame)
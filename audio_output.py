@@ -0,0 +1,227 @@
+"""
+Persistent audio output engine.
+
+One output stream is opened for the life of the process and fed from a PCM
+queue by the sound card's callback, so clips play back to back without gaps
+and nothing ever reopens the device. Every queued clip gets a handle whose
+future resolves when its last sample has actually reached the speaker,
+which callers can wait on (or await) instead of polling a busy flag.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import heapq
+import io
+import itertools
+import os
+import threading
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from audio_preprocess import pcm_to_float32, resample
+
+OUTPUT_SAMPLE_RATE = 24000  # OpenAI TTS native rate, no resampling for speech
+
+
+class PlaybackHandle:
+    def __init__(self, engine, samples):
+        """
+        A clip queued on the output engine.
+
+        Args:
+            engine (AudioOutputEngine): Engine playing the clip
+            samples (np.ndarray): float32 mono samples at the engine rate
+        """
+        self.engine = engine
+        self.samples = samples
+        self.position = 0
+        # Resolves to True when fully played, False if cancelled first
+        self.future = concurrent.futures.Future()
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.engine.sample_rate
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """Block until the clip finishes. Returns True if it played to the end."""
+        return self.future.result(timeout=timeout)
+
+    def cancel(self):
+        """Stop this clip (or drop it from the queue if it has not started)."""
+        self.engine.cancel(self)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+class AudioOutputEngine:
+    def __init__(self, sample_rate=OUTPUT_SAMPLE_RATE, device=None, latency="low"):
+        """
+        Open the output device once and keep it running.
+
+        Args:
+            sample_rate (int): Output rate; clips at other rates are resampled on enqueue
+            device (int | str): sounddevice output device, None for the default
+            latency (str | float): Stream latency hint passed to PortAudio
+        """
+        self.sample_rate = sample_rate
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+
+        # Completions are released when the device clock reaches the clip's last sample
+        self.completions = []
+        self.completion_ids = itertools.count()
+        self.completion_ready = threading.Condition()
+        threading.Thread(target=self._complete_clips, name="audio-completions", daemon=True).start()
+
+        self.stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype="float32",
+            device=device,
+            latency=latency,
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Audio thread: copy queued PCM into the device buffer."""
+        out = outdata[:, 0]
+        filled = 0
+        finished = []
+
+        with self.lock:
+            while filled < frames and self.queue:
+                handle = self.queue[0]
+                take = min(frames - filled, len(handle.samples) - handle.position)
+                out[filled:filled + take] = handle.samples[handle.position:handle.position + take]
+                handle.position += take
+                filled += take
+                if handle.position >= len(handle.samples):
+                    self.queue.popleft()
+                    finished.append((handle, filled))
+
+        out[filled:] = 0.0
+
+        if finished:
+            # Some host APIs report no DAC time; fall back to now plus stream latency
+            dac_time = time_info.outputBufferDacTime or (self.stream.time + self.stream.latency)
+            with self.completion_ready:
+                for handle, offset in finished:
+                    due = dac_time + offset / self.sample_rate
+                    heapq.heappush(self.completions, (due, next(self.completion_ids), handle))
+                self.completion_ready.notify()
+
+    def _complete_clips(self):
+        """Resolve clip futures when their audio has played out of the device."""
+        while True:
+            with self.completion_ready:
+                while not self.completions:
+                    self.completion_ready.wait()
+                due, _, handle = self.completions[0]
+                remaining = due - self.stream.time
+                if remaining > 0:
+                    # Woken early if a sooner completion arrives
+                    self.completion_ready.wait(remaining)
+                    continue
+                heapq.heappop(self.completions)
+            if not handle.future.done():
+                handle.future.set_result(True)
+
+    def play(self, samples, sample_rate=None):
+        """
+        Queue float32 mono samples for gapless playback after anything already queued.
+
+        Args:
+            samples (np.ndarray): float32 audio in [-1, 1]
+            sample_rate (int): Rate of samples, defaults to the engine rate
+
+        Returns:
+            PlaybackHandle: Wait on or await it for completion
+        """
+        if sample_rate and sample_rate != self.sample_rate:
+            samples = resample(samples, sample_rate, self.sample_rate)
+        handle = PlaybackHandle(self, np.ascontiguousarray(samples, dtype=np.float32))
+        if len(handle.samples) == 0:
+            handle.future.set_result(True)
+            return handle
+        with self.lock:
+            self.queue.append(handle)
+        return handle
+
+    def play_pcm(self, pcm, sample_rate=OUTPUT_SAMPLE_RATE, sample_width=2, channels=1):
+        """Queue raw little-endian PCM (e.g. OpenAI TTS "pcm" responses)."""
+        return self.play(pcm_to_float32(pcm, sample_rate, sample_width, channels, target_rate=self.sample_rate))
+
+    def play_encoded(self, data):
+        """Queue encoded audio (mp3, wav, ogg, flac) held in memory."""
+        return self.play_file(io.BytesIO(data))
+
+    def play_file(self, file):
+        """Queue an audio file (path or file-like), decoded up front."""
+        samples, sample_rate = sf.read(file, dtype="float32", always_2d=True)
+        return self.play(samples.mean(axis=1), sample_rate)
+
+    def cancel(self, handle):
+        """Stop a clip immediately, or drop it from the queue if it has not started."""
+        with self.lock:
+            try:
+                self.queue.remove(handle)
+            except ValueError:
+                pass
+        if not handle.future.done():
+            handle.future.set_result(False)
+
+    def stop_all(self):
+        """Cancel everything queued or playing."""
+        with self.lock:
+            handles = list(self.queue)
+            self.queue.clear()
+        for handle in handles:
+            if not handle.future.done():
+                handle.future.set_result(False)
+
+    @property
+    def busy(self):
+        with self.lock:
+            return bool(self.queue)
+
+    def close(self):
+        self.stop_all()
+        self.stream.stop()
+        self.stream.close()
+
+
+# Containers play_file can decode: libsndfile reads wav, flac and ogg, and mp3 from 1.1 on, but not m4a/aac
+PLAYABLE_EXTENSIONS = tuple(f".{name.lower()}" for name in sf.available_formats())
+
+
+def can_play(path):
+    """True if play_file can decode the file, judged by its extension."""
+    return os.path.splitext(path)[1].lower() in PLAYABLE_EXTENSIONS
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_output_engine():
+    """The process-wide output engine, opened on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioOutputEngine()
+        return _engine
+
+
+async def play_file_async(path):
+    """Play an audio file and wait until it has finished."""
+    loop = asyncio.get_running_loop()
+    # Decoding is blocking work, the wait itself is not
+    handle = await loop.run_in_executor(None, get_output_engine().play_file, path)
+    return await handle
@@ -0,0 +1,260 @@
+"""
+Audio preprocessing between capture and recognition.
+
+Converts captured audio to 16 kHz mono float32 once, trims leading and
+trailing silence with an energy gate, and optionally applies spectral-gating
+noise reduction, so ASR is not paid for dead air. Per-utterance stats record
+how much audio was dropped.
+"""
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class PreprocessStats:
+    def __init__(self):
+        """Running totals of audio seen, audio dropped and time spent preprocessing."""
+        self.utterances = 0
+        self.skipped = 0
+        self.input_seconds = 0.0
+        self.kept_seconds = 0.0
+        self.processing_seconds = 0.0
+        self.asr_seconds = 0.0
+
+    @property
+    def dropped_seconds(self):
+        return self.input_seconds - self.kept_seconds
+
+    def record(self, input_seconds, kept_seconds, processing_seconds):
+        self.utterances += 1
+        self.input_seconds += input_seconds
+        self.kept_seconds += kept_seconds
+        self.processing_seconds += processing_seconds
+        if kept_seconds == 0:
+            self.skipped += 1
+
+    def record_asr(self, seconds):
+        self.asr_seconds += seconds
+
+    def summary(self):
+        """One-line summary of everything recorded so far."""
+        if not self.utterances:
+            return "No audio preprocessed yet"
+        kept_ratio = self.kept_seconds / self.input_seconds if self.input_seconds else 0.0
+        return (f"{self.utterances} utterances, {self.dropped_seconds:.1f}s of {self.input_seconds:.1f}s dropped "
+                f"({(1 - kept_ratio) * 100:.0f}%), {self.skipped} skipped as silence, "
+                f"ASR {self.asr_seconds:.1f}s, preprocessing {self.processing_seconds * 1000:.0f} ms")
+
+
+stats = PreprocessStats()
+
+
+def pcm_to_float32(pcm, sample_rate, sample_width=2, channels=1, target_rate=SAMPLE_RATE):
+    """
+    Decode interleaved PCM to mono float32 at target_rate, in a single pass.
+
+    Args:
+        pcm (bytes | memoryview): Little-endian PCM data
+        sample_rate (int): Input sample rate
+        sample_width (int): Bytes per sample (1, 2 or 4)
+        channels (int): Interleaved channel count
+        target_rate (int): Output sample rate
+
+    Returns:
+        np.ndarray: Samples in [-1, 1]
+    """
+    # One float32 array per call: astype makes it, scaling happens in place
+    if sample_width == 1:
+        samples = np.frombuffer(pcm, dtype=np.uint8).astype(np.float32)
+        samples -= 128.0
+        samples *= 1.0 / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        samples *= 1.0 / 32768.0
+    elif sample_width == 4:
+        samples = np.frombuffer(pcm, dtype="<i4").astype(np.float32)
+        samples *= 1.0 / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return resample(samples, sample_rate, target_rate)
+
+
+def resample(samples, sample_rate, target_rate=SAMPLE_RATE):
+    """
+    Resample float32 audio.
+
+    Integer downsampling ratios (48k, 32k -> 16k) average each group of samples,
+    which doubles as the anti-alias filter; other ratios interpolate linearly.
+    """
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    if sample_rate > target_rate and sample_rate % target_rate == 0:
+        factor = sample_rate // target_rate
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1).astype(np.float32)
+
+    duration = len(samples) / sample_rate
+    n_out = int(round(duration * target_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (sample_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def audio_data_to_float32(audio):
+    """
+    Convert a speech_recognition AudioData to 16 kHz mono float32 samples.
+
+    Args:
+        audio (sr.AudioData): Captured audio
+
+    Returns:
+        np.ndarray: Samples in [-1, 1]
+    """
+    return pcm_to_float32(audio.frame_data, audio.sample_rate, audio.sample_width)
+
+
+def frame_rms(samples, frame_length, hop_length=None):
+    """
+    RMS energy of each frame, computed without a Python loop.
+
+    Args:
+        samples (np.ndarray): float32 audio
+        frame_length (int): Samples per frame
+        hop_length (int): Samples between frame starts, defaults to frame_length
+
+    Returns:
+        np.ndarray: One RMS value per frame
+    """
+    hop_length = hop_length or frame_length
+    if len(samples) < frame_length:
+        return np.array([np.sqrt(np.mean(samples ** 2))]) if len(samples) else np.zeros(0)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop_length]
+    # einsum sums the squares per frame without materializing frames * frames
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_length)
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=-40.0,
+                 floor_margin_db=10.0, keep_ms=200):
+    """
+    Cut leading and trailing silence with an energy gate.
+
+    A frame counts as speech when it is louder than both an absolute threshold
+    and the clip's own noise floor (10th percentile frame energy) plus a margin.
+
+    Args:
+        samples (np.ndarray): float32 audio
+        sample_rate (int): Sample rate of samples
+        frame_ms (float): Gate frame length
+        threshold_db (float): Absolute speech threshold in dBFS
+        floor_margin_db (float): How far above the noise floor speech must be
+        keep_ms (float): Audio kept around the speech so word edges are not clipped
+
+    Returns:
+        np.ndarray: View of the speech region (empty if the clip is all silence)
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    rms = frame_rms(samples, frame_length)
+    if len(rms) == 0:
+        return samples[:0]
+
+    db = 20 * np.log10(rms + 1e-10)
+    noise_floor = np.percentile(db, 10)
+    # A clip that is speech from end to end has no real floor; stay well below its peak
+    adaptive = min(noise_floor + floor_margin_db, db.max() - 30.0)
+    voiced = np.flatnonzero(db > max(threshold_db, adaptive))
+    if len(voiced) == 0:
+        return samples[:0]
+
+    keep = int(sample_rate * keep_ms / 1000)
+    start = max(0, voiced[0] * frame_length - keep)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + keep)
+    return samples[start:end]
+
+
+def spectral_gate(samples, n_fft=512, hop_length=128, threshold_db=6.0, reduction_db=18.0):
+    """
+    Spectral-gating noise reduction.
+
+    The noise profile is estimated per frequency bin from the quietest 20% of
+    frames; bins that do not rise threshold_db above it are attenuated by
+    reduction_db. The mask is smoothed over time to avoid musical noise.
+
+    Args:
+        samples (np.ndarray): float32 audio
+        n_fft (int): STFT size
+        hop_length (int): STFT hop
+        threshold_db (float): Margin above the noise profile that passes untouched
+        reduction_db (float): Attenuation applied to gated bins
+
+    Returns:
+        np.ndarray: Denoised float32 audio of the same length
+    """
+    if len(samples) < n_fft * 2:
+        return samples
+
+    window = np.hanning(n_fft).astype(np.float32)
+    padded = np.pad(samples, (n_fft // 2, n_fft // 2 + n_fft))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length] * window
+    spectrum = np.fft.rfft(frames, axis=1)
+    magnitude_db = 20 * np.log10(np.abs(spectrum) + 1e-10)
+
+    frame_energy = magnitude_db.mean(axis=1)
+    quiet = magnitude_db[frame_energy <= np.percentile(frame_energy, 20)]
+    noise_profile = quiet.mean(axis=0) + quiet.std(axis=0)
+
+    gate = (magnitude_db > noise_profile + threshold_db).astype(np.float32)
+    # Smooth the gate over neighbouring frames
+    smoothed = gate.copy()
+    smoothed[1:] += gate[:-1]
+    smoothed[:-1] += gate[1:]
+    gate = smoothed / 3
+    floor = 10 ** (-reduction_db / 20)
+    spectrum *= floor + (1 - floor) * gate
+
+    # Overlap-add resynthesis with window-sum normalisation
+    synthesis = np.fft.irfft(spectrum, n=n_fft, axis=1).astype(np.float32) * window
+    positions = np.arange(len(synthesis))[:, None] * hop_length + np.arange(n_fft)
+    output = np.zeros(len(padded), dtype=np.float32)
+    norm = np.zeros(len(padded), dtype=np.float32)
+    np.add.at(output, positions, synthesis)
+    np.add.at(norm, positions, np.broadcast_to(window ** 2, synthesis.shape))
+    output /= np.maximum(norm, 1e-8)
+    return output[n_fft // 2:n_fft // 2 + len(samples)]
+
+
+def preprocess(samples, trim=True, denoise=False, verbose=True):
+    """
+    Run the preprocessing stage on 16 kHz float32 audio and record what was dropped.
+
+    Args:
+        samples (np.ndarray): 16 kHz mono float32 audio
+        trim (bool): Trim leading/trailing silence
+        denoise (bool): Apply spectral-gating noise reduction
+        verbose (bool): Print a line when audio is dropped
+
+    Returns:
+        np.ndarray: Audio to hand to ASR (empty if nothing but silence)
+    """
+    start = time.perf_counter()
+    input_seconds = len(samples) / SAMPLE_RATE
+
+    if denoise:
+        samples = spectral_gate(samples)
+    if trim:
+        samples = trim_silence(samples)
+
+    kept_seconds = len(samples) / SAMPLE_RATE
+    stats.record(input_seconds, kept_seconds, time.perf_counter() - start)
+
+    if verbose and input_seconds - kept_seconds >= 0.1:
+        if kept_seconds == 0:
+            print(f"✂️ Skipped {input_seconds:.1f}s clip (silence only)")
+        else:
+            print(f"✂️ Trimmed {input_seconds - kept_seconds:.1f}s of silence ({input_seconds:.1f}s → {kept_seconds:.1f}s)")
+    return samples
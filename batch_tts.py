@@ -0,0 +1,176 @@
+"""
+Bulk pre-recorded audio generation.
+
+Reads a manifest of phrases x voices x models, synthesizes every
+combination with bounded concurrency, skips clips that already exist
+(matched by content hash), retries failures with exponential backoff and
+writes pre-recorded-audio/index.json so playback can look clips up without
+scanning directories.
+
+Manifest (JSON):
+    {
+      "phrases": [{"name": "yes", "text": "Yes?"}, "I'm listening."],
+      "voices": ["nova", "alloy"],
+      "models": ["tts-1"],
+      "speed": 1.0,
+      "instructions": null
+    }
+
+Usage:
+    python batch_tts.py manifest.json --concurrency 4
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+from json_handle import read_audio_index, write_audio_index
+from speaker_api import synthesize_tts_openai
+
+BASE_DIR = "pre-recorded-audio"
+
+
+def slugify(text, max_length=40):
+    """Filesystem-friendly name from a phrase."""
+    slug = re.sub(r"[^\w]+", "_", text.lower()).strip("_")
+    return slug[:max_length] or "clip"
+
+
+def content_hash(text, voice, model, speed, instructions):
+    """Stable hash of everything that changes the generated audio."""
+    key = json.dumps([text, voice, model, speed, instructions], ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def load_manifest(path):
+    """
+    Expand a manifest into one job per phrase x voice x model.
+
+    Returns:
+        list: Job dicts with text, name, voice, model, speed, instructions, hash and file
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    speed = manifest.get("speed", 1.0)
+    instructions = manifest.get("instructions")
+    jobs = []
+    for phrase in manifest["phrases"]:
+        if isinstance(phrase, str):
+            phrase = {"text": phrase}
+        text = phrase["text"]
+        name = phrase.get("name") or slugify(text)
+        for voice in manifest.get("voices", ["nova"]):
+            for model in manifest.get("models", ["tts-1"]):
+                phrase_speed = phrase.get("speed", speed)
+                phrase_instructions = phrase.get("instructions", instructions)
+                digest = content_hash(text, voice, model, phrase_speed, phrase_instructions)
+                jobs.append({
+                    "name": name,
+                    "text": text,
+                    "voice": voice,
+                    "model": model,
+                    "speed": phrase_speed,
+                    "instructions": phrase_instructions,
+                    "hash": digest,
+                    "file": os.path.join(voice, f"{name}-{digest}.mp3"),
+                })
+    return jobs
+
+
+def synthesize_job(job, base_dir, max_attempts=5, base_delay=1.0):
+    """
+    Generate one clip, retrying with exponential backoff and jitter.
+
+    Returns:
+        dict: The job, as an index entry
+    """
+    path = os.path.join(base_dir, job["file"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            audio = synthesize_tts_openai(
+                job["text"], voice=job["voice"], model=job["model"],
+                speed=job["speed"], instructions=job["instructions"], response_format="mp3"
+            )
+            # Write to a temp name first so an interrupted run never leaves a half file
+            tmp_path = path + ".part"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+            return job
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"  ↻ {job['file']}: {e} (retry {attempt}/{max_attempts - 1} in {delay:.1f}s)")
+            time.sleep(delay)
+
+
+def run_batch(jobs, base_dir=BASE_DIR, concurrency=4, max_attempts=5, force=False):
+    """
+    Synthesize all jobs that are not already present and update the index.
+
+    Returns:
+        dict: Counts of generated, skipped and failed clips
+    """
+    index = read_audio_index(base_dir)
+    known = {entry["hash"] for entries in index.values() for entry in entries
+             if os.path.exists(os.path.join(base_dir, entry["file"]))}
+
+    todo = []
+    counts = {"generated": 0, "skipped": 0, "failed": 0}
+    for job in jobs:
+        if not force and (job["hash"] in known or os.path.exists(os.path.join(base_dir, job["file"]))):
+            counts["skipped"] += 1
+            index.setdefault(job["voice"], [])
+            if job["hash"] not in {entry["hash"] for entry in index[job["voice"]]}:
+                index[job["voice"]].append(job)
+        else:
+            todo.append(job)
+
+    print(f"🎵 {len(jobs)} clips in manifest: {len(todo)} to generate, {counts['skipped']} already present")
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(synthesize_job, job, base_dir, max_attempts): job for job in todo}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                job = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    counts["failed"] += 1
+                    print(f"❌ [{done}/{len(todo)}] {job['file']}: {e}")
+                    continue
+                counts["generated"] += 1
+                entries = [e for e in index.get(job["voice"], []) if e["hash"] != entry["hash"]]
+                index[job["voice"]] = entries + [entry]
+                print(f"✓ [{done}/{len(todo)}] {job['file']}")
+    finally:
+        # Keep whatever finished, even if the run is interrupted
+        write_audio_index(index, base_dir)
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate pre-recorded audio banks from a manifest.")
+    parser.add_argument("manifest", help="JSON manifest of phrases, voices and models")
+    parser.add_argument("--output", default=BASE_DIR, help=f"Output folder (default: {BASE_DIR})")
+    parser.add_argument("--concurrency", type=int, default=4, help="Simultaneous TTS requests")
+    parser.add_argument("--attempts", type=int, default=5, help="Attempts per clip before giving up")
+    parser.add_argument("--force", action="store_true", help="Regenerate clips that already exist")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        counts = run_batch(load_manifest(args.manifest), args.output, args.concurrency, args.attempts, args.force)
+        print(f"\nDone in {time.perf_counter() - start:.1f}s: {counts['generated']} generated, "
+              f"{counts['skipped']} skipped, {counts['failed']} failed")
+    except KeyboardInterrupt:
+        print("\n👋 Batch interrupted, index saved for finished clips.")
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the OpenAI-compatible endpoints Serina calls.
+
+Serves /v1/chat/completions (plain or streamed) and /v1/audio/speech with
+canned content and configurable latency, so load tests and benchmarks
+measure our own code rather than the upstream API. Point a client at it with
+gpt_redirect_url=http://127.0.0.1:<port>/v1.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_REPLY = "Mm, I heard you. Tell me more about it, I'm right here."
+TTS_SAMPLE_RATE = 24000
+
+
+class StubConfig:
+    def __init__(self, llm_latency=0.3, tts_latency=0.2, jitter=0.25, failure_rate=0.0, token_interval=0.01):
+        """
+        Latency model for the stub endpoints.
+
+        Args:
+            llm_latency (float): Mean chat completion latency (seconds)
+            tts_latency (float): Mean speech synthesis latency (seconds)
+            jitter (float): Relative standard deviation applied to each latency
+            failure_rate (float): Fraction of requests answered with HTTP 500
+            token_interval (float): Gap between streamed chunks (seconds); llm_latency is the time to first token
+        """
+        self.llm_latency = llm_latency
+        self.tts_latency = tts_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.token_interval = token_interval
+
+    def delay(self, mean):
+        """Sleep for a jittered latency around mean."""
+        time.sleep(max(0.0, random.gauss(mean, mean * self.jitter)))
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream_chat(self, request):
+            """Server-sent events, one word per chunk, like a streaming completion."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = CANNED_REPLY.split(" ")
+            try:
+                for index, word in enumerate(words):
+                    chunk = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model", "stub"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if index == 0 else " " + word},
+                            "finish_reason": "stop" if index == len(words) - 1 else None
+                        }]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(config.token_interval)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client cancelled the stream (e.g. a hedged request that lost)
+                pass
+
+        def do_POST(self):
+            request = self._read_json()
+
+            if random.random() < config.failure_rate:
+                self._send(500, json.dumps({"error": {"message": "stub failure"}}).encode())
+                return
+
+            if self.path.endswith("/chat/completions") and request.get("stream"):
+                config.delay(config.llm_latency)
+                self._stream_chat(request)
+
+            elif self.path.endswith("/chat/completions"):
+                config.delay(config.llm_latency)
+                body = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": CANNED_REPLY},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                }
+                self._send(200, json.dumps(body).encode())
+
+            elif self.path.endswith("/audio/speech"):
+                config.delay(config.tts_latency)
+                # ~60 ms of silent 16-bit PCM per character, like real speech pacing
+                seconds = min(len(request.get("input", "")) * 0.06, 30.0)
+                audio = b"\x00\x00" * int(TTS_SAMPLE_RATE * seconds)
+                self._send(200, audio, content_type="audio/pcm")
+
+            else:
+                self._send(404, b"{}")
+
+    return StubHandler
+
+
+def start_stub_server(port=0, config=None):
+    """
+    Start the stub API server on a background thread.
+
+    Args:
+        port (int): Port to bind on 127.0.0.1 (0 picks a free port)
+        config (StubConfig): Latency model, defaults to StubConfig()
+
+    Returns:
+        tuple: (server, base_url) where base_url ends in /v1
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local OpenAI-compatible API stubs.")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, StubConfig(
+        args.llm_latency, args.tts_latency, args.jitter, args.failure_rate, args.token_interval
+    ))
+    print(f"API stub listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,132 @@
+"""
+Compare ASR backends on a fixed clip set: real-time factor, peak RAM and WER.
+
+Each configuration runs in its own subprocess so peak RSS is measured per
+backend. Reference transcripts are read from <clip>.txt next to each WAV.
+
+Example:
+    python benchmarks/bench_asr_backends.py --wav-dir clips \\
+        --configs whisper:base faster-whisper:base:int8 faster-whisper:base:int8:4
+    (config format: backend:model[:compute_type[:threads[:beam_size]]])
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import wave
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance and reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            current = min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+            previous, row[j] = row[j], current
+    return row[-1], len(ref)
+
+
+def load_clips(wav_dir):
+    """Load (name, samples, seconds, reference) for every WAV with a transcript."""
+    from audio_preprocess import SAMPLE_RATE, pcm_to_float32
+
+    clips = []
+    for path in sorted(glob.glob(os.path.join(wav_dir, "*.wav"))):
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(reference_path):
+            continue
+        with wave.open(path, "rb") as wav:
+            samples = pcm_to_float32(wav.readframes(wav.getnframes()), wav.getframerate(),
+                                     wav.getsampwidth(), wav.getnchannels())
+        with open(reference_path, encoding="utf-8") as f:
+            reference = f.read().strip()
+        clips.append((os.path.basename(path), samples, len(samples) / SAMPLE_RATE, reference))
+    return clips
+
+
+def run_config(config, wav_dir):
+    """Child process: load one backend, transcribe every clip, print a JSON result."""
+    from asr_backends import create_backend
+
+    parts = config.split(":")
+    backend, model = parts[0], parts[1]
+    compute_type = parts[2] if len(parts) > 2 else "default"
+    threads = int(parts[3]) if len(parts) > 3 else 0
+    beam_size = int(parts[4]) if len(parts) > 4 else 1
+
+    clips = load_clips(wav_dir)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    load_start = time.perf_counter()
+    engine = create_backend(model, backend=backend, compute_type=compute_type, threads=threads, beam_size=beam_size)
+    load_seconds = time.perf_counter() - load_start
+    engine.transcribe(clips[0][1])  # warm-up
+
+    audio_seconds = decode_seconds = 0.0
+    errors = words = 0
+    for _name, samples, seconds, reference in clips:
+        start = time.perf_counter()
+        text = engine.transcribe(samples, language="en")
+        decode_seconds += time.perf_counter() - start
+        audio_seconds += seconds
+        clip_errors, clip_words = word_errors(reference, text)
+        errors += clip_errors
+        words += clip_words
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({
+        "config": config,
+        "engine": engine.describe(),
+        "load_s": load_seconds,
+        "rtf": decode_seconds / audio_seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20,
+        "model_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * scale / 2 ** 20,
+        "wer": errors / max(words, 1),
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ASR backends on RTF, RAM and WER.")
+    parser.add_argument("--wav-dir", required=True, help="WAV clips with <clip>.txt reference transcripts")
+    parser.add_argument("--configs", nargs="+", default=["whisper:base", "faster-whisper:base:int8"],
+                        help="backend:model[:compute_type[:threads[:beam_size]]]")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_config(args.child, args.wav_dir)
+        sys.exit(0)
+
+    clips = load_clips(args.wav_dir)
+    if not clips:
+        sys.exit(f"No WAV files with .txt transcripts found in {args.wav_dir}")
+    print(f"{len(clips)} clips, {sum(clip[2] for clip in clips):.1f}s of audio\n")
+
+    print(f"{'config':<34}{'RTF':>7}{'peak MB':>9}{'model MB':>10}{'WER':>7}{'load s':>8}")
+    for config in args.configs:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--wav-dir", args.wav_dir, "--child", config],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+        if child.returncode != 0 or not lines:
+            print(f"{config:<34} failed: {child.stderr.strip().splitlines()[-1] if child.stderr else 'no output'}")
+            continue
+        row = json.loads(lines[-1])
+        print(f"{config:<34}{row['rtf']:>7.3f}{row['peak_rss_mb']:>9.0f}{row['model_rss_mb']:>10.0f}"
+              f"{row['wer'] * 100:>6.1f}%{row['load_s']:>8.1f}")
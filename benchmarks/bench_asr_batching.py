@@ -0,0 +1,108 @@
+"""
+Throughput/latency of WhisperBatchScheduler versus batch window.
+
+Simulates concurrent callers submitting clips with Poisson arrivals and,
+for each batch window, reports clips/s and latency percentiles (queue wait
+plus decode). Window 0 is the unbatched baseline: every clip is its own
+forward pass.
+
+Example:
+    python benchmarks/bench_asr_batching.py --wav-dir clips --model tiny --windows 0 10 25 50 100
+"""
+import argparse
+import csv
+import glob
+import os
+import statistics
+import sys
+import random
+import threading
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asr_scheduler import SAMPLE_RATE, WhisperBatchScheduler  # noqa: E402
+
+
+def load_clip(path):
+    """Load a mono 16-bit 16 kHz WAV file as float32 samples."""
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected mono 16-bit 16 kHz PCM")
+        pcm = wav.readframes(wav.getnframes())
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def run_window(model, window_ms, max_batch, clips, callers, requests_per_caller, arrival_rate):
+    """Run the load once for a given batch window and return a result row."""
+    scheduler = WhisperBatchScheduler(model=model, batch_window_ms=window_ms, max_batch_size=max_batch)
+    # Load the model before timing anything
+    scheduler.transcribe(clips[0])
+
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(index):
+        rng = random.Random(index)
+        for n in range(requests_per_caller):
+            time.sleep(rng.expovariate(arrival_rate))
+            start = time.perf_counter()
+            scheduler.transcribe(clips[(index + n) % len(clips)])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "window_ms": window_ms,
+        "clips_per_s": round(len(latencies) / elapsed, 2),
+        "mean_batch": round(scheduler.stats["clips"] / max(scheduler.stats["batches"], 1), 2),
+        "p50_ms": round(statistics.median(latencies) * 1000),
+        "p95_ms": round(percentile(latencies, 95) * 1000),
+        "p99_ms": round(percentile(latencies, 99) * 1000),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Whisper dynamic batching.")
+    parser.add_argument("--wav-dir", required=True, help="Directory of mono 16 kHz 16-bit WAV clips")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 10, 25, 50, 100, 200])
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--callers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per caller")
+    parser.add_argument("--rate", type=float, default=1.0, help="Arrivals per second per caller")
+    parser.add_argument("--csv", help="Also write the curve to this CSV file")
+    args = parser.parse_args()
+
+    clips = [load_clip(path) for path in sorted(glob.glob(os.path.join(args.wav_dir, "*.wav")))]
+    if not clips:
+        sys.exit(f"No WAV files found in {args.wav_dir}")
+
+    rows = []
+    print(f"{'window ms':>10}{'clips/s':>10}{'batch':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for window in args.windows:
+        row = run_window(args.model, window, args.max_batch, clips, args.callers, args.requests, args.rate)
+        rows.append(row)
+        print(f"{row['window_ms']:>10.0f}{row['clips_per_s']:>10.2f}{row['mean_batch']:>8.2f}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Curve written to {args.csv}")
@@ -0,0 +1,147 @@
+"""
+Bytes copied and allocated per utterance between capture and model input.
+
+Replays each utterance as the 1024-frame 16-bit chunks PyAudio delivers and
+runs it through two capture paths up to the float32 array handed to ASR:
+
+    before   chunks -> b"".join (Recognizer.listen) -> AudioData -> int16 view
+             -> astype float32 -> / 32768 -> preprocess
+    after    chunks decoded in place into a reused AudioFrame -> preprocess
+
+Copies are counted per step (an array that shares no memory with its input
+is a copy); tracemalloc reports the peak extra memory each path needed. The
+latency column is the time from the last chunk arriving to the model input
+being ready: the frame path decodes chunks while the speaker is still talking.
+
+Example:
+    python benchmarks/bench_audio_copies.py --wav-dir clips
+    python benchmarks/bench_audio_copies.py --seconds 2 5 10
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_frames import AudioFrame  # noqa: E402
+from audio_preprocess import SAMPLE_RATE, preprocess  # noqa: E402
+
+CHUNK = 1024
+
+
+def load_utterances(wav_dir, seconds):
+    """(name, 16 kHz 16-bit mono PCM) from WAV files, or synthetic tone bursts of the given lengths."""
+    utterances = []
+    if wav_dir:
+        for path in sorted(glob.glob(os.path.join(wav_dir, "*.wav"))):
+            with wave.open(path, "rb") as wav:
+                if (wav.getframerate(), wav.getsampwidth(), wav.getnchannels()) != (SAMPLE_RATE, 2, 1):
+                    print(f"Skipping {path}: capture is 16 kHz 16-bit mono")
+                    continue
+                utterances.append((os.path.basename(path), wav.readframes(wav.getnframes())))
+        return utterances
+
+    rng = np.random.default_rng(0)
+    for length in seconds:
+        t = np.arange(int(length * SAMPLE_RATE)) / SAMPLE_RATE
+        speech = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+        silence = np.zeros(SAMPLE_RATE // 2)
+        samples = np.concatenate([silence, speech, silence]) + rng.normal(0, 0.001, len(t) + SAMPLE_RATE)
+        utterances.append((f"synthetic {length:g}s", (samples * 32767).astype("<i2").tobytes()))
+    return utterances
+
+
+def copied(result, *sources):
+    """Bytes of result if it is a fresh copy rather than a view of one of the sources."""
+    if any(np.shares_memory(result, source) for source in sources if isinstance(source, np.ndarray)):
+        return 0
+    return result.nbytes
+
+
+def before(chunks):
+    """The Recognizer.listen + pcm_to_float32 path as it was, copy by copy."""
+    start = time.perf_counter()
+    pcm = b"".join(chunks)  # listen() joins its frame deque into AudioData.frame_data
+    count = len(pcm)
+    ints = np.frombuffer(pcm, dtype="<i2")
+    floats = ints.astype(np.float32)
+    count += copied(floats, ints)
+    scaled = floats / 32768.0
+    count += copied(scaled, floats)
+    samples = preprocess(scaled, verbose=False)
+    count += copied(samples, scaled)
+    return samples, count, time.perf_counter() - start
+
+
+def after(chunks, frame):
+    """Chunks decoded straight into a preallocated frame, as listen_into does."""
+    frame.clear()
+    count = 0
+    for chunk in chunks:
+        count += frame.append_pcm(chunk).nbytes  # the one write per sample: int16 -> float32 in place
+    start = time.perf_counter()
+    view = frame.samples()
+    samples = preprocess(view, verbose=False)
+    count += copied(samples, view, frame.buffer)
+    return samples, count, time.perf_counter() - start
+
+
+def measure(run):
+    """Run once under tracemalloc, returning (result, bytes copied, peak extra bytes)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    samples, count, _ = run()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return samples, count, peak
+
+
+def best_ms(run, repeats):
+    """Best latency after the last chunk over several runs, in milliseconds."""
+    return min(run()[2] for _ in range(repeats)) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark copies between audio capture and ASR input.")
+    parser.add_argument("--wav-dir", help="16 kHz 16-bit mono WAV utterances (default: synthetic)")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2.0, 5.0, 15.0],
+                        help="Synthetic utterance lengths when no --wav-dir is given")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    utterances = load_utterances(args.wav_dir, args.seconds)
+    if not utterances:
+        sys.exit(f"No usable WAV files found in {args.wav_dir}")
+
+    # One frame reused for every utterance, like the wake-word loop and the command frame pool
+    frame = AudioFrame(max_seconds=max(len(pcm) for _name, pcm in utterances) / (2 * SAMPLE_RATE) + 1)
+
+    print(f"{'utterance':<18}{'audio KB':>9}{'copied KB':>11}{'after KB':>10}"
+          f"{'peak KB':>9}{'after KB':>10}{'tail ms':>9}{'after ms':>10}")
+    totals = [0, 0, 0]
+    # Warm-up so one-time allocations inside numpy are not charged to the first utterance
+    warm_up = [utterances[0][1][:2 * CHUNK]]
+    before(warm_up), after(warm_up, frame)
+    for name, pcm in utterances:
+        chunks = [pcm[offset:offset + 2 * CHUNK] for offset in range(0, len(pcm), 2 * CHUNK)]
+        old_samples, old_copied, old_peak = measure(lambda: before(chunks))
+        new_samples, new_copied, new_peak = measure(lambda: after(chunks, frame))
+        if not np.allclose(old_samples, new_samples):
+            sys.exit(f"{name}: paths produced different model input")
+
+        # Timing without tracemalloc, which slows allocation down
+        old_ms = best_ms(lambda: before(chunks), args.repeats)
+        new_ms = best_ms(lambda: after(chunks, frame), args.repeats)
+
+        totals[0] += len(pcm)
+        totals[1] += old_copied
+        totals[2] += new_copied
+        print(f"{name:<18}{len(pcm) / 1024:>9.0f}{old_copied / 1024:>11.0f}{new_copied / 1024:>10.0f}"
+              f"{old_peak / 1024:>9.0f}{new_peak / 1024:>10.0f}{old_ms:>9.2f}{new_ms:>10.2f}")
+
+    print(f"\nBytes copied per byte captured: before {totals[1] / totals[0]:.1f}x, after {totals[2] / totals[0]:.1f}x")
@@ -0,0 +1,134 @@
+"""
+ASR invocations per hour with and without the idle gate.
+
+Replays a long recording through a simulation of the wake-word loop:
+capture starts on the first 1024-sample chunk above the energy threshold
+(0.5 s timeout), takes a 2 s segment, and either sends every segment to
+ASR (static threshold of 300, the old behaviour) or only what IdleGate
+forwards, including its buffered back-off windows. Without --wav a synthetic room is
+used: a fan throughout, a stretch of music, and short utterances every
+~30 s, so recall on the utterances is reported too.
+
+Example:
+    python benchmarks/bench_idle_gate.py --minutes 30
+    python benchmarks/bench_idle_gate.py --wav living_room.wav
+"""
+import argparse
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_preprocess import SAMPLE_RATE, frame_rms, pcm_to_float32  # noqa: E402
+from idle_gate import IdleGate  # noqa: E402
+
+CHUNK = 1024
+SEGMENT = 2 * SAMPLE_RATE
+TIMEOUT_CHUNKS = int(0.5 * SAMPLE_RATE / CHUNK)
+PRE_ROLL = int(0.3 * SAMPLE_RATE)
+
+
+def synthetic_room(minutes, seed=0):
+    """Fan noise with music in the middle third and an utterance every ~30 s; returns (samples, speech spans)."""
+    rng = np.random.default_rng(seed)
+    n = int(minutes * 60 * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    audio = np.convolve(rng.normal(0, 0.06, n), np.ones(8) / 8, "same") + 0.01 * np.sin(2 * np.pi * 120 * t)
+    audio[n // 3:2 * n // 3] += 0.05 * (np.sin(2 * np.pi * 440 * t[n // 3:2 * n // 3]) +
+                                        np.sin(2 * np.pi * 660 * t[n // 3:2 * n // 3]))
+
+    spans = []
+    starts = np.arange(10, minutes * 60 - 15, 30.0)
+    for start in starts + rng.uniform(0, 10, len(starts)):
+        begin, length = int(start * SAMPLE_RATE), int(rng.uniform(0.6, 1.5) * SAMPLE_RATE)
+        u = np.arange(length) / SAMPLE_RATE
+        phase = 2 * np.pi * np.cumsum(rng.uniform(110, 220) + 30 * np.sin(2 * np.pi * u)) / SAMPLE_RATE
+        voice = sum(np.sin(k * phase) / k for k in range(1, 15)) * np.clip(np.sin(2 * np.pi * 4 * u), 0, None) ** 0.5
+        audio[begin:begin + length] += 0.1 * voice
+        spans.append((begin, begin + length))
+    return audio.astype(np.float32), spans
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav:
+        return pcm_to_float32(wav.readframes(wav.getnframes()), wav.getframerate(),
+                              wav.getsampwidth(), wav.getnchannels())
+
+
+def simulate(audio, spans, gate=None):
+    """Run the wake loop over the audio; returns (segments, ASR calls, seconds backed off, utterances sent, gate s)."""
+    chunk_energy = frame_rms(audio, CHUNK) * 32768
+    position, segments, calls, backoff, gate_seconds = 0, 0, 0, 0.0, 0.0
+    heard = set()
+    if gate:
+        gate.calibrate(audio[:int(1.5 * SAMPLE_RATE)])
+
+    def forward(begin, end):
+        nonlocal calls
+        calls += 1
+        heard.update(index for index, (start, stop) in enumerate(spans) if start < end and stop > begin)
+
+    def check(segment):
+        nonlocal segments, gate_seconds
+        segments += 1
+        start = time.perf_counter()
+        forwarded = gate.check(segment)
+        gate_seconds += time.perf_counter() - start
+        return forwarded
+
+    while position + SEGMENT < len(audio):
+        if gate and gate.interval:
+            # Backed off: the interval is buffered and checked in one pass, the mic stays open
+            begin = position
+            position += int(gate.interval * SAMPLE_RATE)
+            backoff += gate.interval
+            if check(audio[begin:position]):
+                # The rest of the wake window is recorded before ASR runs
+                position = max(position, begin + SEGMENT)
+                forward(begin, position)
+            continue
+
+        threshold = gate.energy_threshold() if gate else 300
+        first = position // CHUNK
+        above = np.flatnonzero(chunk_energy[first:first + TIMEOUT_CHUNKS] > threshold)
+        if len(above) == 0:
+            position += TIMEOUT_CHUNKS * CHUNK
+            if gate:
+                # The pre-roll ring holds the last 0.3 s heard while waiting
+                gate.quiet(audio[position - PRE_ROLL:position])
+            continue
+
+        onset = (first + above[0]) * CHUNK
+        begin = max(0, onset - PRE_ROLL)
+        position = onset + SEGMENT
+        if gate and not check(audio[begin:position]):
+            continue
+        if not gate:
+            segments += 1
+        forward(begin, position)
+    return segments, calls, backoff, len(heard), gate_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the wake-word loop with and without the idle gate.")
+    parser.add_argument("--wav", help="Long recording of the room (default: synthetic fan/music/speech)")
+    parser.add_argument("--minutes", type=float, default=20.0, help="Length of the synthetic room")
+    args = parser.parse_args()
+
+    if args.wav:
+        audio, spans = load_wav(args.wav), []
+    else:
+        audio, spans = synthetic_room(args.minutes)
+    hours = len(audio) / SAMPLE_RATE / 3600
+
+    print(f"{len(audio) / SAMPLE_RATE / 60:.1f} min of audio" + (f", {len(spans)} utterances" if spans else ""))
+    print(f"{'loop':<8}{'segments':>10}{'ASR calls':>11}{'per hour':>10}{'backed off':>12}"
+          f"{'utterances':>12}{'gate ms/seg':>13}")
+    for name, gate in (("static", None), ("gated", IdleGate())):
+        segments, calls, backoff, heard, gate_seconds = simulate(audio, spans, gate)
+        utterances = f"{heard}/{len(spans)}" if spans else "-"
+        print(f"{name:<8}{segments:>10}{calls:>11}{calls / hours:>10.0f}{backoff / (hours * 3600):>12.0%}"
+              f"{utterances:>12}{gate_seconds * 1000 / max(1, segments):>13.2f}")
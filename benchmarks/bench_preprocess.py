@@ -0,0 +1,74 @@
+"""
+Seconds dropped and ASR speedup from the preprocessing stage.
+
+Transcribes every clip twice with Whisper, raw and after preprocess(), and
+reports the audio dropped per utterance, the decode time of each path and
+whether the transcript changed.
+
+Example:
+    python benchmarks/bench_preprocess.py --wav-dir clips --model base --denoise
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_preprocess import SAMPLE_RATE, pcm_to_float32, preprocess  # noqa: E402
+
+
+def load_clip(path):
+    """Load a 16-bit WAV file as 16 kHz mono float32."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        pcm = wav.readframes(wav.getnframes())
+        return pcm_to_float32(pcm, wav.getframerate(), 2, wav.getnchannels())
+
+
+def timed_transcribe(model, samples):
+    if len(samples) == 0:
+        return "", 0.0
+    start = time.perf_counter()
+    text = model.transcribe(samples, fp16=False)["text"].strip()
+    return text, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark silence trimming / noise reduction before ASR.")
+    parser.add_argument("--wav-dir", required=True, help="Directory of 16-bit WAV clips")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--denoise", action="store_true", help="Also apply spectral gating")
+    args = parser.parse_args()
+
+    import whisper
+    model = whisper.load_model(args.model)
+
+    paths = sorted(glob.glob(os.path.join(args.wav_dir, "*.wav")))
+    if not paths:
+        sys.exit(f"No WAV files found in {args.wav_dir}")
+
+    # Warm up so the first clip does not carry model initialisation
+    timed_transcribe(model, load_clip(paths[0]))
+
+    total_raw = total_processed = 0.0
+    print(f"{'clip':<28}{'in s':>7}{'kept s':>8}{'raw ms':>9}{'prep ms':>9}  same text")
+    for path in paths:
+        raw = load_clip(path)
+        start = time.perf_counter()
+        processed = preprocess(raw, trim=True, denoise=args.denoise, verbose=False)
+        prep_time = time.perf_counter() - start
+
+        raw_text, raw_time = timed_transcribe(model, raw)
+        processed_text, processed_time = timed_transcribe(model, processed)
+        processed_time += prep_time
+        total_raw += raw_time
+        total_processed += processed_time
+
+        print(f"{os.path.basename(path)[:27]:<28}{len(raw) / SAMPLE_RATE:>7.2f}{len(processed) / SAMPLE_RATE:>8.2f}"
+              f"{raw_time * 1000:>9.0f}{processed_time * 1000:>9.0f}  {'yes' if raw_text == processed_text else 'NO'}")
+
+    print(f"\nTotal ASR time: raw {total_raw:.2f}s, preprocessed {total_processed:.2f}s "
+          f"(speedup x{total_raw / max(total_processed, 1e-9):.2f})")
@@ -0,0 +1,100 @@
+"""
+Precision/recall and per-call cost of wake-word matching.
+
+Scores every transcript in a labeled corpus (JSON lines with "text" and
+"wake") with the legacy WakeWordDetector normalization/similarity and with
+WakeWordMatcher, at the detector's confidence threshold.
+
+Example:
+    python benchmarks/bench_wake_matcher.py --threshold 0.7
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wake_matcher import WakeWordMatcher  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_similarity(text, wake_word="serina"):
+    """The scoring WakeWordDetector used before WakeWordMatcher, kept for comparison."""
+    if not text:
+        return 0.0
+    text = re.sub(r'[^\w\s]', '', text.lower())
+    variations = {
+        'serena': 'serina', 'sarina': 'serina', 'serina': 'serina',
+        'sirena': 'serina', 'marina': 'serina', 'arena': 'serina',
+    }
+    for variant, target in variations.items():
+        text = text.replace(variant, target)
+    text = text.strip()
+    if not text:
+        return 0.0
+    if wake_word in text:
+        return 1.0
+    best_score = 0.0
+    for word in text.split():
+        if len(word) >= 3:
+            common_chars = sum(1 for c in wake_word if c in word)
+            best_score = max(best_score, common_chars / max(len(wake_word), len(word)))
+    return best_score
+
+
+def evaluate(name, scorer, corpus, threshold, repeats):
+    """Print precision, recall and mean cost per call for one scorer."""
+    tp = fp = fn = 0
+    misses = []
+    for item in corpus:
+        predicted = scorer(item["text"]) >= threshold
+        if predicted and item["wake"]:
+            tp += 1
+        elif predicted:
+            fp += 1
+            misses.append(f"FP {item['text']!r}")
+        elif item["wake"]:
+            fn += 1
+            misses.append(f"FN {item['text']!r}")
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in corpus:
+            scorer(item["text"])
+    per_call_us = (time.perf_counter() - start) / (repeats * len(corpus)) * 1e6
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    print(f"{name:<10}{precision:>11.3f}{recall:>8.3f}{fp:>5}{fn:>5}{per_call_us:>12.1f}")
+    return misses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark wake-word matching on a labeled corpus.")
+    parser.add_argument("--corpus", default=os.path.join(HERE, "wake_corpus.jsonl"))
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    # A fresh matcher per pass would hide its token cache, so measure the steady state
+    matcher = WakeWordMatcher({"serina": ["serena", "sarina", "sirena"]})
+
+    print(f"Corpus: {len(corpus)} transcripts ({sum(item['wake'] for item in corpus)} wake) | threshold {args.threshold}")
+    print(f"{'scorer':<10}{'precision':>11}{'recall':>8}{'FP':>5}{'FN':>5}{'us/call':>12}")
+    results = {
+        "legacy": evaluate("legacy", legacy_similarity, corpus, args.threshold, args.repeats),
+        "phonetic": evaluate("phonetic", matcher.score, corpus, args.threshold, args.repeats),
+    }
+
+    if args.show_errors:
+        for name, misses in results.items():
+            print(f"\n{name} errors:")
+            for miss in misses:
+                print(f"  {miss}")
@@ -0,0 +1,185 @@
+"""
+Latency and accuracy of wake-word verification on recorded wake windows.
+
+Compares the current path (transcribe the window with Whisper tiny, then
+fuzzy-match the text with WakeWordMatcher) against WakeWordVerifier, which
+scores the wake-word candidates against the audio without transcribing.
+Both go through the same in-process scheduler on the same preprocessed
+audio. With "asr_backend": "whisper" that is one loaded model; other
+backends expose no decoder logits, so the verifier then loads a PyTorch
+copy of the model for scoring and the comparison is across engines.
+
+The corpus is JSON lines with "audio" (a WAV path, relative to the corpus
+file) and "wake" (bool), one recorded wake window per line. --calibrate fits
+the verifier's logistic calibration to the corpus and prints the value for
+"wake_verify_calibration" in settings.json.
+
+Example:
+    python benchmarks/bench_wake_verify.py --corpus wake_clips/corpus.jsonl --calibrate
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asr_scheduler import get_scheduler  # noqa: E402
+from audio_preprocess import pcm_to_float32, preprocess  # noqa: E402
+from wake_matcher import WakeWordMatcher  # noqa: E402
+from wake_verifier import WakeWordVerifier  # noqa: E402
+
+WAKE_WORDS = {"serina": ["serena", "sarina", "sirena"]}
+
+
+def load_corpus(path):
+    """Load (name, samples, wake) for every clip in the corpus, preprocessed like live audio."""
+    base = os.path.dirname(os.path.abspath(path))
+    clips = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            with wave.open(os.path.join(base, item["audio"]), "rb") as wav:
+                samples = pcm_to_float32(wav.readframes(wav.getnframes()), wav.getframerate(),
+                                         wav.getsampwidth(), wav.getnchannels())
+            clips.append((item["audio"], preprocess(samples, verbose=False), bool(item["wake"])))
+    return clips
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def evaluate(name, scorer, clips, threshold):
+    """Print precision, recall and latency for one verification path; return (score, wake) pairs."""
+    tp = fp = fn = 0
+    latencies, scored, misses = [], [], []
+    for clip_name, samples, wake in clips:
+        start = time.perf_counter()
+        score, label = scorer(samples) if len(samples) else (0.0, "")
+        latencies.append((time.perf_counter() - start) * 1000)
+        scored.append((score, wake))
+
+        predicted = score >= threshold
+        if predicted and wake:
+            tp += 1
+        elif predicted:
+            fp += 1
+            misses.append(f"FP {clip_name} {label!r} {score:.2f}")
+        elif wake:
+            fn += 1
+            misses.append(f"FN {clip_name} {label!r} {score:.2f}")
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    print(f"{name:<12}{precision:>11.3f}{recall:>8.3f}{fp:>5}{fn:>5}"
+          f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.95):>9.1f}")
+    return scored, misses
+
+
+def fit_calibration(pairs, iterations=50):
+    """
+    Platt scaling: fit p = sigmoid(scale * (llr - offset)) by Newton's method.
+
+    Args:
+        pairs (list): (llr, wake) for every clip
+
+    Returns:
+        tuple: (scale, offset)
+    """
+    # Parameterized as sigmoid(a * x + c); a small ridge keeps separable corpora finite
+    a, c, ridge = 1.0, 0.0, 1e-3
+    for _ in range(iterations):
+        grad_a = grad_c = h_aa = h_ac = h_cc = 0.0
+        for x, y in pairs:
+            p = 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, a * x + c))))
+            w = p * (1.0 - p)
+            grad_a += (p - y) * x
+            grad_c += p - y
+            h_aa += w * x * x
+            h_ac += w * x
+            h_cc += w
+        grad_a += ridge * a
+        h_aa += ridge
+        h_cc += ridge
+        det = h_aa * h_cc - h_ac * h_ac
+        if det <= 0:
+            break
+        step_a = (h_cc * grad_a - h_ac * grad_c) / det
+        step_c = (h_aa * grad_c - h_ac * grad_a) / det
+        a, c = a - step_a, c - step_c
+        if abs(step_a) + abs(step_c) < 1e-8:
+            break
+    return a, -c / a
+
+
+def brier(pairs):
+    return sum((p - y) ** 2 for p, y in pairs) / len(pairs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark wake-word verification on recorded clips.")
+    parser.add_argument("--corpus", required=True, help="JSON lines with 'audio' (WAV path) and 'wake'")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--calibrate", action="store_true", help="Fit wake_verify_calibration on the corpus")
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    clips = load_corpus(args.corpus)
+    if not clips:
+        sys.exit(f"No clips in {args.corpus}")
+
+    scheduler = get_scheduler(args.model)
+    verifier = WakeWordVerifier(WAKE_WORDS, model=args.model)
+    # Score on the scheduler's model even if settings.json sends live audio to worker processes
+    verifier.use_workers = False
+    matcher = WakeWordMatcher(WAKE_WORDS)
+
+    # Warm-up: first decode loads the model, first verify builds the candidate batch and silence baseline
+    scheduler.transcribe(clips[0][1], language=args.language)
+    verifier.verify(clips[0][1], language=args.language)
+
+    def transcribe_path(samples):
+        text = scheduler.transcribe(samples, language=args.language)
+        return matcher.score([text]) if text else 0.0, text
+
+    llrs = []
+
+    def score_path(samples):
+        result = verifier.verify(samples, language=args.language)
+        llrs.append(result.llr)
+        return result.confidence, result.phrase
+
+    print(f"Corpus: {len(clips)} clips ({sum(clip[2] for clip in clips)} wake) | "
+          f"{scheduler.backend.describe()} | threshold {args.threshold}")
+    print(f"{'path':<12}{'precision':>11}{'recall':>8}{'FP':>5}{'FN':>5}{'p50 ms':>9}{'p95 ms':>9}")
+    results = {
+        "transcribe": evaluate("transcribe", transcribe_path, clips, args.threshold),
+        "score": evaluate("score", score_path, clips, args.threshold),
+    }
+
+    if args.calibrate:
+        # Silent clips never reach the verifier, so pair LLRs with the clips that were scored
+        labels = [wake for _name, samples, wake in clips if len(samples)]
+        pairs = list(zip(llrs, labels))
+        if len(set(labels)) < 2:
+            sys.exit("Calibration needs both wake and non-wake clips")
+        scale, offset = fit_calibration(pairs)
+        before = [(verifier.calibrate(llr), wake) for llr, wake in pairs]
+        verifier.scale, verifier.offset = scale, offset
+        after = [(verifier.calibrate(llr), wake) for llr, wake in pairs]
+        print(f"\nCalibration: Brier {brier(before):.3f} -> {brier(after):.3f} (fitted on this corpus)")
+        print(f'  "wake_verify_calibration": [{scale:.3f}, {offset:.3f}]')
+
+    if args.show_errors:
+        for name, (_scored, misses) in results.items():
+            print(f"\n{name} errors:")
+            for miss in misses:
+                print(f"  {miss}")
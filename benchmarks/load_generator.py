@@ -0,0 +1,173 @@
+"""
+Load generator for server.py.
+
+Drives N simulated sessions, each streaming WAV utterances to the server and
+waiting for the spoken reply, then reports throughput and tail latency.
+
+Example:
+    python benchmarks/load_generator.py --wav-dir clips --sessions 8 --turns 5 --spawn-server
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import wave
+
+import websockets
+
+from api_stub import StubConfig, start_stub_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRAME_SECONDS = 0.02
+
+
+def load_wav(path):
+    """
+    Load a mono 16-bit WAV file.
+
+    Returns:
+        tuple: (pcm_bytes, sample_rate)
+    """
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected mono 16-bit PCM")
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_session(index, url, clips, turns, realtime, results):
+    """Run one simulated session for a number of turns."""
+    async with websockets.connect(url, max_size=2 ** 24) as websocket:
+        pcm, sample_rate = clips[index % len(clips)]
+        await websocket.send(json.dumps({
+            "type": "hello", "sample_rate": sample_rate, "sample_width": 2, "voice": "nova"
+        }))
+        json.loads(await websocket.recv())  # ready
+
+        frame_bytes = int(sample_rate * FRAME_SECONDS) * 2
+        for turn in range(turns):
+            pcm, sample_rate = clips[(index + turn) % len(clips)]
+            for offset in range(0, len(pcm), frame_bytes):
+                await websocket.send(pcm[offset:offset + frame_bytes])
+                if realtime:
+                    await asyncio.sleep(FRAME_SECONDS)
+            ended = time.perf_counter()
+            await websocket.send(json.dumps({"type": "end"}))
+
+            first_audio = None
+            while True:
+                message = await websocket.recv()
+                if isinstance(message, bytes):
+                    if first_audio is None:
+                        first_audio = time.perf_counter() - ended
+                    continue
+                event = json.loads(message)
+                if event["type"] in ("done", "error"):
+                    results.append({
+                        "ok": event["type"] == "done",
+                        "first_audio": first_audio,
+                        "total": time.perf_counter() - ended,
+                        "timings": event.get("timings", {})
+                    })
+                    break
+
+
+async def run_load(url, clips, sessions, turns, realtime):
+    """Run all sessions concurrently and return per-turn results and wall time."""
+    results = []
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(run_session(i, url, clips, turns, realtime, results) for i in range(sessions)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    failures = [o for o in outcomes if isinstance(o, Exception)]
+    for failure in failures:
+        print(f"❌ Session failed: {failure}")
+    return results, elapsed
+
+
+def print_report(results, elapsed, sessions):
+    """Print throughput and latency percentiles."""
+    ok = [r for r in results if r["ok"]]
+    print("\n=== Load test report ===")
+    print(f"Sessions: {sessions} | Turns completed: {len(ok)} | Errors: {len(results) - len(ok)}")
+    print(f"Wall time: {elapsed:.1f} s | Throughput: {len(ok) / elapsed:.2f} turns/s")
+
+    series = {
+        "first audio": [r["first_audio"] * 1000 for r in ok if r["first_audio"] is not None],
+        "turn total": [r["total"] * 1000 for r in ok],
+    }
+    for stage in ("asr_ms", "llm_ms", "tts_ms"):
+        series[stage] = [r["timings"][stage] for r in ok if stage in r["timings"]]
+
+    print(f"{'latency (ms)':<14}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, values in series.items():
+        if values:
+            print(f"{name:<14}{statistics.median(values):>9.0f}{percentile(values, 95):>9.0f}"
+                  f"{percentile(values, 99):>9.0f}{max(values):>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive N simulated Serina sessions against server.py.")
+    parser.add_argument("--wav-dir", required=True, help="Directory of mono 16-bit WAV utterances")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--realtime", action="store_true", help="Stream audio at real-time pace")
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="Start server.py against local API stubs instead of using a running one")
+    parser.add_argument("--asr-model", default="tiny")
+    parser.add_argument("--asr-pool-size", type=int, default=1)
+    parser.add_argument("--asr-batch-window-ms", type=float, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    clips = [load_wav(path) for path in sorted(glob.glob(os.path.join(args.wav_dir, "*.wav")))]
+    if not clips:
+        sys.exit(f"No WAV files found in {args.wav_dir}")
+
+    server_process = None
+    if args.spawn_server:
+        stub, base_url = start_stub_server(config=StubConfig(args.llm_latency, args.tts_latency))
+        port = args.url.rsplit(":", 1)[-1]
+        env = dict(os.environ, gpt_redirect_url=base_url, gpt_api_key="stub")
+        server_process = subprocess.Popen(
+            [sys.executable, "server.py", "--port", port, "--asr-model", args.asr_model,
+             "--asr-pool-size", str(args.asr_pool_size),
+             "--asr-batch-window-ms", str(args.asr_batch_window_ms), "--max-sessions", str(args.sessions)],
+            cwd=REPO_ROOT, env=env
+        )
+
+    try:
+        if server_process:
+            # Wait for the server to load its models and start accepting connections
+            async def wait_for_server():
+                while True:
+                    try:
+                        async with websockets.connect(args.url):
+                            return
+                    except OSError:
+                        await asyncio.sleep(0.5)
+            asyncio.run(asyncio.wait_for(wait_for_server(), timeout=300))
+
+        results, elapsed = asyncio.run(run_load(args.url, clips, args.sessions, args.turns, args.realtime))
+        print_report(results, elapsed, args.sessions)
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.wait()
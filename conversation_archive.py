@@ -0,0 +1,356 @@
+"""
+Durable conversation archive.
+
+Every turn (transcript, response and per-stage timings) is appended to a
+SQLite database in WAL mode with an FTS5 index over transcripts and
+responses. Turns are handed to a background writer thread that batches
+inserts into one transaction, so archiving never sits on a turn's critical
+path. chat_history.json stays the short rolling context for the LLM; this
+is the long-term record.
+
+    python conversation_archive.py search "weather tomorrow"
+    python conversation_archive.py recent --limit 20
+    python conversation_archive.py stats --output stats.json
+"""
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+from json_handle import read_settings
+
+TIMING_COLUMNS = ("wake_ms", "asr_ms", "llm_ms", "tts_ms", "total_ms")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    voice TEXT,
+    llm_model TEXT,
+    user_text TEXT NOT NULL,
+    response TEXT NOT NULL,
+    wake_ms REAL,
+    asr_ms REAL,
+    llm_ms REAL,
+    tts_ms REAL,
+    total_ms REAL
+);
+CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, created_at);
+CREATE INDEX IF NOT EXISTS turns_created ON turns (created_at);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    user_text, response, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts (rowid, user_text, response) VALUES (new.id, new.user_text, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts (turns_fts, rowid, user_text, response)
+    VALUES ('delete', old.id, old.user_text, old.response);
+END;
+"""
+
+INSERT = f"""
+INSERT INTO turns (session_id, source, created_at, voice, llm_model, user_text, response, {", ".join(TIMING_COLUMNS)})
+VALUES (?, ?, ?, ?, ?, ?, ?, {", ".join("?" for _ in TIMING_COLUMNS)})
+"""
+
+
+def connect(path):
+    """
+    Open the archive, creating the schema if needed.
+
+    Returns:
+        tuple: (sqlite3.Connection, has_fts) - has_fts is False when SQLite lacks FTS5
+    """
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    # WAL lets the query CLI read while the assistant is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    try:
+        connection.executescript(FTS_SCHEMA)
+        has_fts = True
+    except sqlite3.OperationalError:
+        has_fts = False
+    connection.commit()
+    return connection, has_fts
+
+
+class ConversationArchive:
+    def __init__(self, path="conversations.db", batch_size=32, flush_interval=1.0, max_pending=10000):
+        """
+        Archive writer with a background batching thread.
+
+        Args:
+            path (str): SQLite database file
+            batch_size (int): Most turns written in one transaction
+            flush_interval (float): Longest a queued turn waits before being written, in seconds
+            max_pending (int): Turns queued before new ones are dropped
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.dropped = 0
+        self._closed = threading.Event()
+
+        # Create the schema up front so a bad path fails here, not in the writer thread
+        connection, self.has_fts = connect(path)
+        connection.close()
+
+        self.writer = threading.Thread(target=self._write_loop, name="archive-writer", daemon=True)
+        self.writer.start()
+
+    def record_turn(self, session_id, user_text, response, source="main", voice=None, llm_model=None,
+                    created_at=None, **timings):
+        """
+        Queue one turn for archiving; returns immediately.
+
+        Args:
+            session_id (str): Conversation/session identifier
+            user_text (str): What the user said
+            response (str): What Serina answered
+            source (str): Which front end produced the turn ("main", "server")
+            voice (str): TTS voice used
+            llm_model (str): Chat model used
+            created_at (float): Unix time of the turn, defaults to now
+            **timings: Stage timings in ms: wake_ms, asr_ms, llm_ms, tts_ms, total_ms
+
+        Returns:
+            bool: False if the turn was dropped because the writer is too far behind
+        """
+        row = (
+            session_id, source, created_at or time.time(), voice, llm_model, user_text, response,
+            *(timings.get(column) for column in TIMING_COLUMNS)
+        )
+        try:
+            self.pending.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        """Writer thread: drain the queue in batches, one transaction per batch."""
+        connection, _ = connect(self.path)
+        try:
+            while not (self._closed.is_set() and self.pending.empty()):
+                try:
+                    batch = [self.pending.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                # Whatever else arrives within the flush interval rides along
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed.is_set():
+                        break
+                    try:
+                        batch.append(self.pending.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                try:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    self.dropped += len(batch)
+                    print(f"❌ Error writing conversation archive: {e}")
+                finally:
+                    for _ in batch:
+                        self.pending.task_done()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Block until every queued turn has been written."""
+        self.pending.join()
+
+    def close(self, timeout=5.0):
+        """Write out what is queued and stop the writer thread."""
+        self._closed.set()
+        self.writer.join(timeout)
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """
+    The process-wide archive, opened on first use.
+
+    Returns:
+        ConversationArchive: The archive, or None if "conversation_archive" is empty in settings.json
+    """
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            path = read_settings("conversation_archive")
+            if not path:
+                return None
+            try:
+                _archive = ConversationArchive(path)
+            except sqlite3.Error as e:
+                print(f"❌ Conversation archive unavailable: {e}")
+                return None
+        return _archive
+
+
+def close_archive():
+    """Flush and close the process-wide archive if it was opened."""
+    global _archive
+    with _archive_lock:
+        if _archive is not None:
+            _archive.close()
+            _archive = None
+
+
+def search(connection, query, limit=10, has_fts=True):
+    """
+    Full-text search over transcripts and responses, best matches first.
+
+    Args:
+        connection (sqlite3.Connection): Open archive
+        query (str): FTS5 query ("weather", "rain OR snow", "\"turn off\"")
+        limit (int): Most rows returned
+        has_fts (bool): Fall back to LIKE when FTS5 is unavailable
+
+    Returns:
+        list: sqlite3.Row objects
+    """
+    if has_fts:
+        return connection.execute(
+            """SELECT turns.*, snippet(turns_fts, -1, '[', ']', '…', 12) AS snippet
+               FROM turns_fts JOIN turns ON turns.id = turns_fts.rowid
+               WHERE turns_fts MATCH ? ORDER BY bm25(turns_fts) LIMIT ?""",
+            (query, limit),
+        ).fetchall()
+    pattern = f"%{query}%"
+    return connection.execute(
+        """SELECT *, user_text AS snippet FROM turns
+           WHERE user_text LIKE ? OR response LIKE ? ORDER BY created_at DESC LIMIT ?""",
+        (pattern, pattern, limit),
+    ).fetchall()
+
+
+def recent(connection, limit=10, session_id=None):
+    """Latest turns, newest first, optionally for one session."""
+    if session_id:
+        return connection.execute(
+            "SELECT * FROM turns WHERE session_id = ? ORDER BY created_at DESC LIMIT ?", (session_id, limit)
+        ).fetchall()
+    return connection.execute("SELECT * FROM turns ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def stats(connection, since=None):
+    """
+    Aggregate counts and per-stage latency percentiles.
+
+    Args:
+        connection (sqlite3.Connection): Open archive
+        since (float): Only turns after this Unix time
+
+    Returns:
+        dict: Totals, per-source and per-day counts, and p50/p95/mean per timing column
+    """
+    where, params = ("WHERE created_at >= ?", (since,)) if since else ("", ())
+    totals = connection.execute(
+        f"SELECT COUNT(*) AS turns, COUNT(DISTINCT session_id) AS sessions, "
+        f"MIN(created_at) AS first, MAX(created_at) AS last FROM turns {where}", params
+    ).fetchone()
+
+    result = {
+        "turns": totals["turns"],
+        "sessions": totals["sessions"],
+        "first": totals["first"],
+        "last": totals["last"],
+        "by_source": {row["source"]: row["n"] for row in connection.execute(
+            f"SELECT source, COUNT(*) AS n FROM turns {where} GROUP BY source", params
+        )},
+        "by_day": {row["day"]: row["n"] for row in connection.execute(
+            f"SELECT date(created_at, 'unixepoch', 'localtime') AS day, COUNT(*) AS n "
+            f"FROM turns {where} GROUP BY day ORDER BY day", params
+        )},
+        "timings_ms": {},
+    }
+
+    for column in TIMING_COLUMNS:
+        values = [row[0] for row in connection.execute(
+            f"SELECT {column} FROM turns {where} {'AND' if where else 'WHERE'} {column} IS NOT NULL "
+            f"ORDER BY {column}", params
+        )]
+        if values:
+            result["timings_ms"][column] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 1),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+            }
+    return result
+
+
+def _print_turns(rows):
+    for row in rows:
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created_at"]))
+        print(f"[{stamp}] {row['source']}/{row['session_id']}")
+        print(f"  🗣️ {row['user_text']}")
+        print(f"  🤖 {row['response'][:200]}{'...' if len(row['response']) > 200 else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and summarize archived conversations.")
+    parser.add_argument("--db", default=read_settings("conversation_archive") or "conversations.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = commands.add_parser("search", help="Full-text search over transcripts and responses")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=10)
+
+    recent_parser = commands.add_parser("recent", help="Show the latest turns")
+    recent_parser.add_argument("--limit", type=int, default=10)
+    recent_parser.add_argument("--session", help="Only this session id")
+
+    stats_parser = commands.add_parser("stats", help="Turn counts and latency percentiles")
+    stats_parser.add_argument("--days", type=float, help="Only the last N days")
+    stats_parser.add_argument("--output", help="Write stats as JSON to this file")
+    args = parser.parse_args()
+
+    db, has_fts = connect(args.db)
+    try:
+        if args.command == "search":
+            rows = search(db, args.query, args.limit, has_fts)
+            _print_turns(rows)
+            print(f"\n{len(rows)} match(es)")
+        elif args.command == "recent":
+            _print_turns(recent(db, args.limit, args.session))
+        else:
+            since = time.time() - args.days * 86400 if args.days else None
+            summary = stats(db, since)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    json.dump(summary, f, indent=2)
+                print(f"✅ Stats written to {args.output}")
+            else:
+                print(json.dumps(summary, indent=2))
+    except sqlite3.OperationalError as e:
+        print(f"❌ Query failed: {e}")
+    finally:
+        db.close()
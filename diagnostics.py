@@ -0,0 +1,307 @@
+"""
+On-demand diagnostics for the running assistant.
+
+Nothing runs until asked for. While the assistant is running:
+
+    kill -USR1 <pid>                        sample stacks for diagnostics_profile_seconds
+    kill -USR2 <pid>                        memory snapshot diffed against the baseline
+    python diagnostics.py profile 30        same, through the local control socket
+    python diagnostics.py memory            (needs "diagnostics_port" in settings.json;
+    python diagnostics.py baseline           the socket is the only option on Windows)
+
+The profiler is a sampling profiler: a background thread reads every
+thread's stack with sys._current_frames() at a fixed rate, so the code being
+profiled is never instrumented. Samples are grouped by pipeline stage
+(wake, listen, llm, tts, ... as marked with stage()) or by thread name for
+worker threads, and written as collapsed stacks that flamegraph.pl,
+speedscope or inferno read directly.
+
+Memory snapshots use tracemalloc plus live object counts per type, each
+diffed against a baseline, which shows both which lines allocate and which
+objects (AudioData, numpy arrays, ...) pile up.
+"""
+import argparse
+import collections
+import contextlib
+import gc
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+
+from json_handle import read_settings
+
+# Pipeline stage each thread is currently in, by thread id
+_stages = {}
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Mark the calling thread as working on a pipeline stage, for the profiler.
+
+    Args:
+        name (str): Stage name, e.g. "wake", "listen", "llm", "tts"
+    """
+    thread_id = threading.get_ident()
+    previous = _stages.get(thread_id)
+    _stages[thread_id] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            _stages.pop(thread_id, None)
+        else:
+            _stages[thread_id] = previous
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class Diagnostics:
+    def __init__(self, directory="diagnostics", interval=0.01, trace_frames=10):
+        """
+        Sampling profiler and memory snapshots, started on demand.
+
+        Args:
+            directory (str): Where reports are written
+            interval (float): Seconds between stack samples
+            trace_frames (int): Frames tracemalloc keeps per allocation
+        """
+        self.directory = directory
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.profiling = threading.Event()
+        self.baseline = None
+        self.baseline_types = None
+        self.lock = threading.Lock()
+
+    def _path(self, kind, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+    def start_profile(self, seconds=30):
+        """
+        Sample all threads for a while in the background, then write the report.
+
+        Returns:
+            bool: False if a profile is already running
+        """
+        with self.lock:
+            if self.profiling.is_set():
+                return False
+            self.profiling.set()
+        threading.Thread(target=self._profile, args=(seconds,), name="diagnostics-profiler", daemon=True).start()
+        print(f"🔬 Profiling for {seconds}s...")
+        return True
+
+    def _profile(self, seconds):
+        own_id = threading.get_ident()
+        samples = collections.Counter()
+        started = time.perf_counter()
+        sample_count = 0
+        try:
+            while time.perf_counter() - started < seconds:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.reverse()
+                    # Marked stages group the main pipeline; workers are grouped by thread name
+                    group = _stages.get(thread_id) or names.get(thread_id, f"thread-{thread_id}")
+                    samples[(group, ";".join(stack))] += 1
+                sample_count += 1
+                time.sleep(self.interval)
+            self._write_profile(samples, sample_count, time.perf_counter() - started)
+        except Exception as e:
+            print(f"❌ Profiling failed: {e}")
+        finally:
+            self.profiling.clear()
+
+    def _write_profile(self, samples, sample_count, elapsed):
+        """Write collapsed stacks (all stages and one file per stage) plus a text summary."""
+        path = self._path("profile", ".folded")
+        by_stage = collections.defaultdict(list)
+        with open(path, "w", encoding="utf-8") as f:
+            for (group, stack), count in samples.most_common():
+                f.write(f"{group};{stack} {count}\n")
+                by_stage[group].append((stack, count))
+
+        base = path[:-len(".folded")]
+        for group, stacks in by_stage.items():
+            safe_group = "".join(char if char.isalnum() or char in "-_" else "_" for char in group)
+            with open(f"{base}-{safe_group}.folded", "w", encoding="utf-8") as f:
+                for stack, count in stacks:
+                    f.write(f"{stack} {count}\n")
+
+        stage_totals = collections.Counter()
+        leaf_totals = collections.Counter()
+        for (group, stack), count in samples.items():
+            stage_totals[group] += count
+            leaf_totals[stack.rsplit(";", 1)[-1]] += count
+        lines = [f"{sample_count} sampling rounds over {elapsed:.1f}s "
+                 f"({sample_count / elapsed:.0f} Hz target {1 / self.interval:.0f} Hz)", "", "Samples by stage/thread:"]
+        lines += [f"  {count:7d}  {group}" for group, count in stage_totals.most_common()]
+        lines += ["", "Top leaf frames (includes idle waits):"]
+        lines += [f"  {count:7d}  {leaf}" for leaf, count in leaf_totals.most_common(25)]
+        with open(f"{base}-summary.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"🔬 Profile written to {path} ({len(by_stage)} stages/threads)")
+
+    def take_baseline(self):
+        """Start tracemalloc if needed and remember the current allocations as the baseline."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        gc.collect()
+        self.baseline = tracemalloc.take_snapshot()
+        self.baseline_types = self._type_counts()
+        print("🧠 Memory baseline taken")
+
+    @staticmethod
+    def _type_counts():
+        return collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+
+    def memory_snapshot(self, top=30):
+        """
+        Diff current allocations and live objects against the baseline and write a report.
+
+        The first call only takes the baseline (tracemalloc is off until then).
+
+        Returns:
+            str: Report path, or None if this call took the baseline
+        """
+        if self.baseline is None:
+            self.take_baseline()
+            return None
+
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        by_line = snapshot.compare_to(self.baseline, "lineno")
+        by_trace = snapshot.compare_to(self.baseline, "traceback")
+        types = self._type_counts()
+        type_growth = sorted(((types[name] - self.baseline_types.get(name, 0), name) for name in types), reverse=True)
+
+        lines = [f"Traced memory: {current / 1e6:.1f} MB now, {peak / 1e6:.1f} MB peak", "",
+                 f"Top {top} allocation changes by line since baseline:"]
+        lines += [f"  {stat}" for stat in by_line[:top]]
+        lines += ["", "Live object count growth since baseline:"]
+        lines += [f"  {growth:+8d}  {name} ({types[name]} live)" for growth, name in type_growth[:top] if growth > 0]
+        lines += ["", "Largest growing allocation tracebacks:"]
+        for stat in by_trace[:5]:
+            lines.append(f"  {stat.size_diff / 1024:+.1f} KiB in {stat.count_diff:+d} blocks")
+            lines += [f"      {line}" for line in stat.traceback.format()]
+
+        path = self._path("memory", ".txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"🧠 Memory report written to {path} ({current / 1e6:.1f} MB traced)")
+        return path
+
+    def handle_command(self, command):
+        """
+        Run one control command: "profile [seconds]", "memory", "baseline" or "status".
+
+        Returns:
+            str: Reply for the control client
+        """
+        parts = command.split()
+        if not parts:
+            return "empty command"
+        name = parts[0].lower()
+        if name == "profile":
+            seconds = float(parts[1]) if len(parts) > 1 else read_settings("diagnostics_profile_seconds")
+            return f"profiling for {seconds}s" if self.start_profile(seconds) else "profile already running"
+        if name == "memory":
+            path = self.memory_snapshot()
+            return f"report written to {path}" if path else "baseline taken"
+        if name == "baseline":
+            self.take_baseline()
+            return "baseline taken"
+        if name == "status":
+            traced = tracemalloc.get_traced_memory()[0] / 1e6 if tracemalloc.is_tracing() else None
+            return (f"profiling={'yes' if self.profiling.is_set() else 'no'} "
+                    f"tracemalloc={'%.1f MB' % traced if traced is not None else 'off'} threads={threading.active_count()}")
+        return f"unknown command '{name}'"
+
+    def install_signal_handlers(self):
+        """SIGUSR1 starts a profile, SIGUSR2 takes a memory snapshot (POSIX only)."""
+        if not hasattr(signal, "SIGUSR1"):
+            return False
+        seconds = read_settings("diagnostics_profile_seconds")
+        # Handlers run on the main thread between bytecodes; hand the work to threads
+        signal.signal(signal.SIGUSR1, lambda *_: self.start_profile(seconds))
+        signal.signal(signal.SIGUSR2, lambda *_: threading.Thread(target=self.memory_snapshot, daemon=True).start())
+        return True
+
+    def serve_control_socket(self, port, host="127.0.0.1"):
+        """Accept line commands on a local TCP socket, one reply line per command."""
+        diagnostics = self
+
+        class ControlHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = diagnostics.handle_command(line.decode("utf-8", "replace").strip())
+                    except Exception as e:
+                        reply = f"error: {e}"
+                    self.wfile.write((reply + "\n").encode("utf-8"))
+
+        server = socketserver.ThreadingTCPServer((host, port), ControlHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="diagnostics-control", daemon=True).start()
+        print(f"🔬 Diagnostics control socket on {host}:{port}")
+        return server
+
+
+_diagnostics = None
+
+
+def enable_diagnostics():
+    """
+    Create the process-wide diagnostics and hook up the signal handlers and control socket.
+
+    Returns:
+        Diagnostics: The diagnostics instance
+    """
+    global _diagnostics
+    if _diagnostics is None:
+        _diagnostics = Diagnostics(read_settings("diagnostics_dir"))
+        _diagnostics.install_signal_handlers()
+        port = read_settings("diagnostics_port")
+        if port:
+            try:
+                _diagnostics.serve_control_socket(int(port))
+            except OSError as e:
+                print(f"❌ Diagnostics control socket unavailable: {e}")
+    return _diagnostics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a diagnostics command to the running assistant.")
+    parser.add_argument("command", nargs="+", help="profile [seconds] | memory | baseline | status")
+    parser.add_argument("--port", type=int, default=read_settings("diagnostics_port"))
+    args = parser.parse_args()
+
+    if not args.port:
+        print("❌ Set \"diagnostics_port\" in settings.json (or pass --port) to use the control socket.")
+        sys.exit(1)
+    try:
+        with socket.create_connection(("127.0.0.1", args.port), timeout=120) as connection:
+            connection.sendall((" ".join(args.command) + "\n").encode("utf-8"))
+            print(connection.makefile("r", encoding="utf-8").readline().strip())
+    except OSError as e:
+        print(f"❌ Could not reach the assistant on port {args.port}: {e}")
@@ -1,7 +1,14 @@
 from openai import OpenAI
 import httpx
+import collections
+import concurrent.futures
 import os
+import random
+import threading
+import time
 import dotenv
+from json_handle import read_settings
+from long_term_memory import format_memories
 
 # Load environment variables from .env file
 dotenv.load_dotenv()
@@ -9,31 +16,267 @@ dotenv.load_dotenv()
 redirect_url = os.getenv('gpt_redirect_url')
 api_key = os.getenv('gpt_api_key')
 
-if redirect_url:
-    client = OpenAI(
-        api_key=api_key,
-        base_url=redirect_url,
-        http_client=httpx.Client(
-            base_url=redirect_url,
-            follow_redirects=True,
-        ),
-    )
-else:
-    client = OpenAI(
-        api_key=api_key
+def make_client(base_url=None, key=None):
+    """
+    Create an OpenAI-compatible client.
+    :param base_url: Optional endpoint URL, e.g. https://api.deepseek.com/v1
+    :param key: API key for the endpoint.
+    :return: OpenAI client.
+    """
+    if base_url:
+        return OpenAI(
+            api_key=key,
+            base_url=base_url,
+            http_client=httpx.Client(
+                base_url=base_url,
+                follow_redirects=True,
+            ),
+        )
+    return OpenAI(
+        api_key=key
     )
 
-def completion_response(model, system_prompt, user_prompt, chat_history = None, prefix = None, temperature=1.0):
+client = make_client(redirect_url, api_key)
+
+# Failures in a row before an endpoint is skipped, and how long it is skipped for at most
+UNHEALTHY_AFTER_FAILURES = 2
+MAX_COOLDOWN_SECONDS = 60
+# First-token samples needed before the hedge delay follows the endpoint's own p95
+MIN_HEDGE_SAMPLES = 20
+
+class RequestCancelled(Exception):
+    pass
+
+class Endpoint:
+    def __init__(self, name, client, model=None, max_samples=200):
+        """
+        One OpenAI-compatible endpoint with latency and health tracking.
+        :param name: Name used in logs.
+        :param client: OpenAI client for the endpoint.
+        :param model: Optional model that replaces the requested one on this endpoint.
+        :param max_samples: Recent latencies kept for percentiles.
+        """
+        self.name = name
+        self.client = client.with_options(max_retries=0)  # retries are handled here, across endpoints
+        self.model = model
+        self.first_token_ms = collections.deque(maxlen=max_samples)
+        self.total_ms = collections.deque(maxlen=max_samples)
+        self.counts = {"requests": 0, "errors": 0, "hedged": 0, "won": 0, "cancelled": 0}
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.lock = threading.Lock()
+
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def percentile(self, pct, samples=None):
+        """Percentile of recent first-token latencies (or of samples) in ms, None without data."""
+        with self.lock:
+            values = sorted(self.first_token_ms if samples is None else samples)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+    def hedge_delay(self, default):
+        """Seconds to wait for a first token before hedging: the endpoint's p95 once known."""
+        if len(self.first_token_ms) < MIN_HEDGE_SAMPLES:
+            return default
+        return self.percentile(95) / 1000
+
+    def record_success(self, first_token_ms, total_ms):
+        with self.lock:
+            self.first_token_ms.append(first_token_ms)
+            self.total_ms.append(total_ms)
+            self.consecutive_failures = 0
+            self.unhealthy_until = 0.0
+
+    def record_failure(self, error):
+        with self.lock:
+            self.counts["errors"] += 1
+            self.consecutive_failures += 1
+            failures = self.consecutive_failures
+            if failures >= UNHEALTHY_AFTER_FAILURES:
+                cooldown = min(MAX_COOLDOWN_SECONDS, 2 ** (failures - UNHEALTHY_AFTER_FAILURES))
+                self.unhealthy_until = time.monotonic() + cooldown
+        print(f"❌ LLM endpoint '{self.name}' failed ({failures} in a row): {error}")
+        if failures >= UNHEALTHY_AFTER_FAILURES:
+            print(f"⚠️ LLM endpoint '{self.name}' marked unhealthy for {cooldown}s")
+
+    def summary(self):
+        counts = ", ".join(f"{name} {count}" for name, count in self.counts.items() if count)
+        if not self.first_token_ms:
+            return f"{self.name}: no successful requests ({counts or 'unused'})"
+        return (f"{self.name}: first token p50 {self.percentile(50):.0f} ms / p95 {self.percentile(95):.0f} ms, "
+                f"total p50 {self.percentile(50, self.total_ms):.0f} ms ({counts})"
+                f"{'' if self.healthy() else ', unhealthy'}")
+
+_endpoints = None
+_endpoints_lock = threading.Lock()
+# Room for a hedge next to every request the server allows in flight
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm")
+
+def get_endpoints():
+    """
+    Endpoints from "llm_endpoints" in settings.json, in priority order.
+
+    Each entry is {"name": ..., "base_url": ..., "api_key_env": ..., "model": ...}; base_url,
+    api_key_env (name of the environment variable holding the key) and model are optional.
+    With no entries the single endpoint from .env is used.
+    :return: List of Endpoint objects.
     """
-    Generate chat response using OpenAI API.
+    global _endpoints
+    with _endpoints_lock:
+        if _endpoints is None:
+            configured = read_settings("llm_endpoints") or []
+            _endpoints = [
+                Endpoint(
+                    entry.get("name") or entry.get("base_url") or "default",
+                    make_client(entry.get("base_url"), os.getenv(entry.get("api_key_env", "gpt_api_key"))),
+                    entry.get("model")
+                )
+                for entry in configured
+            ] or [Endpoint("default", client)]
+        return _endpoints
+
+def endpoint_report():
+    """Per-endpoint latency and error summary lines."""
+    return [endpoint.summary() for endpoint in _endpoints or []]
+
+def _ordered_endpoints():
+    """Healthy endpoints in priority order, then unhealthy ones by how soon they recover."""
+    endpoints = get_endpoints()
+    healthy = [endpoint for endpoint in endpoints if endpoint.healthy()]
+    resting = sorted((endpoint for endpoint in endpoints if not endpoint.healthy()), key=lambda e: e.unhealthy_until)
+    return healthy + resting
+
+class _Race:
+    def __init__(self):
+        """Picks the first request to produce a token; the others abort."""
+        self.lock = threading.Lock()
+        self.winner = None
+
+    def claim(self, endpoint):
+        with self.lock:
+            if self.winner is None:
+                self.winner = endpoint
+            return self.winner is endpoint
+
+    def lost(self, endpoint):
+        winner = self.winner
+        return winner is not None and winner is not endpoint
+
+    def abandon(self):
+        self.claim(self)
+
+def _stream_attempt(endpoint, model, messages, temperature, deadline, race):
+    """Stream one completion from one endpoint. Returns the full content."""
+    endpoint.count("requests")
+    start = time.perf_counter()
+    first_token_ms = None
+    parts = []
+    try:
+        stream = endpoint.client.chat.completions.create(
+            model=endpoint.model or model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            timeout=max(0.1, deadline - time.monotonic())
+        )
+        try:
+            for chunk in stream:
+                if race.lost(endpoint):
+                    raise RequestCancelled()
+                if time.monotonic() > deadline:
+                    raise TimeoutError("LLM deadline exceeded")
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                    if not race.claim(endpoint):
+                        raise RequestCancelled()
+                parts.append(delta)
+        finally:
+            # Closing drops the connection, so a losing request stops costing tokens
+            stream.close()
+    except RequestCancelled:
+        endpoint.count("cancelled")
+        raise
+    except Exception as e:
+        endpoint.record_failure(e)
+        raise
+
+    total_ms = (time.perf_counter() - start) * 1000
+    if first_token_ms is None and not race.claim(endpoint):
+        endpoint.count("cancelled")
+        raise RequestCancelled()
+    endpoint.record_success(first_token_ms or total_ms, total_ms)
+    return "".join(parts)
+
+def _hedged_attempt(primary, hedge, model, messages, temperature, deadline):
+    """
+    Request from primary; if it has not produced a first token within its p95, race hedge against it.
+    :return: (content, endpoint that answered).
+    """
+    race = _Race()
+    futures = {_executor.submit(_stream_attempt, primary, model, messages, temperature, deadline, race): primary}
+
+    if hedge is not None:
+        delay = min(primary.hedge_delay(read_settings("llm_hedge_delay")), max(0.0, deadline - time.monotonic()))
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        primary_failed = bool(done) and next(iter(done)).exception() is not None
+        if race.winner is None and (primary_failed or not done):
+            reason = "failed" if primary_failed else f"no first token after {delay * 1000:.0f} ms"
+            print(f"⚡ LLM {primary.name} {reason}, hedging to {hedge.name}")
+            hedge.count("hedged")
+            futures[_executor.submit(_stream_attempt, hedge, model, messages, temperature, deadline, race)] = hedge
+
+    errors = []
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, timeout=max(0.0, deadline - time.monotonic()), return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        if not done:
+            race.abandon()
+            raise TimeoutError("LLM deadline exceeded")
+        for future in done:
+            error = future.exception()
+            if error is None:
+                futures[future].count("won")
+                return future.result(), futures[future]
+            if not isinstance(error, RequestCancelled):
+                errors.append(error)
+    raise errors[-1] if errors else RuntimeError("LLM request was cancelled")
+
+def completion_response(model, system_prompt, user_prompt, chat_history = None, prefix = None, temperature=1.0, memory=None):
+    """
+    Generate chat response using OpenAI API, with endpoint failover, retries and hedging.
     :param model: The model name to use.
     :param system_prompt: System prompt message.
     :param user_prompt: User input prompt message.
     :param chat_history: Optional chat history as a dictionary.
     :param prefix: Optional prefix for response content.
     :param temperature: Controls randomness of generated text, default is 1.0.
+    :param memory: Optional LongTermMemory; relevant past turns are added to the system prompt and this turn is indexed.
     :return: Generated response content.
     """
+    # Recall related past turns that have already dropped out of the chat history
+    if memory is not None:
+        recent_turns = len(chat_history) // 2 if isinstance(chat_history, list) else 0
+        snippets = memory.retrieve(
+            user_prompt,
+            top_k=read_settings("memory_top_k"),
+            token_budget=read_settings("memory_token_budget"),
+            exclude_recent=recent_turns
+        )
+        if snippets:
+            system_prompt = system_prompt + format_memories(snippets)
+
     # Build messages list without empty dictionaries
     messages = [
         {"role": "system", "content": system_prompt}
@@ -58,15 +301,30 @@ def completion_response(model, system_prompt, user_prompt, chat_history = None,
     if prefix:
         messages.append({"role": "assistant", "content": prefix})
     
-    # Create chat completion
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature
-    )
+    # Stream from the healthiest endpoint, hedging and retrying within one deadline
+    deadline = time.monotonic() + read_settings("llm_deadline")
+    attempts = read_settings("llm_max_retries") + 1
+    errors = []
+    for attempt in range(attempts):
+        endpoints = _ordered_endpoints()
+        primary = endpoints[0]
+        hedge = None
+        if read_settings("llm_hedging"):
+            hedge = next((endpoint for endpoint in endpoints[1:] if endpoint.healthy()), None)
+        try:
+            content, _endpoint = _hedged_attempt(primary, hedge, model, messages, temperature, deadline)
+            break
+        except Exception as e:
+            errors.append(e)
+            backoff = read_settings("llm_retry_backoff") * 2 ** attempt * random.uniform(0.5, 1.5)
+            if attempt == attempts - 1 or isinstance(e, TimeoutError) or time.monotonic() + backoff >= deadline:
+                raise RuntimeError(f"All LLM attempts failed: {'; '.join(str(error) for error in errors)}")
+            print(f"↻ LLM attempt {attempt + 1} failed, retrying in {backoff:.1f}s")
+            time.sleep(backoff)
 
-    # Get response content and add prefix if needed
-    content = response.choices[0].message.content
+    # Remember this turn and add prefix if needed
+    if memory is not None:
+        memory.add_turn(user_prompt, f"{prefix or ''}{content}")
     return f"{prefix or ''}{content}"
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+"""
+Idle-mode gate for the wake-word loop.
+
+A static energy threshold lets a fan, TV or HVAC start a recognition
+attempt every couple of seconds, forever. The gate looks at each captured
+segment before any ASR runs:
+
+- an adaptive noise floor (20th percentile frame energy, falling fast and
+  rising slowly) replaces the fixed threshold, and drives the recognizer's
+  energy_threshold so capture only triggers on sound above the room's level.
+  The floor may rise at most max_rise_db above the quietest level heard, and
+  heads back down quickly once speech or silence is heard, so a stretch of
+  music cannot leave it above the next utterance;
+- a segment is forwarded only if enough of its frames are well above the
+  floor and some frequency band swings in level more than the room's bands
+  do: syllables switch bands on and off several times a second, fans, hum,
+  steady tones and sustained music do not;
+- after several rejected segments in a row (sustained non-speech noise) the
+  loop backs off: instead of triggering on every chunk it buffers longer
+  windows (up to a limit) and checks each in one pass. The mic stays open,
+  so speech during back-off is still heard, and the loop snaps back as soon
+  as a segment is forwarded or the room goes quiet.
+
+All features are computed for the whole segment at once with NumPy. Stats
+(ASR invocations per hour, duty cycle, time backed off) are kept for the
+shutdown summary.
+"""
+import threading
+import time
+
+import numpy as np
+
+from audio_preprocess import SAMPLE_RATE, frame_rms
+
+
+class IdleGateStats:
+    def __init__(self):
+        """Running totals of segments seen, ASR calls made and time spent backed off."""
+        self.started_at = time.monotonic()
+        self.segments = 0
+        self.forwarded = 0
+        self.rejected = 0
+        self.asr_calls = 0
+        self.asr_seconds = 0.0
+        self.backoff_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record_segment(self, forwarded):
+        with self.lock:
+            self.segments += 1
+            if forwarded:
+                self.forwarded += 1
+            else:
+                self.rejected += 1
+
+    def record_asr(self, seconds):
+        with self.lock:
+            self.asr_calls += 1
+            self.asr_seconds += seconds
+
+    def record_backoff(self, seconds):
+        with self.lock:
+            self.backoff_seconds += seconds
+
+    def asr_per_hour(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.asr_calls / elapsed * 3600 if elapsed > 0 else 0.0
+
+    def summary(self):
+        """One-line summary of everything recorded so far."""
+        elapsed = time.monotonic() - self.started_at
+        if not elapsed or not (self.segments or self.asr_calls):
+            return "No wake-word segments yet"
+        return (f"{self.segments} segments, {self.rejected} rejected as noise, {self.asr_calls} ASR calls "
+                f"({self.asr_per_hour():.0f}/hour) | ASR duty cycle {self.asr_seconds / elapsed:.1%}, "
+                f"backed off {self.backoff_seconds / elapsed:.0%} of the time ({self.backoff_seconds:.0f}s)")
+
+
+stats = IdleGateStats()
+
+
+class IdleGate:
+    def __init__(self, margin_db=4.0, min_speech_ms=150, modulation_db=1.5, frame_length=512, hop_length=256,
+                 bands=16, sustain_rejects=3, min_interval=0.25, max_interval=2.0, max_rise_db=10.0):
+        """
+        Speech-onset gate with an adaptive noise floor and back-off.
+
+        Args:
+            margin_db (float): How far above the noise floor a frame must be to count as active
+            min_speech_ms (float): Least active audio in a segment that can be speech (clicks and knocks are shorter)
+            modulation_db (float): How much deeper than the room's the segment's band modulation must be
+            frame_length (int): Analysis frame in samples (512 = 32 ms at 16 kHz)
+            hop_length (int): Samples between analysis frames
+            bands (int): Frequency bands the modulation is measured over
+            sustain_rejects (int): Rejected segments in a row before backing off
+            min_interval (float): First back-off window in seconds, doubled per further rejection
+            max_interval (float): Longest back-off window in seconds
+            max_rise_db (float): Furthest the noise floor may rise above the quietest level heard
+        """
+        self.margin_db = margin_db
+        self.min_speech_frames = max(1, int(min_speech_ms / 1000 * SAMPLE_RATE / hop_length))
+        self.modulation_db = modulation_db
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.window = np.hanning(frame_length).astype(np.float32)
+        self.bands = bands
+        self.sustain_rejects = sustain_rejects
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_rise_db = max_rise_db
+
+        # Learned from the room; None until the first calibration or segment
+        self.noise_db = None
+        self.base_db = None
+        self.modulation_floor = None
+        self.rejects = 0
+        self.interval = 0.0
+
+    def frame_db(self, samples):
+        """Per-frame energy of a segment in dBFS."""
+        return 20 * np.log10(frame_rms(samples, self.frame_length, self.hop_length) + 1e-10)
+
+    def features(self, samples):
+        """
+        Per-frame energy and band modulation depth of a segment.
+
+        Returns:
+            tuple: (frame energy in dBFS, deepest swing of any band's level across the segment in dB)
+        """
+        db = self.frame_db(samples)
+        if len(samples) < 2 * self.frame_length:
+            return db, 0.0
+
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.frame_length)[::self.hop_length]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)[:, 1:]) ** 2
+        # Summing bins into bands averages out the bin-to-bin jitter of noise; speech moves whole bands
+        usable = power.shape[1] - power.shape[1] % self.bands
+        band_db = 10 * np.log10(power[:, :usable].reshape(len(power), self.bands, -1).sum(axis=2) + 1e-10)
+        # Syllables switch bands on and off several times a second; fans, hum and music hold them steady.
+        # The loud end is a high percentile so a short utterance in a long segment still registers
+        swing = np.percentile(band_db, 95, axis=0) - np.percentile(band_db, 20, axis=0)
+        return db, float(swing.max())
+
+    def calibrate(self, samples):
+        """Set the noise floor and modulation floor from ambient audio with nobody talking."""
+        db, modulation = self.features(samples)
+        if len(db):
+            self.noise_db = self.base_db = float(np.percentile(db, 20))
+            self.modulation_floor = modulation or None
+
+    def energy_threshold(self):
+        """Capture trigger for speech_recognition, in 16-bit RMS units: the noise floor plus the margin."""
+        if self.noise_db is None:
+            return 300
+        return max(30.0, 32768 * 10 ** ((self.noise_db + self.margin_db) / 20))
+
+    def check(self, samples):
+        """
+        Decide whether a captured segment looks like speech, and learn from it.
+
+        Args:
+            samples (np.ndarray): 16 kHz mono float32 segment
+
+        Returns:
+            bool: True to forward the segment to recognition
+        """
+        db, modulation = self.features(samples)
+        if len(db) == 0:
+            return False
+
+        if self.noise_db is None:
+            # Nothing learned yet: forward, and take the segment's quiet frames as the floor
+            self.noise_db = self.base_db = float(np.percentile(db, 20))
+            speech = True
+        else:
+            speech = int((db > self.noise_db + self.margin_db).sum()) >= self.min_speech_frames
+            if speech and self.modulation_floor is not None:
+                speech = modulation >= self.modulation_floor + self.modulation_db
+
+        self._learn(db, modulation, speech)
+        stats.record_segment(speech)
+        if speech:
+            self.rejects = 0
+            self.interval = 0.0
+        else:
+            self.rejects += 1
+            if self.rejects >= self.sustain_rejects:
+                self.interval = min(self.max_interval,
+                                    self.min_interval * 2 ** (self.rejects - self.sustain_rejects))
+        return speech
+
+    def _learn(self, db, modulation, speech):
+        """Track the room: the floor drops quickly to quieter levels and rises slowly, and only on noise."""
+        estimate = float(np.percentile(db, 20))
+        if estimate < self.noise_db:
+            self.noise_db += 0.5 * (estimate - self.noise_db)
+        elif not speech:
+            self.noise_db += 0.2 * (estimate - self.noise_db)
+        if speech:
+            # Speech heard over a raised floor (music, TV): head back towards the quiet room quickly
+            self.noise_db += 0.5 * (self.base_db - self.noise_db)
+        self._bound_floor()
+
+        if not speech and modulation:
+            if self.modulation_floor is None:
+                self.modulation_floor = modulation
+            else:
+                self.modulation_floor += 0.2 * (modulation - self.modulation_floor)
+
+    def _bound_floor(self):
+        """Keep the floor within max_rise_db of the quiet baseline, which itself follows the room very slowly."""
+        if self.noise_db < self.base_db:
+            self.base_db = self.noise_db
+        else:
+            self.base_db += 0.02 * (self.noise_db - self.base_db)
+        # A stretch of loud music cannot lift the threshold above the speech that follows it
+        self.noise_db = min(self.noise_db, self.base_db + self.max_rise_db)
+
+    def quiet(self, samples=None):
+        """
+        Nothing loud enough to capture: the noise has stopped, so stop backing off.
+
+        Args:
+            samples (np.ndarray): Audio heard while waiting, lets the floor follow the room down
+        """
+        self.rejects = 0
+        self.interval = 0.0
+        if samples is None or self.noise_db is None or len(samples) < self.frame_length:
+            return
+        estimate = float(np.percentile(self.frame_db(samples), 50))
+        if estimate < self.noise_db:
+            self.noise_db += 0.5 * (estimate - self.noise_db)
+            self._bound_floor()
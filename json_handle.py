@@ -1,5 +1,34 @@
+import copy
 import json
 import os
+import threading
+
+# Parsed settings.json, kept until the file changes on disk
+_settings_cache = {"key": None, "settings": {}}
+_settings_lock = threading.Lock()
+
+def _load_settings(settings_file):
+    """
+    Parse the settings file, or reuse the last parse if it has not changed.
+    
+    Settings are read on hot paths (every captured clip, every LLM request),
+    so the JSON is only parsed again when the file's modification time or
+    size changes; edits made while running are still picked up.
+    
+    Args:
+        settings_file (str): Path to settings.json
+    
+    Returns:
+        dict: The parsed settings (shared, do not modify)
+    """
+    stat = os.stat(settings_file)
+    key = (os.path.abspath(settings_file), stat.st_mtime_ns, stat.st_size)
+    with _settings_lock:
+        if _settings_cache["key"] != key:
+            with open(settings_file, 'r', encoding='utf-8') as f:
+                _settings_cache["settings"] = json.load(f)
+            _settings_cache["key"] = key
+        return _settings_cache["settings"]
 
 def read_settings(setting_name):
     """
@@ -18,16 +47,49 @@ def read_settings(setting_name):
         "serina_language": "en",
         "serina_voice_model": "en-US-AriaNeural",
         "microphone_threshold": 40,
-        "pause_threshold": 1.4
+        "pause_threshold": 1.4,
+        "capture_sample_rate": 16000,
+        "asr_batch_window_ms": 30,
+        "asr_max_batch_size": 8,
+        "asr_workers": 0,
+        "wake_words": {"serina": ["serena", "sarina", "sirena"]},
+        "wake_idle_gate": True,
+        "wake_verification": "transcribe",
+        "wake_verify_calibration": [1.5, 2.0],
+        "asr_trim_silence": True,
+        "asr_noise_reduction": False,
+        "asr_backend": "whisper",
+        "asr_compute_type": "default",
+        "asr_beam_size": 1,
+        "asr_threads": 0,
+        "tts_primary": "openai",
+        "tts_fallback": "local",
+        "tts_latency_budget": 1.5,
+        "tts_first_chunk_chars": 250,
+        "tts_max_parallel_chunks": 3,
+        "conversation_archive": "conversations.db",
+        "memory_file": "memory_index.jsonl",
+        "memory_top_k": 3,
+        "memory_token_budget": 200,
+        "llm_endpoints": [],
+        "llm_deadline": 30,
+        "llm_max_retries": 2,
+        "llm_retry_backoff": 0.5,
+        "llm_hedging": True,
+        "llm_hedge_delay": 2.0,
+        "diagnostics_dir": "diagnostics",
+        "diagnostics_port": 0,
+        "diagnostics_profile_seconds": 30
     }
     
     try:
         if os.path.exists(settings_file):
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
+            settings = _load_settings(settings_file)
             
             # Return the requested setting or its default
-            return settings.get(setting_name, defaults.get(setting_name))
+            value = settings.get(setting_name, defaults.get(setting_name))
+            # Callers may modify lists and dicts they get back; the cached parse must not change
+            return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
         else:
             print(f"Settings file {settings_file} not found. Using default value for {setting_name}.")
             return defaults.get(setting_name)
@@ -62,6 +124,8 @@ def write_settings(setting_name, value):
         # Save back to file
         with open(settings_file, 'w', encoding='utf-8') as f:
             json.dump(settings, f, indent=2, ensure_ascii=False)
+        with _settings_lock:
+            _settings_cache["key"] = None
         
         print(f"Setting '{setting_name}' updated to '{value}'")
         return True
@@ -131,6 +195,51 @@ def read_chat_history(file_path="chat_history.json"):
         print(f"Error reading chat history: {e}")
         return []
 
+def read_audio_index(base_dir="pre-recorded-audio"):
+    """
+    Read the pre-recorded audio index written by batch_tts.py.
+
+    Args:
+        base_dir (str): Pre-recorded audio folder. Defaults to "pre-recorded-audio".
+
+    Returns:
+        dict: {voice: [clip entries]}, or empty dict if there is no index.
+    """
+    index_path = os.path.join(base_dir, "index.json")
+    try:
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("clips", {})
+        return {}
+
+    except Exception as e:
+        print(f"Error reading audio index: {e}")
+        return {}
+
+def write_audio_index(clips, base_dir="pre-recorded-audio"):
+    """
+    Write the pre-recorded audio index atomically.
+
+    Args:
+        clips (dict): {voice: [clip entries]}
+        base_dir (str): Pre-recorded audio folder. Defaults to "pre-recorded-audio".
+
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    index_path = os.path.join(base_dir, "index.json")
+    try:
+        os.makedirs(base_dir, exist_ok=True)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "clips": clips}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+        return True
+
+    except Exception as e:
+        print(f"Error writing audio index: {e}")
+        return False
+
 if __name__ == "__main__":
     # Test the functions
     print("Current settings:")
@@ -0,0 +1,197 @@
+"""
+Conversation language handling.
+
+"serina_language" in settings.json is either a fixed language ("en",
+"zh-TW", ...) that is passed straight to every engine, or "auto". In auto
+mode the language Whisper detects is cached per session with a confidence
+that decays while nobody talks, so most turns are decoded in the cached
+language without a detection pass. A transcript that comes back with low
+confidence in the cached language is decoded again with detection, and the
+cache follows the result.
+
+The same language then drives the Google fallback (as a BCP-47 code), the
+LLM reply language and the TTS voice.
+"""
+import threading
+import time
+
+from asr_backends import LOGPROB_THRESHOLD
+from json_handle import read_settings
+
+# Whisper code: (name, Google BCP-47 code, Edge TTS voice)
+LANGUAGES = {
+    "en": ("English", "en-US", "en-US-AriaNeural"),
+    "zh": ("Chinese", "zh-TW", "zh-TW-HsiaoChenNeural"),
+    "ja": ("Japanese", "ja-JP", "ja-JP-NanamiNeural"),
+    "ko": ("Korean", "ko-KR", "ko-KR-SunHiNeural"),
+    "es": ("Spanish", "es-ES", "es-ES-ElviraNeural"),
+    "fr": ("French", "fr-FR", "fr-FR-DeniseNeural"),
+    "de": ("German", "de-DE", "de-DE-KatjaNeural"),
+    "it": ("Italian", "it-IT", "it-IT-ElsaNeural"),
+    "pt": ("Portuguese", "pt-BR", "pt-BR-FranciscaNeural"),
+    "ru": ("Russian", "ru-RU", "ru-RU-SvetlanaNeural"),
+    "nl": ("Dutch", "nl-NL", "nl-NL-ColetteNeural"),
+    "hi": ("Hindi", "hi-IN", "hi-IN-SwaraNeural"),
+    "ar": ("Arabic", "ar-SA", "ar-SA-ZariyahNeural"),
+    "vi": ("Vietnamese", "vi-VN", "vi-VN-HoaiMyNeural"),
+    "th": ("Thai", "th-TH", "th-TH-PremwadeeNeural"),
+    "id": ("Indonesian", "id-ID", "id-ID-GadisNeural"),
+}
+
+
+def whisper_code(language):
+    """Whisper language code for a setting like "en", "en-US" or "zh-TW"."""
+    return language.split("-")[0].lower() if language else None
+
+
+def google_code(language):
+    """BCP-47 code for Google speech recognition; a region given in the setting is kept."""
+    if not language:
+        return "en-US"
+    if "-" in language:
+        return language
+    return LANGUAGES.get(language, (None, language))[1]
+
+
+def language_name(language):
+    code = whisper_code(language)
+    return LANGUAGES[code][0] if code in LANGUAGES else code
+
+
+class LanguageTracker:
+    def __init__(self, setting=None, min_confidence=0.5, half_life=1800.0, min_logprob=LOGPROB_THRESHOLD):
+        """
+        Language state for one session (or one speaker).
+
+        Args:
+            setting (str): "auto" or a fixed language, defaults to "serina_language" in settings.json
+            min_confidence (float): Cached languages below this confidence are detected again
+            half_life (float): Seconds for the cached confidence to halve without supporting transcripts
+            min_logprob (float): Transcripts with a lower mean log probability count as low confidence
+        """
+        setting = setting or read_settings("serina_language") or "auto"
+        self.fixed = None if setting.lower() == "auto" else setting
+        self.min_confidence = min_confidence
+        self.half_life = half_life
+        self.min_logprob = min_logprob
+
+        self.cached = None
+        self.confidence = 0.0
+        self.updated_at = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"fixed": 0, "cached": 0, "detected": 0, "redetected": 0}
+
+    @property
+    def language(self):
+        """Current conversation language (BCP-47-ish setting or Whisper code), None if unknown."""
+        return self.fixed or self.cached
+
+    def current_confidence(self):
+        """Cached confidence after decay for the time since it was last supported."""
+        elapsed = time.monotonic() - self.updated_at
+        return self.confidence * 0.5 ** (elapsed / self.half_life)
+
+    def decode_language(self):
+        """
+        Language to force for the next decode.
+
+        Returns:
+            str: Whisper language code, or None to let the engine detect it
+        """
+        with self.lock:
+            if self.fixed:
+                self.stats["fixed"] += 1
+                return whisper_code(self.fixed)
+            if self.cached and self.current_confidence() >= self.min_confidence:
+                self.stats["cached"] += 1
+                return self.cached
+            self.stats["detected"] += 1
+            return None
+
+    def needs_redetect(self, transcript, forced_language):
+        """
+        Whether a transcript decoded in the cached language looks wrong enough to detect again.
+
+        Args:
+            transcript (str | Transcript): Result of the decode
+            forced_language (str): Language that decode was forced to, None if it was detected
+        """
+        if self.fixed or forced_language is None or not transcript:
+            return False
+        avg_logprob = getattr(transcript, "avg_logprob", None)
+        return avg_logprob is not None and avg_logprob < self.min_logprob
+
+    def observe(self, transcript, forced_language):
+        """
+        Update the cache from a decode result.
+
+        Args:
+            transcript (str | Transcript): Result of the decode
+            forced_language (str): Language the decode was forced to, None if it was detected
+        """
+        if self.fixed or not transcript:
+            return
+        language = getattr(transcript, "language", None)
+        if not language:
+            return
+        with self.lock:
+            if forced_language is None:
+                # A fresh detection replaces the cache outright
+                probability = getattr(transcript, "language_probability", None)
+                if self.cached and language != self.cached:
+                    print(f"🌐 Language changed: {language_name(self.cached)} → {language_name(language)}")
+                self.cached = language
+                # Engines that report no probability are trusted until a low-logprob transcript
+                # forces detection again; seeding at the threshold would expire on the next turn
+                self.confidence = probability if probability is not None else 1.0
+            elif not self.needs_redetect(transcript, forced_language):
+                # A clean transcript in the cached language tops its confidence back up
+                self.confidence = min(1.0, self.current_confidence() + 0.5 * (1.0 - self.current_confidence()))
+            self.updated_at = time.monotonic()
+
+    def record_redetect(self):
+        with self.lock:
+            self.stats["redetected"] += 1
+
+    def google_language(self):
+        """Language code for Google speech recognition."""
+        return google_code(self.language)
+
+    def prompt_instruction(self):
+        """System prompt addition asking the LLM to answer in the conversation language."""
+        if not self.language:
+            return ""
+        name = language_name(self.language)
+        return f"\n\nThe user is speaking {name}. Always reply in {name}."
+
+    def tts_options(self):
+        """TTS options for speak_hedged: the language for offline engines and a matching Edge voice."""
+        code = whisper_code(self.language)
+        if not code:
+            return {}
+        options = {"language": code}
+        voice = read_settings("serina_voice_model") or ""
+        if google_code(self.language).split("-")[0] == voice.split("-")[0]:
+            # The configured voice already speaks this language
+            options["edge_voice"] = voice
+        elif code in LANGUAGES:
+            options["edge_voice"] = LANGUAGES[code][2]
+        return options
+
+    def summary(self):
+        mode = f"fixed {self.fixed}" if self.fixed else f"auto, now {self.cached or 'unknown'}"
+        decodes = ", ".join(f"{name} {count}" for name, count in self.stats.items() if count)
+        return f"{mode} ({decodes or 'no decodes'})"
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_language_tracker():
+    """The language tracker for the local (single-user) assistant."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LanguageTracker()
+        return _tracker
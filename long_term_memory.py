@@ -0,0 +1,255 @@
+"""
+Long-term conversation memory.
+
+chat_history.json only keeps the last few messages, so anything said
+earlier is forgotten. Every finished turn is indexed here instead: an
+in-memory inverted index (term -> {turn: count}) scored with BM25, so a
+request only touches turns that share words with it. Each turn's term
+counts are appended to a JSONL file, which makes persistence incremental
+and lets the index be rebuilt at startup without re-tokenizing anything.
+
+At request time the top-k relevant past turns are trimmed to a small token
+budget and added to the system prompt, so recall does not grow the prompt
+with the length of the conversation.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from json_handle import read_settings
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could
+did do does doing don for from had has have having he her here hers him his how i if in into is it its
+just me more most my no nor not now of off on once only or other our ours out over own same she should
+so some such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours yeah okay ok
+serina please tell know like get got want
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class LongTermMemory:
+    def __init__(self, path="memory_index.jsonl", k1=1.5, b=0.75):
+        """
+        BM25 memory over past turns, persisted incrementally.
+
+        Args:
+            path (str): JSONL file holding one indexed turn per line; None keeps memory in RAM only
+            k1 (float): BM25 term-frequency saturation
+            b (float): BM25 length normalisation
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.documents = []          # turn text, by doc id
+        self.lengths = []            # indexed terms per doc
+        self.postings = {}           # term -> {doc id: term count}
+        self.total_length = 0
+        self.lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _index(self, text, term_counts):
+        doc_id = len(self.documents)
+        self.documents.append(text)
+        length = sum(term_counts.values())
+        self.lengths.append(length)
+        self.total_length += length
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        skipped = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        self._index(entry["text"], entry["terms"])
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        # A torn line from a crash only loses that one turn
+                        skipped += 1
+        except OSError as e:
+            print(f"Error loading memory index: {e}")
+        if skipped:
+            print(f"Skipped {skipped} unreadable line(s) in memory index")
+
+    def _ends_torn(self):
+        """True if the file's last line has no newline (a write cut short), so the next one must start fresh."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False
+
+    def add(self, text, created_at=None):
+        """
+        Index one piece of text (usually a finished turn) and append it to disk.
+
+        Args:
+            text (str): Text to remember
+            created_at (float): Unix time, defaults to now
+
+        Returns:
+            int: Doc id, or None if the text had nothing worth indexing
+        """
+        term_counts = Counter(tokenize(text))
+        if not term_counts:
+            return None
+        with self.lock:
+            doc_id = len(self.documents)
+            self._index(text, term_counts)
+            if self.path:
+                try:
+                    torn = self._ends_torn()
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        if torn:
+                            f.write("\n")
+                        f.write(json.dumps({"text": text, "terms": term_counts,
+                                            "time": created_at or time.time()}, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"Error saving memory index: {e}")
+            return doc_id
+
+    def add_turn(self, user_text, response):
+        """Index a user/assistant exchange as one memory."""
+        return self.add(f"User: {user_text}\nSerina: {response}")
+
+    def search(self, query, top_k=3, exclude_recent=0, relative_cutoff=0.25):
+        """
+        BM25 top-k over the inverted index.
+
+        Args:
+            query (str): Text to find related memories for
+            top_k (int): Most results
+            exclude_recent (int): Skip the newest N docs (they are already in the chat history)
+            relative_cutoff (float): Drop matches scoring below this fraction of the best one
+                (BM25 scores have no absolute scale, they depend on corpus size)
+
+        Returns:
+            list: (score, doc id) pairs, best first
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            n_docs = len(self.documents)
+            if not terms or not n_docs:
+                return []
+            cutoff = n_docs - exclude_recent
+            avg_length = self.total_length / n_docs
+
+            scores = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, count in posting.items():
+                    if doc_id >= cutoff:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+
+        best = heapq.nlargest(top_k, ((score, doc_id) for doc_id, score in scores.items()))
+        return [(score, doc_id) for score, doc_id in best if score >= best[0][0] * relative_cutoff]
+
+    def retrieve(self, query, top_k=3, token_budget=200, exclude_recent=0):
+        """
+        Relevant past turns that fit in a token budget.
+
+        Args:
+            query (str): The new user request
+            top_k (int): Most snippets
+            token_budget (int): Approximate token cap across all snippets
+            exclude_recent (int): Skip the newest N docs
+
+        Returns:
+            list: Snippet strings, most relevant first
+        """
+        snippets = []
+        remaining = token_budget
+        for _score, doc_id in self.search(query, top_k, exclude_recent):
+            text = self.documents[doc_id]
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                if remaining < 20:
+                    break
+                # Keep the start of a long turn rather than skipping it entirely
+                text = text[:remaining * 4].rsplit(" ", 1)[0] + "…"
+                cost = remaining
+            snippets.append(text)
+            remaining -= cost
+        return snippets
+
+
+def format_memories(snippets):
+    """System prompt section for retrieved memories."""
+    lines = "\n".join(f"- {snippet.replace(chr(10), ' / ')}" for snippet in snippets)
+    return f"\n\nRelevant things from earlier conversations (use them if they help):\n{lines}"
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory():
+    """
+    The process-wide memory, loaded on first use.
+
+    Returns:
+        LongTermMemory: The memory, or None if "memory_file" is empty in settings.json
+    """
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            path = read_settings("memory_file")
+            if not path:
+                return None
+            _memory = LongTermMemory(path)
+        return _memory
+
+
+if __name__ == "__main__":
+    memory = get_memory() or LongTermMemory(None)
+    print(f"🧠 {len(memory)} memories indexed")
+    try:
+        while True:
+            query = input("\nQuery (Ctrl+C to quit): ").strip()
+            if not query:
+                continue
+            start = time.perf_counter()
+            snippets = memory.retrieve(query, read_settings("memory_top_k"), read_settings("memory_token_budget"))
+            print(f"⏱️ {(time.perf_counter() - start) * 1000:.2f} ms")
+            for snippet in snippets:
+                print(f"  • {snippet}")
+            if not snippets:
+                print("  (nothing relevant)")
+    except (KeyboardInterrupt, EOFError):
+        print("\n👋 Goodbye!")
@@ -1,18 +1,25 @@
 from recorder import WakeWordDetector, record_voice_to_string
-from speaker_api import play_tts_openai_async
+from tts_backends import speak_hedged_async, latency_report
 import gpt_handler
 import asyncio
 import random
-from json_handle import read_settings, write_chat_history, read_chat_history
+from json_handle import read_settings, write_chat_history, read_chat_history, read_audio_index
 from txt_handle import read_txt_file
+from audio_preprocess import stats as preprocess_stats
+from idle_gate import stats as gate_stats
 import speech_recognition as sr
 import datetime
 import os
-import pygame
+from audio_output import can_play, play_file_async
+from conversation_archive import get_archive, close_archive
+from long_term_memory import get_memory
+from diagnostics import enable_diagnostics, stage
+from language import get_language_tracker
+import time
+import uuid
 
 # todo
 # make personalities for serina
-# make chat loggable
 
 voice_to_use = "nova"
 
@@ -43,30 +50,30 @@ def print_status(message, status_type="info"):
 
 async def play_random_start_audio():
     """Play a random pre-recorded start audio from the specified voice folder."""
-    # Build path to the voice folder
-    audio_folder = os.path.join("pre-recorded-audio", voice_to_use)
-    
-    # Get all audio files (.mp3, .wav, etc.) from the folder
-    audio_files = [f for f in os.listdir(audio_folder) 
-                  if f.lower().endswith(('.mp3', '.wav', '.ogg', '.m4a'))]
-    
-    # Select a random audio file
-    selected_file = random.choice(audio_files)
-    file_path = os.path.join(audio_folder, selected_file)
+    # The index written by batch_tts.py avoids scanning the folder
+    indexed = [entry["file"] for entry in read_audio_index().get(voice_to_use, [])
+               if can_play(entry["file"]) and os.path.exists(os.path.join("pre-recorded-audio", entry["file"]))]
+    if indexed:
+        file_path = os.path.join("pre-recorded-audio", random.choice(indexed))
+        selected_file = os.path.basename(file_path)
+    else:
+        # Build path to the voice folder
+        audio_folder = os.path.join("pre-recorded-audio", voice_to_use)
+        
+        # Get all audio files the output engine can decode (.mp3, .wav, .ogg, .flac; not .m4a)
+        audio_files = [f for f in os.listdir(audio_folder) if can_play(f)]
+        if not audio_files:
+            print_status(f"No playable start audio in {audio_folder}", "error")
+            return
+        
+        # Select a random audio file
+        selected_file = random.choice(audio_files)
+        file_path = os.path.join(audio_folder, selected_file)
     
     print_status(f"Playing: {selected_file}", "speaking")
     
-    # Initialize pygame mixer if not already done
-    if not pygame.mixer.get_init():
-        pygame.mixer.init()
-    
-    # Play the audio file
-    pygame.mixer.music.load(file_path)
-    pygame.mixer.music.play()
-    
-    # Wait for playback to complete
-    while pygame.mixer.music.get_busy():
-        await asyncio.sleep(0.1)  # Non-blocking wait
+    # Play on the shared output engine and await the exact end of playback
+    await play_file_async(file_path)
 
 async def main():
     # Print clean header
@@ -82,45 +89,90 @@ async def main():
     
     print_status("Listening for wake word 'Serina'...", "listening")
     
+    # Profiler and memory snapshots on demand (SIGUSR1/SIGUSR2 or the control socket)
+    enable_diagnostics()
+    
+    # Every run of the assistant is one session in the conversation archive
+    session_id = uuid.uuid4().hex[:8]
+    archive = get_archive()
+    
     while True:
-        serina_heard = wake_detector.wake_word_detect_new()
+        wake_start = time.perf_counter()
+        with stage("wake"):
+            serina_heard = wake_detector.wake_word_detect_new()
         if serina_heard:
+            # The turn starts when the wake word fires; wake_ms is the attempt that caught it
+            turn_start = time.perf_counter()
+            timings = {"wake_ms": round((turn_start - wake_start) * 1000, 1)}
             print_status("Wake word detected! Responding...", "wake")
             
             # Play pre-recorded start audio
-            await play_random_start_audio()
+            with stage("start_audio"):
+                await play_random_start_audio()
             
             print_status("Listening for user input...", "listening")
-            recognized_text = record_voice_to_string()  # Uses optimized voice recording
+            with stage("listen"):
+                recognized_text = record_voice_to_string(timings=timings)  # Uses optimized voice recording
             
             if recognized_text:
                 print_status(f"User said: '{recognized_text}'", "success")
                 print_status("Processing with AI...", "processing")
                 
+                llm_start = time.perf_counter()
                 chat_history = read_chat_history()
-                response = gpt_handler.completion_response(
-                    model="gpt-5-chat",
-                    system_prompt=read_txt_file("personality.txt"),
-                    chat_history=chat_history if chat_history else None,
-                    user_prompt=recognized_text,
-                    temperature=1.0
-                )
+                with stage("llm"):
+                    response = gpt_handler.completion_response(
+                        model="gpt-5-chat",
+                        system_prompt=(read_txt_file("personality.txt") or "") + get_language_tracker().prompt_instruction(),
+                        chat_history=chat_history if chat_history else None,
+                        user_prompt=recognized_text,
+                        temperature=1.0,
+                        memory=get_memory()
+                    )
                 
+                timings["llm_ms"] = round((time.perf_counter() - llm_start) * 1000, 1)
                 print_status(f"AI Response: {response[:100]}{'...' if len(response) > 100 else ''}", "success")
                 
-                write_chat_history(
-                    [{'role': 'user', 'content': recognized_text},
-                     {'role': 'assistant', 'content': response}]
-                )
+                with stage("history"):
+                    write_chat_history(
+                        [{'role': 'user', 'content': recognized_text},
+                         {'role': 'assistant', 'content': response}]
+                    )
                 
                 print_status("Speaking response...", "speaking")
-                await play_tts_openai_async(response, voice=voice_to_use, model="tts-1", speed=0.9, instructions="calm and soothing tone.")
+                tts_start = time.perf_counter()
+                with stage("tts"):
+                    await speak_hedged_async(response, voice=voice_to_use, model="tts-1", speed=0.9, instructions="calm and soothing tone.",
+                                             **get_language_tracker().tts_options())
+
+                if archive:
+                    # Queued for the background writer, does not delay the next turn
+                    archive.record_turn(
+                        session_id, recognized_text, response, source="main",
+                        voice=voice_to_use, llm_model="gpt-5-chat",
+                        tts_ms=round((time.perf_counter() - tts_start) * 1000, 1),
+                        total_ms=round((time.perf_counter() - turn_start) * 1000, 1),
+                        **timings
+                    )
 
                 print_status("Ready for next interaction", "info")
                 print("-" * 40)
             else:
                 print_status("Could not understand speech", "error")
-                await play_tts_openai_async("Please repeat, I didn't catch that.", voice=voice_to_use, model="tts-1")
+                await speak_hedged_async("Please repeat, I didn't catch that.", voice=voice_to_use, model="tts-1",
+                                         **get_language_tracker().tts_options())
+
+def print_shutdown_summary():
+    """Print what the session measured and flush the conversation archive."""
+    print(f"📅 Stopped: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"✂️ Audio preprocessing: {preprocess_stats.summary()}")
+    print(f"⚡ Idle gate: {gate_stats.summary()}")
+    for line in latency_report():
+        print(f"⏱️ TTS {line}")
+    for line in gpt_handler.endpoint_report():
+        print(f"🌐 LLM {line}")
+    print(f"🗣️ Language: {get_language_tracker().summary()}")
+    close_archive()
 
 if __name__ == "__main__":
     try:
@@ -129,9 +181,11 @@ if __name__ == "__main__":
         print("\n" + "="*60)
         print("🛑 SERINA - Shutting down gracefully")
         print("="*60)
-        print(f"📅 Stopped: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print_shutdown_summary()
         print("👋 Goodbye!")
         print("="*60 + "\n")
     except Exception as e:
         print(f"\n❌ Critical error: {e}")
-        print("🔧 Please check your configuration and try again.")
\ No newline at end of file
+        print("🔧 Please check your configuration and try again.")
+        # The numbers up to the failure are what explains it
+        print_shutdown_summary()
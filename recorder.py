@@ -1,10 +1,20 @@
 import speech_recognition as sr
 import numpy as np
+import math
 import time
 import threading
 import queue
 from collections import deque
-import re
+from asr_backends import LOGPROB_THRESHOLD
+from asr_scheduler import get_scheduler
+from audio_frames import AudioFrame, AudioFramePool, as_audio_data, as_float32, listen_into, record_into
+from audio_preprocess import preprocess, stats as preprocess_stats
+from asr_workers import get_worker_pool
+from json_handle import read_settings
+from wake_matcher import WakeWordMatcher
+from wake_verifier import get_wake_verifier
+from idle_gate import IdleGate, stats as gate_stats
+from language import get_language_tracker, language_name, whisper_code
 
 class WakeWordDetector:
     def __init__(self, wake_word="serina", confidence_threshold=0.7, buffer_duration=3.0):
@@ -20,9 +30,23 @@ class WakeWordDetector:
         self.confidence_threshold = confidence_threshold
         self.buffer_duration = buffer_duration
         
-        # Audio processing
+        # Wake words and aliases from settings, plus the one passed in
+        wake_words = dict(read_settings("wake_words") or {})
+        wake_words.setdefault(self.wake_word, [])
+        self.matcher = WakeWordMatcher(wake_words)
+        
+        # "score" checks the wake word against the audio directly instead of transcribing
+        self.verifier = None
+        if read_settings("wake_verification") == "score":
+            try:
+                self.verifier = get_wake_verifier(wake_words)
+            except Exception as e:
+                print(f"⚠️ Wake-word scoring unavailable ({e}), transcribing wake windows instead")
+        
+        # Audio processing; each wake window is captured into the same preallocated frame
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = sr.Microphone(sample_rate=read_settings("capture_sample_rate") or None)
+        self.frame = AudioFrame(max_seconds=buffer_duration)
         
         # Optimize recognizer settings for wake word detection
         self.recognizer.energy_threshold = 300  # Higher threshold to reduce false positives
@@ -30,6 +54,11 @@ class WakeWordDetector:
         self.recognizer.phrase_threshold = 0.3  # Minimum audio before considering speech
         self.recognizer.non_speaking_duration = 0.3  # Quick detection of silence
         
+        # Idle gate: only speech onsets above the room's noise floor reach ASR
+        self.gate = IdleGate() if read_settings("wake_idle_gate") else None
+        if self.gate:
+            self.recognizer.dynamic_energy_threshold = False  # The gate's noise floor sets the threshold
+        
         # Detection history for loop prevention
         self.detection_history = deque(maxlen=10)
         self.last_detection_time = 0
@@ -46,55 +75,25 @@ class WakeWordDetector:
         """Calibrate microphone for ambient noise."""
         print("Calibrating microphone for ambient noise...")
         with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
+            if self.gate:
+                # The gate learns the room from the ambient audio and sets the capture threshold
+                self.gate.calibrate(record_into(source, self.frame, 1.5).samples())
+                self.recognizer.energy_threshold = self.gate.energy_threshold()
+            else:
+                self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
         print("Microphone calibrated.")
     
-    def _normalize_text(self, text):
-        """Normalize text for better matching."""
-        if not text:
-            return ""
-        
-        # Convert to lowercase and remove punctuation
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        
-        # Handle common speech-to-text variations
-        variations = {
-            'serena': 'serina',
-            'sarina': 'serina', 
-            'serina': 'serina',
-            'sirena': 'serina',
-            'marina': 'serina',  # Common misrecognition
-            'arena': 'serina',   # Common misrecognition
-        }
-        
-        for variant, target in variations.items():
-            text = text.replace(variant, target)
-        
-        return text.strip()
-    
-    def _calculate_similarity(self, text):
-        """Calculate similarity score between detected text and wake word."""
-        normalized_text = self._normalize_text(text)
-        
-        if not normalized_text:
-            return 0.0
-        
-        # Direct match
-        if self.wake_word in normalized_text:
-            return 1.0
-        
-        # Fuzzy matching for partial matches
-        words = normalized_text.split()
-        best_score = 0.0
+    def _calculate_similarity(self, candidates):
+        """
+        Calculate similarity score between detected text and the wake word(s).
         
-        for word in words:
-            # Simple character-based similarity
-            if len(word) >= 3:  # Only consider words with 3+ characters
-                common_chars = sum(1 for c in self.wake_word if c in word)
-                similarity = common_chars / max(len(self.wake_word), len(word))
-                best_score = max(best_score, similarity)
+        Args:
+            candidates (str | list): Transcript, or n-best hypotheses as (text, confidence) pairs
         
-        return best_score
+        Returns:
+            float: Best match score in [0, 1]
+        """
+        return self.matcher.score(candidates)
     
     def _is_loop_detection(self):
         """Prevent rapid repeated detections (loop detection)."""
@@ -117,6 +116,58 @@ class WakeWordDetector:
         self.last_detection_time = current_time
         self.detection_history.append(current_time)
     
+    def _transcribe_wake_word(self, audio):
+        """
+        Transcribe the wake window and fuzzy-match the text against the wake words.
+        
+        Returns:
+            tuple: (text, similarity score), ("", 0.0) if nothing was recognized
+        """
+        # Use Whisper for better accuracy (free and offline)
+        try:
+            text = transcribe_whisper(audio, model="tiny", track_language=False)  # Tiny model for speed
+            candidates = _segment_candidates(text)
+        except Exception:
+            # Fallback to Google (requires internet but free for limited use)
+            try:
+                result = self.recognizer.recognize_google(
+                    as_audio_data(audio), language=get_language_tracker().google_language(), show_all=True
+                )
+                alternatives = result.get("alternative", []) if isinstance(result, dict) else []
+                # Score every n-best hypothesis, not just the top one. Google usually rates only the top
+                # alternative, so unrated ones get a confidence that halves with every rank below it
+                top_confidence = alternatives[0].get("confidence", 1.0) if alternatives else 1.0
+                candidates = [(alt["transcript"], alt.get("confidence", top_confidence * 0.5 ** rank))
+                              for rank, alt in enumerate(alternatives)]
+                text = alternatives[0]["transcript"] if alternatives else ""
+            except Exception:
+                return "", 0.0
+        
+        return text, self._calculate_similarity(candidates) if text else 0.0
+    
+    def _score_wake_word(self, audio):
+        """
+        Score the wake window against the wake words without transcribing it.
+        
+        Returns:
+            tuple: (best wake-word candidate, calibrated confidence), ("", 0.0) for silence
+        """
+        samples = preprocess(
+            as_float32(audio),
+            trim=read_settings("asr_trim_silence"),
+            denoise=read_settings("asr_noise_reduction")
+        )
+        if len(samples) == 0:
+            return "", 0.0
+        
+        try:
+            result = self.verifier.verify(samples, language=whisper_code(get_language_tracker().language))
+        except Exception as e:
+            print(f"⚠️ Wake-word scoring failed ({e}), transcribing instead")
+            return self._transcribe_wake_word(audio)
+        preprocess_stats.record_asr(result.seconds)
+        return result.phrase, result.confidence
+    
     def wake_word_detect_new(self):
         """
         Single detection attempt with optimized processing.
@@ -126,22 +177,34 @@ class WakeWordDetector:
         """
         try:
             with self.microphone as source:
-                # Quick listen with short timeout for responsiveness
-                audio = self.recognizer.listen(source, timeout=0.5, phrase_time_limit=2.0)
+                if self.gate and self.gate.interval:
+                    # Backed off under sustained noise: buffer a whole window and check it in one pass,
+                    # so the mic stays open and an utterance in the noise is still heard
+                    interval = self.gate.interval
+                    audio = record_into(source, self.frame, interval)
+                    gate_stats.record_backoff(interval)
+                    speech = self.gate.check(audio.samples())
+                    if speech and interval < self.buffer_duration:
+                        # Record the rest of the wake window before recognizing it
+                        record_into(source, self.frame, self.buffer_duration - interval, clear=False)
+                else:
+                    # Quick listen with short timeout for responsiveness
+                    audio = listen_into(self.recognizer, source, self.frame, timeout=0.5, phrase_time_limit=2.0)
+                    speech = self.gate.check(audio.samples()) if self.gate else True
             
-            # Use Whisper for better accuracy (free and offline)
-            try:
-                text = self.recognizer.recognize_whisper(audio, model="tiny")  # Tiny model for speed
-            except Exception:
-                # Fallback to Google (requires internet but free for limited use)
-                try:
-                    text = self.recognizer.recognize_google(audio, language="en-US")
-                except Exception:
+            if self.gate:
+                self.recognizer.energy_threshold = self.gate.energy_threshold()
+                if not speech:
                     return False
             
+            asr_start = time.perf_counter()
+            if self.verifier:
+                text, similarity_score = self._score_wake_word(audio)
+            else:
+                text, similarity_score = self._transcribe_wake_word(audio)
+            gate_stats.record_asr(time.perf_counter() - asr_start)
+            
             if text:
-                similarity_score = self._calculate_similarity(text)
-                
                 # Debug output (can be removed in production)
                 if similarity_score > 0.3:  # Show potential matches
                     print(f"Detected: '{text}' (similarity: {similarity_score:.2f})")
@@ -158,6 +221,9 @@ class WakeWordDetector:
             
         except sr.WaitTimeoutError:
             # No speech detected - this is normal, not an error
+            if self.gate:
+                # The frame still holds the pre-roll heard while waiting
+                self.gate.quiet(self.frame.samples())
             return False
         except Exception as e:
             print(f"Detection error: {e}")
@@ -189,6 +255,7 @@ class WakeWordDetector:
                 
             except KeyboardInterrupt:
                 print("\nDetection stopped by user.")
+                print(f"⚡ Idle gate: {gate_stats.summary()}")
                 break
             except Exception as e:
                 consecutive_errors += 1
@@ -201,7 +268,118 @@ class WakeWordDetector:
                 # Brief pause before retry
                 time.sleep(0.5)
 
-def record_voice_to_string(timeout=10, phrase_time_limit=None, energy_threshold=300, pause_threshold=0.8):
+def _segment_candidates(text):
+    """
+    Whisper segments as weighted wake-word candidates.
+    
+    Segments decoded below Whisper's own log-probability threshold (typically
+    hallucinations on noise) count for less, in proportion to how far below it
+    they fell.
+    
+    Args:
+        text (Transcript | str): Transcript from transcribe_whisper
+    
+    Returns:
+        list: (segment text, weight) pairs
+    """
+    segments = getattr(text, "segments", None)
+    if segments is None:
+        return [text]
+    return [
+        (segment, 1.0 if logprob is None else min(1.0, math.exp(logprob - LOGPROB_THRESHOLD)))
+        for segment, logprob in segments
+    ]
+
+def _decode(samples, model, language):
+    """Decode preprocessed samples in a worker process or through the in-process scheduler."""
+    if read_settings("asr_workers"):
+        return get_worker_pool(model).transcribe(samples, language)
+    return get_scheduler(model).transcribe(samples, language)
+
+def transcribe_whisper(audio, model="base", track_language=True):
+    """
+    Transcribe captured audio with Whisper, keeping the model loaded between calls.
+    Silence is trimmed first (clips with no speech skip ASR entirely). With
+    "asr_workers" set in settings.json the clip is decoded in a worker
+    process; otherwise it goes through the in-process batching scheduler.
+    
+    The clip is decoded in the conversation language (see language.py), so
+    Whisper only runs language detection when the language is unknown or
+    the cached one produced a low-confidence transcript.
+    
+    Args:
+        audio (AudioFrame | sr.AudioData): Captured audio
+        model (str): Whisper model name
+        track_language (bool): Let this transcript update the conversation language.
+            Wake-word windows use the language but are too short and noisy to change it.
+    
+    Returns:
+        str: The recognized text (empty if no speech)
+    """
+    samples = preprocess(
+        as_float32(audio),
+        trim=read_settings("asr_trim_silence"),
+        denoise=read_settings("asr_noise_reduction")
+    )
+    if len(samples) == 0:
+        return ""
+    
+    start = time.perf_counter()
+    tracker = get_language_tracker()
+    if track_language:
+        language = tracker.decode_language()
+        text = _decode(samples, model, language)
+        if tracker.needs_redetect(text, language):
+            print(f"🌐 Low-confidence transcript in {language_name(language)}, detecting language again")
+            tracker.record_redetect()
+            language = None
+            text = _decode(samples, model, None)
+        tracker.observe(text, language)
+    else:
+        text = _decode(samples, model, whisper_code(tracker.language))
+    preprocess_stats.record_asr(time.perf_counter() - start)
+    return text
+
+# Frames for command capture, borrowed per recording and reused
+_command_frames = AudioFramePool(count=2, max_seconds=60.0)
+
+def _recognize_command(recognizer, audio):
+    """Whisper first, then Google in the conversation language, then Google in English."""
+    # Try Whisper first (offline, free, high accuracy)
+    try:
+        text = transcribe_whisper(audio, model="base")
+        print(f"✓ Whisper recognized: '{text}'")
+        return text
+
+    except Exception as whisper_error:
+        print(f"Whisper failed: {whisper_error}")
+
+        # Fallback to Google Speech Recognition in the conversation language
+        google_language = get_language_tracker().google_language()
+        try:
+            text = recognizer.recognize_google(as_audio_data(audio), language=google_language)
+            print(f"✓ Google recognized: '{text}'")
+            return text
+
+        except Exception as google_error:
+            print(f"Google fallback failed: {google_error}")
+            if google_language == "en-US":
+                print("All recognition methods failed")
+                return None
+
+            # Final fallback to Google in English
+            try:
+                text = recognizer.recognize_google(as_audio_data(audio), language="en-US")
+                print(f"✓ Google (en-US) recognized: '{text}'")
+                return text
+
+            except Exception as final_error:
+                print(f"All recognition methods failed: {final_error}")
+                return None
+
+
+def record_voice_to_string(timeout=10, phrase_time_limit=None, energy_threshold=300, pause_threshold=0.8,
+                           timings=None):
     """
     Records voice on call and converts to string until user stops speaking.
     
@@ -210,12 +388,13 @@ def record_voice_to_string(timeout=10, phrase_time_limit=None, energy_threshold=
         phrase_time_limit (int): Maximum time to record after speech starts (None = no limit)
         energy_threshold (int): Microphone sensitivity (higher = less sensitive)
         pause_threshold (float): Silence duration before stopping recording (seconds)
+        timings (dict): If given, receives "asr_ms", the time spent transcribing
     
     Returns:
         str: The recognized speech as text, or None if no speech detected/recognized
     """
     recognizer = sr.Recognizer()
-    microphone = sr.Microphone()
+    microphone = sr.Microphone(sample_rate=read_settings("capture_sample_rate") or None)
     
     # Configure recognizer settings
     recognizer.energy_threshold = energy_threshold
@@ -223,63 +402,46 @@ def record_voice_to_string(timeout=10, phrase_time_limit=None, energy_threshold=
     recognizer.phrase_threshold = 0.3  # Minimum audio before considering speech
     recognizer.non_speaking_duration = 0.5  # How long to wait after speech ends
     
-    try:
-        # Calibrate for ambient noise
-        print("Adjusting for ambient noise...")
-        with microphone as source:
-            recognizer.adjust_for_ambient_noise(source, duration=1.0)
-        
-        print("Listening for voice... (speak now)")
-        
-        with microphone as source:
-            # Listen for audio
-            audio = recognizer.listen(
-                source, 
-                timeout=timeout, 
-                phrase_time_limit=phrase_time_limit
-            )
-        
-        print("Processing speech...")
-        
-        # Try Whisper first (offline, free, high accuracy)
+    with _command_frames.frame() as frame:
         try:
-            text = recognizer.recognize_whisper(audio, model="base")
-            print(f"✓ Whisper recognized: '{text}'")
-            return text
+            # Calibrate for ambient noise
+            print("Adjusting for ambient noise...")
+            with microphone as source:
+                recognizer.adjust_for_ambient_noise(source, duration=1.0)
+            
+            print("Listening for voice... (speak now)")
+            
+            with microphone as source:
+                # Listen for audio, decoded straight into the borrowed frame
+                audio = listen_into(
+                    recognizer,
+                    source, 
+                    frame,
+                    timeout=timeout, 
+                    phrase_time_limit=phrase_time_limit
+                )
             
-        except Exception as whisper_error:
-            print(f"Whisper failed: {whisper_error}")
+            print("Processing speech...")
             
-            # Fallback to Google Speech Recognition
+            # Transcription time, the ASR stage of the turn
+            asr_start = time.perf_counter()
             try:
-                text = recognizer.recognize_google(audio, language="en-US")
-                print(f"✓ Google recognized: '{text}'")
-                return text
-                
-            except Exception as google_error:
-                print(f"Google fallback failed: {google_error}")
-                
-                # Final fallback to Google with auto language detection
-                try:
-                    text = recognizer.recognize_google(audio)
-                    print(f"✓ Google (auto-lang) recognized: '{text}'")
-                    return text
-                    
-                except Exception as final_error:
-                    print(f"All recognition methods failed: {final_error}")
-                    return None
-    
-    except sr.WaitTimeoutError:
-        print("⏱️ No speech detected within timeout period")
-        return None
-        
-    except sr.UnknownValueError:
-        print("❌ Could not understand the audio")
-        return None
+                return _recognize_command(recognizer, audio)
+            finally:
+                if timings is not None:
+                    timings["asr_ms"] = round((time.perf_counter() - asr_start) * 1000, 1)
         
-    except Exception as e:
-        print(f"❌ Error during voice recording: {e}")
-        return None
+        except sr.WaitTimeoutError:
+            print("⏱️ No speech detected within timeout period")
+            return None
+            
+        except sr.UnknownValueError:
+            print("❌ Could not understand the audio")
+            return None
+            
+        except Exception as e:
+            print(f"❌ Error during voice recording: {e}")
+            return None
 
 def wake_word_detect_new():
     """
@@ -0,0 +1,460 @@
+"""
+Multi-session Serina server.
+
+Serves many Serina endpoints (rooms/devices) from one process over a local
+WebSocket. Each client streams raw PCM in and receives TTS audio back.
+
+Protocol (one WebSocket per session):
+    client -> {"type": "hello", "sample_rate": 16000, "sample_width": 2, "voice": "nova", "language": "auto", ...}
+    server -> {"type": "ready", "session_id": ...}
+    client -> binary PCM frames (mono, little-endian)
+    client -> {"type": "end"}                      # end of utterance
+    server -> {"type": "transcript", "text": ...}
+    server -> {"type": "response", "text": ...}
+    server -> {"type": "audio", "format": "pcm", "sample_rate": 24000, "bytes": N}
+    server -> binary audio frames
+    ...                                            # audio + frames again per chunk of a long response
+    server -> {"type": "done", "timings": {...}}
+
+A text frame that is not a JSON object gets {"type": "error", ...} back and is
+skipped; a hello that is not one closes the connection with code 1003.
+
+Long responses are split into TTS chunks at sentence boundaries; the chunks
+are synthesized a few at a time and sent in speaking order, each under its
+own "audio" message, so the first audio goes out before the rest is ready.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import time
+import uuid
+
+import numpy as np
+import websockets
+
+import gpt_handler
+from asr_scheduler import SAMPLE_RATE, WhisperBatchScheduler
+from audio_frames import AudioFrame
+from audio_preprocess import preprocess
+from asr_workers import ASRWorkerPool
+from conversation_archive import get_archive
+from json_handle import read_settings
+from language import LanguageTracker
+from speaker_api import synthesize_tts_openai
+from tts_backends import split_for_tts
+from txt_handle import read_txt_file
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+AUDIO_CHUNK_BYTES = 32 * 1024
+TTS_SAMPLE_RATE = 24000  # OpenAI "pcm" response format
+
+
+def print_status(message, status_type="info"):
+    """Print formatted status messages."""
+    timestamp = datetime.datetime.now().strftime('%H:%M:%S')
+    icons = {
+        "info": "ℹ️",
+        "session": "🔌",
+        "processing": "🔄",
+        "success": "✅",
+        "error": "❌",
+        "busy": "⏳"
+    }
+    icon = icons.get(status_type, "ℹ️")
+    print(f"[{timestamp}] {icon} {message}")
+
+
+class ASRModelPool:
+    def __init__(self, model="base", size=1, batch_window_ms=30, max_batch_size=8, workers=0):
+        """
+        Shared pool of Whisper models for all sessions.
+
+        By default these are in-process batching schedulers, each keeping one model
+        resident, so utterances from different sessions that arrive together are
+        decoded as a batch. With workers > 0, decoding runs in separate processes
+        instead and the event loop never waits on the GIL for it.
+
+        Args:
+            model (str): Whisper model name
+            size (int): Number of schedulers (and resident models) in the pool
+            batch_window_ms (float): Batch collection window per scheduler
+            max_batch_size (int): Upper bound on utterances decoded together
+            workers (int): ASR worker processes, 0 to decode in-process
+        """
+        self.model = model
+        self.worker_pool = ASRWorkerPool(model=model, num_workers=workers) if workers else None
+        self.schedulers = [] if workers else [
+            WhisperBatchScheduler(model=model, batch_window_ms=batch_window_ms, max_batch_size=max_batch_size)
+            for _ in range(size)
+        ]
+        # Slot allocation in the worker pool can block, keep it off the event loop
+        self.submit_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-submit")
+
+    def _submit(self, audio, language=None):
+        if self.worker_pool:
+            return self.worker_pool.submit(audio, language)
+        # Least-loaded scheduler keeps batches full without starving a replica
+        return min(self.schedulers, key=lambda s: s.pending).submit(audio, language)
+
+    async def transcribe(self, frame, language=None):
+        """Transcribe a received utterance without blocking the event loop."""
+        # Same trimming and denoising as local capture, as configured in settings.json
+        audio = preprocess(
+            frame.samples(),
+            trim=read_settings("asr_trim_silence"),
+            denoise=read_settings("asr_noise_reduction"),
+            verbose=False
+        )
+        if len(audio) == 0:
+            return ""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(self.submit_executor, self._submit, audio, language)
+        return await asyncio.wrap_future(future)
+
+    def warm_up(self):
+        """Load every model in the pool up front so the first turns are not slow."""
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        if self.worker_pool:
+            # Raises the load error if no worker can load the model
+            self.worker_pool.wait_ready()
+            futures = [self.worker_pool.submit(silence) for _ in range(self.worker_pool.num_workers)]
+        else:
+            futures = [scheduler.submit(silence) for scheduler in self.schedulers]
+        concurrent.futures.wait(futures)
+
+
+class Session:
+    def __init__(self, session_id, settings):
+        """
+        Per-connection state: settings and conversation history.
+
+        Args:
+            session_id (str): Unique session identifier
+            settings (dict): Session settings from the client's hello message
+        """
+        self.session_id = session_id
+        self.sample_rate = int(settings.get("sample_rate", 16000))
+        self.sample_width = int(settings.get("sample_width", 2))
+        self.voice = settings.get("voice", "nova")
+        self.llm_model = settings.get("model", "gpt-5-chat")
+        self.tts_model = settings.get("tts_model", "tts-1")
+        self.speed = float(settings.get("speed", 0.9))
+        self.instructions = settings.get("instructions", "calm and soothing tone.")
+        self.temperature = float(settings.get("temperature", 1.0))
+        self.max_history = int(settings.get("max_history", 7))
+        # Each session (device/speaker) detects and caches its own language
+        self.language = LanguageTracker(settings.get("language"))
+        self.history = []
+        self.turns = 0
+        # Utterance frames handed back after ASR, reused for the next utterances
+        self.free_frames = []
+
+    def take_frame(self, max_seconds):
+        """An empty frame for the next utterance, reusing a released one when possible."""
+        if self.free_frames:
+            frame = self.free_frames.pop()
+            frame.clear()
+            return frame
+        return AudioFrame(max_seconds, self.sample_rate, initial_seconds=min(5.0, max_seconds))
+
+    def add_turn(self, user_text, response):
+        """Append a turn to the history, keeping only the last max_history messages."""
+        self.history.extend([
+            {'role': 'user', 'content': user_text},
+            {'role': 'assistant', 'content': response}
+        ])
+        if len(self.history) > self.max_history:
+            self.history = self.history[-self.max_history:]
+        self.turns += 1
+
+
+class SerinaServer:
+    def __init__(self, asr_pool, system_prompt, max_sessions=16, max_llm_requests=8,
+                 max_tts_requests=8, max_pending_utterances=2, max_utterance_seconds=30, hello_timeout=10):
+        """
+        Serve many Serina sessions from one process.
+
+        Args:
+            asr_pool (ASRModelPool): Shared recognizer pool
+            system_prompt (str): Personality prompt shared by all sessions
+            max_sessions (int): Connections beyond this are refused
+            max_llm_requests (int): Concurrent chat completion requests
+            max_tts_requests (int): Concurrent TTS requests
+            max_pending_utterances (int): Queued utterances per session before reads pause
+            max_utterance_seconds (float): Longest accepted utterance
+            hello_timeout (float): Seconds a new connection has to send its hello message
+        """
+        self.asr_pool = asr_pool
+        self.system_prompt = system_prompt
+        self.max_sessions = max_sessions
+        self.max_pending_utterances = max_pending_utterances
+        self.max_utterance_seconds = max_utterance_seconds
+        self.hello_timeout = hello_timeout
+
+        self.sessions = {}
+        # Connections holding a session slot, counted before the hello so it is part of the limit
+        self.connections = 0
+        self.archive = get_archive()
+        self.llm_slots = asyncio.Semaphore(max_llm_requests)
+        self.tts_slots = asyncio.Semaphore(max_tts_requests)
+        self.tts_first_chunk_chars = read_settings("tts_first_chunk_chars")
+        self.tts_max_parallel_chunks = max(1, read_settings("tts_max_parallel_chunks"))
+
+        # LLM and TTS calls use the shared module-level HTTP clients from worker threads
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_llm_requests + max_tts_requests, thread_name_prefix="io"
+        )
+
+    async def handle(self, websocket, path=None):
+        """Entry point for one WebSocket connection."""
+        # Take the slot before the first await, so connections arriving together cannot all pass the check
+        if self.connections >= self.max_sessions:
+            print_status("Session limit reached, refusing connection", "busy")
+            await websocket.close(code=1013, reason="server busy")
+            return
+        self.connections += 1
+        try:
+            await self._serve_session(websocket)
+        finally:
+            self.connections -= 1
+
+    async def _serve_session(self, websocket):
+        """Wait for the hello, then run the session until the client disconnects."""
+        try:
+            hello = json.loads(await asyncio.wait_for(websocket.recv(), timeout=self.hello_timeout))
+        except asyncio.TimeoutError:
+            await websocket.close(code=1008, reason="no hello message")
+            return
+        except ValueError:
+            await websocket.close(code=1003, reason="hello is not valid JSON")
+            return
+        except Exception:
+            await websocket.close(code=1002, reason="expected hello message")
+            return
+
+        if not isinstance(hello, dict):
+            await websocket.close(code=1003, reason="hello must be a JSON object")
+            return
+        try:
+            session = Session(uuid.uuid4().hex[:8], hello)
+        except (ValueError, TypeError) as e:
+            await websocket.close(code=1003, reason=f"invalid hello: {e}"[:120])
+            return
+        self.sessions[session.session_id] = session
+        print_status(f"Session {session.session_id} connected ({len(self.sessions)} active)", "session")
+
+        # Bounded queue: when a session falls behind, the reader stops pulling from the socket
+        utterances = asyncio.Queue(maxsize=self.max_pending_utterances)
+        worker = asyncio.create_task(self._process_utterances(websocket, session, utterances))
+
+        try:
+            await websocket.send(json.dumps({"type": "ready", "session_id": session.session_id}))
+            await self._read_utterances(websocket, session, utterances)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            worker.cancel()
+            del self.sessions[session.session_id]
+            print_status(f"Session {session.session_id} closed after {session.turns} turns", "session")
+
+    async def _read_utterances(self, websocket, session, utterances):
+        """Decode PCM messages straight into utterance frames and queue them for processing."""
+        frame = session.take_frame(self.max_utterance_seconds)
+        carry = b""
+        overflow = False
+
+        async for message in websocket:
+            if isinstance(message, bytes):
+                if overflow:
+                    continue
+                if carry:
+                    message = carry + message
+                # A sample split across messages waits for the rest of its bytes
+                usable = len(message) - len(message) % session.sample_width
+                carry = message[usable:]
+                if frame.length + usable // session.sample_width > frame.capacity:
+                    # Drop the rest of this utterance, the client is told once
+                    await websocket.send(json.dumps({"type": "error", "error": "utterance too long"}))
+                    frame.clear()
+                    carry = b""
+                    overflow = True
+                    continue
+                frame.append_pcm(memoryview(message)[:usable], session.sample_width)
+                continue
+
+            try:
+                event = json.loads(message)
+            except ValueError:
+                event = None
+            if not isinstance(event, dict):
+                # A bad frame is the client's problem, not the session's: report it and keep reading
+                await websocket.send(json.dumps({"type": "error", "error": "expected a JSON object"}))
+                continue
+            if event.get("type") == "end":
+                carry = b""
+                if overflow:
+                    overflow = False
+                    await websocket.send(json.dumps({"type": "done", "timings": {}}))
+                elif frame.length:
+                    await utterances.put((frame, time.perf_counter()))
+                    frame = session.take_frame(self.max_utterance_seconds)
+                else:
+                    await websocket.send(json.dumps({"type": "done", "timings": {}}))
+
+    async def _synthesize(self, session, chunk):
+        """One TTS request as 24 kHz 16-bit PCM, within the server-wide TTS limit."""
+        async with self.tts_slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.io_executor,
+                lambda: synthesize_tts_openai(
+                    chunk,
+                    voice=session.voice,
+                    model=session.tts_model,
+                    speed=session.speed,
+                    instructions=session.instructions,
+                    response_format="pcm"
+                )
+            )
+
+    async def _send_speech(self, websocket, session, response, start, timings):
+        """Synthesize a response chunk by chunk and stream the audio in speaking order."""
+        chunks = split_for_tts(response, first_chunk_chars=self.tts_first_chunk_chars)
+        tasks = []
+        try:
+            for index in range(len(chunks)):
+                # Keep the next few chunks synthesizing while this one is sent
+                while len(tasks) < min(len(chunks), index + self.tts_max_parallel_chunks):
+                    tasks.append(asyncio.create_task(self._synthesize(session, chunks[len(tasks)])))
+                audio = await tasks[index]
+                if index == 0:
+                    timings["tts_first_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+                await websocket.send(json.dumps({
+                    "type": "audio", "format": "pcm", "sample_rate": TTS_SAMPLE_RATE,
+                    "sample_width": 2, "bytes": len(audio)
+                }))
+                # send() waits for the transport to drain, so slow clients throttle us here
+                for offset in range(0, len(audio), AUDIO_CHUNK_BYTES):
+                    await websocket.send(audio[offset:offset + AUDIO_CHUNK_BYTES])
+        finally:
+            for task in tasks:
+                task.cancel()
+        timings["tts_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _process_utterances(self, websocket, session, utterances):
+        """Run ASR -> LLM -> TTS for each queued utterance, in order."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            frame, ended_at = await utterances.get()
+            timings = {}
+            try:
+                start = time.perf_counter()
+                language = session.language.decode_language()
+                try:
+                    text = await self.asr_pool.transcribe(frame, language)
+                    if session.language.needs_redetect(text, language):
+                        session.language.record_redetect()
+                        language = None
+                        text = await self.asr_pool.transcribe(frame)
+                finally:
+                    # The recognizer is done with the samples, the frame can take the next utterance
+                    session.free_frames.append(frame)
+                session.language.observe(text, language)
+                timings["asr_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+                if not text:
+                    await websocket.send(json.dumps({"type": "transcript", "text": ""}))
+                    await websocket.send(json.dumps({"type": "done", "timings": timings}))
+                    continue
+                await websocket.send(json.dumps({"type": "transcript", "text": text}))
+
+                start = time.perf_counter()
+                async with self.llm_slots:
+                    response = await loop.run_in_executor(
+                        self.io_executor,
+                        lambda: gpt_handler.completion_response(
+                            model=session.llm_model,
+                            system_prompt=self.system_prompt + session.language.prompt_instruction(),
+                            chat_history=session.history or None,
+                            user_prompt=text,
+                            temperature=session.temperature
+                        )
+                    )
+                timings["llm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                session.add_turn(text, response)
+                await websocket.send(json.dumps({"type": "response", "text": response}))
+
+                start = time.perf_counter()
+                await self._send_speech(websocket, session, response, start, timings)
+
+                timings["total_ms"] = round((time.perf_counter() - ended_at) * 1000, 1)
+                await websocket.send(json.dumps({"type": "done", "timings": timings}))
+
+                if self.archive:
+                    self.archive.record_turn(
+                        session.session_id, text, response, source="server",
+                        voice=session.voice, llm_model=session.llm_model, **timings
+                    )
+
+            except websockets.ConnectionClosed:
+                return
+            except Exception as e:
+                print_status(f"Session {session.session_id} turn failed: {e}", "error")
+                try:
+                    await websocket.send(json.dumps({"type": "error", "error": str(e), "timings": timings}))
+                except websockets.ConnectionClosed:
+                    return
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, asr_model="base", asr_pool_size=1,
+                asr_batch_window_ms=30, asr_workers=0, **server_options):
+    """Start the server and run until cancelled."""
+    print_status(f"Loading Whisper '{asr_model}'...", "processing")
+    asr_pool = ASRModelPool(model=asr_model, size=asr_pool_size,
+                            batch_window_ms=asr_batch_window_ms, workers=asr_workers)
+    await asyncio.get_running_loop().run_in_executor(None, asr_pool.warm_up)
+
+    server = SerinaServer(asr_pool, read_txt_file("personality.txt") or "", **server_options)
+
+    async with websockets.serve(server.handle, host, port, max_size=2 ** 20, max_queue=16):
+        print_status(f"Serina server listening on ws://{host}:{port}", "success")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many Serina sessions from one process.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--asr-model", default="base", help="Whisper model name")
+    parser.add_argument("--asr-pool-size", type=int, default=1, help="Resident Whisper models")
+    parser.add_argument("--asr-batch-window-ms", type=float, default=30,
+                        help="How long to collect utterances into one Whisper batch")
+    parser.add_argument("--asr-workers", type=int, default=0,
+                        help="Decode in this many worker processes instead of in-process")
+    parser.add_argument("--max-sessions", type=int, default=16)
+    parser.add_argument("--max-llm-requests", type=int, default=8)
+    parser.add_argument("--max-tts-requests", type=int, default=8)
+    parser.add_argument("--max-pending-utterances", type=int, default=2)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(
+            host=args.host,
+            port=args.port,
+            asr_model=args.asr_model,
+            asr_pool_size=args.asr_pool_size,
+            asr_batch_window_ms=args.asr_batch_window_ms,
+            asr_workers=args.asr_workers,
+            max_sessions=args.max_sessions,
+            max_llm_requests=args.max_llm_requests,
+            max_tts_requests=args.max_tts_requests,
+            max_pending_utterances=args.max_pending_utterances
+        ))
+    except KeyboardInterrupt:
+        print("\n🛑 Serina server stopped.")
+        for line in gpt_handler.endpoint_report():
+            print(f"🌐 LLM {line}")
@@ -1,41 +1,23 @@
 import asyncio
 import edge_tts
-import tempfile
-import os
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-import pygame
-import time
+from audio_output import get_output_engine
 
 async def play_tts_immediately(text, voice="en-US-AriaNeural"):
-    """Play TTS audio immediately using a temporary file"""
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-        tmp_filename = tmp_file.name
+    """Play TTS audio immediately from memory on the shared output engine"""
+    # Collect the generated speech without touching the disk
+    communicate = edge_tts.Communicate(text, voice)
+    audio_data = bytearray()
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio_data.extend(chunk["data"])
     
-    try:
-        # Generate speech and save to temporary file
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(tmp_filename)
-        
-        # Initialize pygame mixer for audio playback
-        pygame.mixer.init()
-        
-        # Load and play the audio file
-        pygame.mixer.music.load(tmp_filename)
-        pygame.mixer.music.play()
-        
-        # Wait for playback to finish
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
-            
-    finally:
-        # Clean up the temporary file
-        pygame.mixer.quit()
-        if os.path.exists(tmp_filename):
-            os.unlink(tmp_filename)
+    # Decode off the event loop, then wait for playback to finish
+    loop = asyncio.get_running_loop()
+    handle = await loop.run_in_executor(None, get_output_engine().play_encoded, bytes(audio_data))
+    await handle
 
 if __name__ == "__main__":
     # Test the function
     test_text = "Hello, I'm under the water, please help me."
     print(f"Speaking: {test_text}")
-    play_tts_immediately(test_text, voice="en-US-JennyNeural") #en-US-AriaNeural en-US-JennyNeural en-US-MichelleNeural
\ No newline at end of file
+    asyncio.run(play_tts_immediately(test_text, voice="en-US-JennyNeural")) #en-US-AriaNeural en-US-JennyNeural en-US-MichelleNeural
@@ -1,20 +1,16 @@
 import openai
 import httpx
-import io
 import os
-# Suppress pygame welcome message BEFORE importing pygame
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-import pygame
 from dotenv import load_dotenv
-import tempfile
-import asyncio
+import concurrent.futures
+from audio_output import OUTPUT_SAMPLE_RATE
+from audio_preprocess import pcm_to_float32
+from json_handle import read_settings
+from tts_backends import TTS_MAX_INPUT_CHARS, split_for_tts, play_chunks, play_chunks_async
 
 # Load environment variables
 load_dotenv()
 
-# Initialize pygame mixer for audio playback
-pygame.mixer.init()
-
 # Get environment variables for OpenAI configuration
 redirect_url = os.getenv('gpt_redirect_url')
 api_key = os.getenv('gpt_api_key')
@@ -34,10 +30,47 @@ else:
         api_key=api_key
     )
 
+def synthesize_tts_openai(text, voice="nova", model="tts-1", speed=1.0, instructions=None, response_format="mp3"):
+    """
+    Convert text to speech using OpenAI TTS API and return the encoded audio.
+    Uses the shared module-level client, so concurrent callers reuse one
+    connection pool.
+    
+    Args:
+        text (str): The text to convert to speech
+        voice (str): Voice to use. Options: alloy, echo, fable, onyx, nova, shimmer
+        model (str): TTS model to use. Options: tts-1, tts-1-hd
+        speed (float): Speech speed (0.25 to 4.0)
+        instructions (str): Optional instructions for the voice tone/style
+        response_format (str): Audio format. Options: mp3, wav, pcm (24 kHz 16-bit mono)
+    
+    Returns:
+        bytes: Encoded audio data
+    """
+    response = openai_client.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        speed=speed,
+        instructions=instructions,
+        response_format=response_format
+    )
+    return response.content
+
+def _pcm_chunk_synthesizer(voice, model, speed, instructions):
+    """chunk -> (samples, rate) using raw PCM at the output engine's rate: no decoding, no resampling."""
+    def synthesize(chunk, due=None):
+        pcm = synthesize_tts_openai(chunk, voice=voice, model=model, speed=speed,
+                                    instructions=instructions, response_format="pcm")
+        return pcm_to_float32(pcm, OUTPUT_SAMPLE_RATE, target_rate=OUTPUT_SAMPLE_RATE), OUTPUT_SAMPLE_RATE
+    return synthesize
+
 def play_tts_openai(text, voice="nova", model="tts-1", speed=1.0, instructions=None):
     """
     Convert text to speech using OpenAI TTS-1 API and play it automatically.
-    Does not save any audio files - plays directly from memory.
+    Does not save any audio files - plays directly from memory. Text over the
+    4096-character request limit is split at sentence boundaries; chunks are
+    synthesized in parallel and played in order as they arrive.
     
     Args:
         text (str): The text to convert to speech
@@ -48,28 +81,13 @@ def play_tts_openai(text, voice="nova", model="tts-1", speed=1.0, instructions=N
         bool: True if successful, False if failed
     """
     try:
-        # Generate speech using OpenAI TTS API with pre-configured client
-        response = openai_client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text,
-            speed=speed,
-            instructions=instructions
-        )
-        
-        # Get audio data as bytes
-        audio_data = response.content
+        chunks = split_for_tts(text, first_chunk_chars=read_settings("tts_first_chunk_chars"))
+        handle = play_chunks(chunks, _pcm_chunk_synthesizer(voice, model, speed, instructions),
+                             read_settings("tts_max_parallel_chunks"))
         
-        # Create a temporary file-like object in memory
-        audio_buffer = io.BytesIO(audio_data)
-        
-        # Play audio directly from memory using pygame
-        pygame.mixer.music.load(audio_buffer)
-        pygame.mixer.music.play()
-        
-        # Wait for playback to complete
-        while pygame.mixer.music.get_busy():
-            pygame.time.wait(100)
+        # Wait for the last sample of the last chunk to play
+        if handle:
+            handle.wait()
         
         print(f"✓ Successfully played TTS: '{text[:50]}{'...' if len(text) > 50 else ''}'")
         return True
@@ -93,10 +111,15 @@ async def play_tts_openai_async(text, voice="nova", model="tts-1", speed=1.0, in
         bool: True if successful, False if failed
     """
     try:
-        # Run the synchronous function in a thread pool
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, play_tts_openai, text, voice, model, speed, instructions)
-        return result
+        # Only the HTTP requests need threads, playback completion is awaited directly
+        chunks = split_for_tts(text, first_chunk_chars=read_settings("tts_first_chunk_chars"))
+        handle = await play_chunks_async(chunks, _pcm_chunk_synthesizer(voice, model, speed, instructions),
+                                         read_settings("tts_max_parallel_chunks"))
+        if handle:
+            await handle
+        
+        print(f"✓ Successfully played TTS: '{text[:50]}{'...' if len(text) > 50 else ''}'")
+        return True
         
     except Exception as e:
         print(f"❌ Error in async OpenAI TTS playback: {e}")
@@ -123,15 +146,15 @@ def save_tts_to_mp3(text, filename, voice="nova", model="tts-1", speed=1.0, inst
         voice_dir = os.path.join(base_dir, voice)
         os.makedirs(voice_dir, exist_ok=True)
         
-        # Generate speech using OpenAI TTS API
-        response = openai_client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text,
-            speed=speed,
-            instructions=instructions,
-            response_format="mp3"  # Explicitly request MP3 format
-        )
+        # Generate speech using OpenAI TTS API; long text is requested in parallel chunks
+        # and the MP3 streams are concatenated (MP3 frames are self-contained)
+        chunks = split_for_tts(text)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=read_settings("tts_max_parallel_chunks")) as executor:
+            audio_parts = list(executor.map(
+                lambda chunk: synthesize_tts_openai(chunk, voice=voice, model=model, speed=speed,
+                                                    instructions=instructions, response_format="mp3"),
+                chunks
+            ))
         
         # Create full file path
         mp3_filename = f"{filename}.mp3" if not filename.endswith('.mp3') else filename
@@ -139,7 +162,7 @@ def save_tts_to_mp3(text, filename, voice="nova", model="tts-1", speed=1.0, inst
         
         # Save the audio data to MP3 file
         with open(file_path, 'wb') as audio_file:
-            audio_file.write(response.content)
+            audio_file.write(b"".join(audio_parts))
         
         print(f"✓ Successfully saved MP3: '{file_path}'")
         print(f"  Text: '{text[:50]}{'...' if len(text) > 50 else ''}'")
@@ -189,7 +212,7 @@ def get_voice_info():
             "tts-1-hd": "Higher quality, slower generation"
         },
         "speed_range": "0.25 to 4.0 (1.0 is normal speed)",
-        "max_input_length": "4096 characters"
+        "max_input_length": f"{TTS_MAX_INPUT_CHARS} characters per request (longer text is split automatically)"
     }
 
 if __name__ == "__main__":
@@ -197,7 +220,7 @@ if __name__ == "__main__":
     print("Features:")
     print("✓ Uses OpenAI TTS-1 API")
     print("✓ No audio files saved")
-    print("✓ Direct memory playback")
+    print("✓ Direct memory playback (gapless output engine)")
     print("✓ Multiple voice options")
     print("✓ Async support")
     print("✓ MP3 file saving with organized folders")
@@ -278,6 +301,6 @@ if __name__ == "__main__":
         print(f"Program error: {e}")
         print("\nMake sure you have:")
         print("1. Set gpt_api_key in your .env file")
-        print("2. Installed required packages: pip install openai pygame python-dotenv httpx")
+        print("2. Installed required packages: pip install openai sounddevice soundfile python-dotenv httpx")
         print("3. Valid OpenAI API key with TTS access")
         print("4. Optionally set gpt_redirect_url if using a proxy/redirect")
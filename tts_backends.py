@@ -0,0 +1,562 @@
+"""
+TTS backend registry with latency hedging.
+
+Every speech request runs on a primary backend with a latency budget. If
+the primary has not produced its first audio within the budget (or fails),
+a local offline engine starts synthesizing too, whichever finishes first is
+played, and the slower one is cancelled. A primary that is already
+streaming audio is left to finish. Per-backend latency histograms (time to
+first audio and total time) show how often each path wins.
+
+    "tts_primary": "openai"       online, best quality
+    "tts_fallback": "local"       first available offline engine (espeak-ng, espeak, pyttsx3)
+    "tts_latency_budget": 1.5     seconds to first audio before the fallback starts
+
+Text longer than one request allows is split at sentence boundaries and
+the chunks are synthesized a few at a time, each queued for playback in
+order as soon as it is ready, so long answers work and start sooner. Only
+the first chunk is raced against the budget; a later chunk is only needed
+once the one before it has finished playing, so the fallback (and its
+different voice) only steps in if the primary has sent nothing by then.
+"""
+import asyncio
+import bisect
+import concurrent.futures
+import io
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import soundfile as sf
+
+from audio_output import get_output_engine
+from audio_preprocess import pcm_to_float32
+from json_handle import read_settings
+
+TTS_MAX_INPUT_CHARS = 4096  # OpenAI speech endpoint limit
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？；])")
+
+
+class SynthesisCancelled(Exception):
+    pass
+
+
+class LatencyHistogram:
+    BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+    def __init__(self):
+        """Bucketed time-to-first-audio and total latency counts plus outcome counters for one backend."""
+        self.counts = {"first_audio": [0] * (len(self.BUCKETS_MS) + 1), "total": [0] * (len(self.BUCKETS_MS) + 1)}
+        self.totals = {"first_audio": 0, "total": 0}
+        self.outcomes = {"won": 0, "lost": 0, "failed": 0, "cancelled": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def total(self):
+        return self.totals["total"]
+
+    def record(self, latency_ms, kind="total"):
+        with self.lock:
+            self.counts[kind][bisect.bisect_left(self.BUCKETS_MS, latency_ms)] += 1
+            self.totals[kind] += 1
+
+    def outcome(self, name):
+        with self.lock:
+            self.outcomes[name] += 1
+
+    def percentile(self, pct, kind="total"):
+        """Upper bound of the bucket holding the pct-th percentile, in ms."""
+        with self.lock:
+            if not self.totals[kind]:
+                return None
+            target = pct / 100 * self.totals[kind]
+            running = 0
+            for index, count in enumerate(self.counts[kind]):
+                running += count
+                if running >= target:
+                    return self.BUCKETS_MS[index] if index < len(self.BUCKETS_MS) else float("inf")
+
+    def summary(self):
+        if not self.total:
+            return "no samples"
+        outcomes = ", ".join(f"{name} {count}" for name, count in self.outcomes.items() if count)
+        return (f"{self.total} samples, first audio p50 ≤{self.percentile(50, 'first_audio')} ms "
+                f"p95 ≤{self.percentile(95, 'first_audio')} ms, "
+                f"total p50 ≤{self.percentile(50)} ms p95 ≤{self.percentile(95)} ms"
+                f"{' (' + outcomes + ')' if outcomes else ''}")
+
+
+latency_histograms = {}
+
+
+def _histogram(name):
+    return latency_histograms.setdefault(name, LatencyHistogram())
+
+
+def latency_report():
+    """Per-backend latency summary lines."""
+    return [f"{name}: {histogram.summary()}" for name, histogram in latency_histograms.items()]
+
+
+class TTSBackend:
+    name = "base"
+    offline = False
+
+    def synthesize(self, text, cancel_event, on_audio=None, **options):
+        """
+        Synthesize text to audio.
+
+        Args:
+            text (str): Text to speak
+            cancel_event (threading.Event): Set when the result is no longer wanted
+            on_audio (callable): Called when the first audio arrives, by backends that stream;
+                for the others the finished result counts as the first audio
+            **options: Backend options; each backend ignores the ones it does not use
+
+        Returns:
+            tuple: (float32 mono samples, sample_rate)
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def available(cls):
+        return True
+
+
+class OpenAITTSBackend(TTSBackend):
+    name = "openai"
+    sample_rate = 24000
+
+    def synthesize(self, text, cancel_event, on_audio=None, voice="nova", model="tts-1", speed=1.0,
+                   instructions=None, **_):
+        from speaker_api import openai_client
+
+        pcm = bytearray()
+        # Streaming lets a cancelled request drop its connection instead of finishing
+        with openai_client.audio.speech.with_streaming_response.create(
+            model=model, voice=voice, input=text, speed=speed,
+            instructions=instructions, response_format="pcm"
+        ) as response:
+            for chunk in response.iter_bytes(chunk_size=16384):
+                if cancel_event.is_set():
+                    raise SynthesisCancelled()
+                if chunk and not pcm and on_audio:
+                    on_audio()
+                pcm.extend(chunk)
+        return pcm_to_float32(pcm, self.sample_rate, target_rate=self.sample_rate), self.sample_rate
+
+
+class EdgeTTSBackend(TTSBackend):
+    name = "edge"
+
+    def synthesize(self, text, cancel_event, on_audio=None, edge_voice=None, **_):
+        import edge_tts
+
+        async def collect():
+            communicate = edge_tts.Communicate(text, edge_voice or read_settings("serina_voice_model"))
+            audio = bytearray()
+            async for chunk in communicate.stream():
+                if cancel_event.is_set():
+                    raise SynthesisCancelled()
+                if chunk["type"] == "audio":
+                    if not audio and on_audio:
+                        on_audio()
+                    audio.extend(chunk["data"])
+            return bytes(audio)
+
+        samples, sample_rate = sf.read(io.BytesIO(asyncio.run(collect())), dtype="float32", always_2d=True)
+        return samples.mean(axis=1), sample_rate
+
+    @classmethod
+    def available(cls):
+        try:
+            import edge_tts  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+class EspeakBackend(TTSBackend):
+    name = "espeak"
+    offline = True
+
+    @staticmethod
+    def _binary():
+        return shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def synthesize(self, text, cancel_event, local_voice=None, local_rate=170, language=None, **_):
+        command = [self._binary(), "--stdout", "-s", str(local_rate)]
+        # espeak voices are named by language code, so the conversation language works as one
+        if local_voice or language:
+            command += ["-v", local_voice or language]
+        process = subprocess.Popen(command + [text], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        # Kill espeak as soon as its result is no longer wanted
+        while True:
+            try:
+                wav_bytes, _ = process.communicate(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event.is_set():
+                    process.kill()
+                    process.communicate()
+                    raise SynthesisCancelled()
+        if process.returncode != 0:
+            raise RuntimeError(f"espeak exited with code {process.returncode}")
+
+        samples, sample_rate = sf.read(io.BytesIO(wav_bytes), dtype="float32", always_2d=True)
+        return samples.mean(axis=1), sample_rate
+
+    @classmethod
+    def available(cls):
+        return cls._binary() is not None
+
+
+class Pyttsx3Backend(TTSBackend):
+    name = "pyttsx3"
+    offline = True
+
+    def __init__(self):
+        # pyttsx3 engines are not thread-safe
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, cancel_event, local_voice=None, local_rate=170, **_):
+        import pyttsx3
+
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
+            path = tmp_file.name
+        try:
+            with self.lock:
+                engine = pyttsx3.init()
+                engine.setProperty("rate", local_rate)
+                if local_voice:
+                    engine.setProperty("voice", local_voice)
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+            if cancel_event.is_set():
+                raise SynthesisCancelled()
+            samples, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+            return samples.mean(axis=1), sample_rate
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    @classmethod
+    def available(cls):
+        try:
+            import pyttsx3  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+TTS_BACKENDS = {
+    OpenAITTSBackend.name: OpenAITTSBackend,
+    EdgeTTSBackend.name: EdgeTTSBackend,
+    EspeakBackend.name: EspeakBackend,
+    Pyttsx3Backend.name: Pyttsx3Backend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+# Room for a primary and a fallback for every chunk synthesized in parallel
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts")
+_chunk_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts-chunk")
+
+
+def register_tts_backend(name, backend_class):
+    """Make a TTSBackend subclass selectable by name in settings.json."""
+    TTS_BACKENDS[name] = backend_class
+
+
+def get_tts_backend(name):
+    """
+    Backend instance by name. "local" picks the first available offline engine.
+
+    Returns:
+        TTSBackend: Shared instance, or None if nothing suitable is installed
+    """
+    if name == "local":
+        name = next((n for n, cls in TTS_BACKENDS.items() if cls.offline and cls.available()), None)
+        if name is None:
+            return None
+    with _instances_lock:
+        if name not in _instances:
+            if name not in TTS_BACKENDS:
+                raise ValueError(f"Unknown TTS backend '{name}'. Available: {', '.join(TTS_BACKENDS)}")
+            _instances[name] = TTS_BACKENDS[name]()
+        return _instances[name]
+
+
+def _timed_synthesis(backend, text, cancel_event, first_audio, options):
+    start = time.perf_counter()
+
+    def on_audio():
+        # Only ever called from this thread, and before the future's done callback
+        if not first_audio.done():
+            _histogram(backend.name).record((time.perf_counter() - start) * 1000, "first_audio")
+            first_audio.set_result(None)
+
+    try:
+        audio = backend.synthesize(text, cancel_event, on_audio=on_audio, **options)
+    except SynthesisCancelled:
+        _histogram(backend.name).outcome("cancelled")
+        raise
+    except Exception:
+        _histogram(backend.name).outcome("failed")
+        raise
+    # Backends that do not stream deliver all their audio at once
+    on_audio()
+    _histogram(backend.name).record((time.perf_counter() - start) * 1000)
+    return audio
+
+
+def synthesize_hedged(text, budget=None, primary=None, fallback=None, due=None, **options):
+    """
+    Synthesize with a latency budget, racing a local fallback when the primary is slow to start.
+
+    Args:
+        text (str): Text to speak
+        budget (float): Seconds the primary gets to produce its first audio before the fallback starts
+        primary (str): Primary backend name, defaults to "tts_primary" in settings.json
+        fallback (str): Fallback backend name, defaults to "tts_fallback" in settings.json
+        due (concurrent.futures.Future): Resolves when the audio is needed (the previous chunk has
+            finished playing); the primary then keeps the budget or until then, whichever is later.
+            Cancelling it means the audio is no longer needed in time, and no fallback is started.
+        **options: Backend options (voice, model, speed, instructions, edge_voice, local_voice, ...)
+
+    Returns:
+        tuple: (samples, sample_rate, backend_name)
+    """
+    budget = read_settings("tts_latency_budget") if budget is None else budget
+    primary_backend = get_tts_backend(primary or read_settings("tts_primary"))
+    fallback_backend = get_tts_backend(fallback or read_settings("tts_fallback"))
+
+    racers = {}
+
+    def start(backend):
+        cancel_event = threading.Event()
+        # Resolved by the first audio, or by the end of the request however it ends
+        first_audio = concurrent.futures.Future()
+        future = _executor.submit(_timed_synthesis, backend, text, cancel_event, first_audio, options)
+        future.add_done_callback(lambda _: first_audio.done() or first_audio.set_result(None))
+        racers[future] = (backend, cancel_event)
+        return future, first_audio
+
+    primary_future, primary_audio = start(primary_backend)
+    concurrent.futures.wait([primary_audio], timeout=budget)
+    if due is not None and not primary_audio.done():
+        # Nobody is waiting for this audio until the chunk before it has played out
+        concurrent.futures.wait([primary_audio, due], return_when=concurrent.futures.FIRST_COMPLETED)
+    if primary_audio.done() and not primary_future.done() or due is not None and due.cancelled():
+        # Audio is streaming in (the primary is healthy), or it is no longer needed on time: let it finish
+        concurrent.futures.wait([primary_future])
+    done = primary_future.done()
+    if done and primary_future.exception() is None:
+        _histogram(primary_backend.name).outcome("won")
+        samples, sample_rate = primary_future.result()
+        return samples, sample_rate, primary_backend.name
+
+    if fallback_backend is None or fallback_backend is primary_backend:
+        # Nothing to race against, wait for the primary (or its error)
+        samples, sample_rate = primary_future.result()
+        _histogram(primary_backend.name).outcome("won")
+        return samples, sample_rate, primary_backend.name
+
+    reason = "failed" if done else ("sent no audio by the time it was due" if due is not None
+                                    else f"sent no audio within {budget:.1f}s")
+    print(f"⚡ TTS {primary_backend.name} {reason}, starting {fallback_backend.name}")
+    start(fallback_backend)
+
+    pending = set(racers) - ({primary_future} if done else set())
+    errors = [primary_future.exception()] if done else []
+    while pending:
+        finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in finished:
+            backend, _ = racers[future]
+            if future.exception() is not None:
+                errors.append(future.exception())
+                continue
+            # First good result wins, everything still running is cancelled
+            for other in pending:
+                racers[other][1].set()
+                _histogram(racers[other][0].name).outcome("lost")
+            _histogram(backend.name).outcome("won")
+            samples, sample_rate = future.result()
+            return samples, sample_rate, backend.name
+
+    raise RuntimeError(f"All TTS backends failed: {'; '.join(str(e) for e in errors)}")
+
+
+def _sentences(text, max_chars):
+    """Sentences of text, with any sentence over max_chars broken at spaces (or hard cut)."""
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if len(sentence) <= max_chars:
+            if sentence:
+                yield sentence
+            continue
+        piece = ""
+        for word in sentence.split():
+            while len(word) > max_chars:
+                # Unspaced scripts (CJK) have no word breaks to use
+                if piece:
+                    yield piece
+                    piece = ""
+                yield word[:max_chars]
+                word = word[max_chars:]
+            if piece and len(piece) + 1 + len(word) > max_chars:
+                yield piece
+                piece = word
+            else:
+                piece = f"{piece} {word}" if piece else word
+        if piece:
+            yield piece
+
+
+def split_for_tts(text, max_chars=TTS_MAX_INPUT_CHARS, first_chunk_chars=None):
+    """
+    Split text into TTS requests at sentence boundaries.
+
+    Args:
+        text (str): Text to speak
+        max_chars (int): Longest chunk, the TTS input limit
+        first_chunk_chars (int): Keep the first chunk about this short so playback starts early
+
+    Returns:
+        list: Chunks in speaking order
+    """
+    chunks = []
+    current = ""
+    limit = min(first_chunk_chars or max_chars, max_chars)
+    for sentence in _sentences(text, max_chars):
+        # CJK sentences run together without a space
+        separator = "" if current.endswith(("。", "！", "？", "；")) else " "
+        joined = f"{current}{separator}{sentence}" if current else sentence
+        if len(joined) <= limit:
+            current = joined
+            continue
+        if current:
+            chunks.append(current)
+            limit = max_chars
+        current = sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _ChunkWindow:
+    def __init__(self, chunks, synthesize, max_parallel):
+        """Synthesize chunks in order, keeping at most max_parallel requests in flight."""
+        self.chunks = chunks
+        self.synthesize = synthesize
+        self.max_parallel = max(1, max_parallel)
+        self.futures = []
+        # due[i] resolves when chunk i - 1 has finished playing; the first chunk is due at once
+        self.due = [None] + [concurrent.futures.Future() for _ in chunks[1:]]
+
+    def future(self, index):
+        """Future for chunk index, topping the window up to index + max_parallel first."""
+        while len(self.futures) < min(len(self.chunks), index + self.max_parallel):
+            next_index = len(self.futures)
+            self.futures.append(_chunk_executor.submit(self.synthesize, self.chunks[next_index], self.due[next_index]))
+        return self.futures[index]
+
+    def playing(self, index, handle):
+        """Chunk index is queued for playback: the next chunk is due when it ends."""
+        if index + 1 < len(self.due):
+            due = self.due[index + 1]
+            handle.future.add_done_callback(lambda _: due.done() or due.set_result(None))
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+        for due in self.due[1:]:
+            due.cancel()
+
+
+def _chunk_settings(text, max_parallel):
+    chunks = split_for_tts(text, first_chunk_chars=read_settings("tts_first_chunk_chars"))
+    return chunks, max_parallel or read_settings("tts_max_parallel_chunks")
+
+
+def play_chunks(chunks, synthesize, max_parallel=3):
+    """
+    Synthesize chunks concurrently and play them strictly in order, each as soon as it is ready.
+
+    Args:
+        chunks (list): Text chunks in speaking order
+        synthesize (callable): (chunk, due) -> (samples, sample_rate), where due is None for the
+            first chunk and otherwise a Future resolving when the previous chunk has finished playing
+        max_parallel (int): Most chunks synthesized at once
+
+    Returns:
+        PlaybackHandle: Handle of the last chunk, None if there was nothing to play
+    """
+    window = _ChunkWindow(chunks, synthesize, max_parallel)
+    handle = None
+    try:
+        for index in range(len(chunks)):
+            samples, sample_rate = window.future(index).result()
+            # The engine queue is gapless, so this chunk starts right after the previous one
+            handle = get_output_engine().play(samples, sample_rate)
+            window.playing(index, handle)
+    except BaseException:
+        window.cancel()
+        raise
+    return handle
+
+
+async def play_chunks_async(chunks, synthesize, max_parallel=3):
+    """Async version of play_chunks; waits on chunk futures without blocking the event loop."""
+    window = _ChunkWindow(chunks, synthesize, max_parallel)
+    handle = None
+    try:
+        for index in range(len(chunks)):
+            samples, sample_rate = await asyncio.wrap_future(window.future(index))
+            handle = get_output_engine().play(samples, sample_rate)
+            window.playing(index, handle)
+    except BaseException:
+        window.cancel()
+        raise
+    return handle
+
+
+def speak_hedged(text, budget=None, primary=None, fallback=None, max_parallel=None, **options):
+    """
+    Synthesize with hedging and play the result, waiting for playback to finish.
+    Long text is split into chunks that are synthesized in parallel and played in order;
+    the first chunk is hedged against the budget, later ones against their playback time.
+
+    Returns:
+        bool: True if successful, False if failed
+    """
+    try:
+        chunks, max_parallel = _chunk_settings(text, max_parallel)
+        handle = play_chunks(
+            chunks, lambda chunk, due: synthesize_hedged(chunk, budget, primary, fallback, due, **options)[:2],
+            max_parallel
+        )
+        return handle.wait() if handle else True
+    except Exception as e:
+        print(f"❌ Error in TTS playback: {e}")
+        return False
+
+
+async def speak_hedged_async(text, budget=None, primary=None, fallback=None, max_parallel=None, **options):
+    """Async version of speak_hedged; only synthesis runs in threads."""
+    try:
+        chunks, max_parallel = _chunk_settings(text, max_parallel)
+        handle = await play_chunks_async(
+            chunks, lambda chunk, due: synthesize_hedged(chunk, budget, primary, fallback, due, **options)[:2],
+            max_parallel
+        )
+        return await handle if handle else True
+    except Exception as e:
+        print(f"❌ Error in TTS playback: {e}")
+        return False
@@ -0,0 +1,251 @@
+"""
+Phonetic wake-word matcher.
+
+Every wake word and alias is compiled once into its spelling and a coarse
+phonetic code, each wrapped in a bounded edit-distance matcher. A transcript
+(or several Whisper segments / recognizer n-best hypotheses) is tokenized on
+word boundaries and scored against all wake words in a single pass, so
+"arena" inside "arenas" is never rewritten and unrelated words that merely
+share letters score zero.
+"""
+import re
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+")
+
+# Letter groups that sound alike collapse to one symbol before comparison
+_DIGRAPHS = (
+    ("tch", "X"), ("sch", "SK"), ("ph", "F"), ("sh", "X"), ("ch", "X"), ("th", "0"),
+    ("ck", "K"), ("gh", "K"), ("dg", "J"), ("kn", "N"), ("wr", "R"), ("qu", "KW"),
+)
+_LETTERS = {
+    "a": "A", "e": "A", "i": "A", "o": "A", "u": "A", "y": "A",
+    "b": "B", "c": "K", "d": "T", "f": "F", "g": "K", "h": "", "j": "J", "k": "K",
+    "l": "L", "m": "M", "n": "N", "p": "P", "q": "K", "r": "R", "s": "S", "t": "T",
+    "v": "F", "w": "", "x": "KS", "z": "S",
+}
+
+
+def phonetic_code(word):
+    """
+    Coarse phonetic key: vowels become A, similar consonants merge, repeats collapse.
+
+    serina, serena, sarina and sirena all map to "SARANA".
+
+    Args:
+        word (str): A single lowercase word
+
+    Returns:
+        str: Phonetic code (may be empty for non-Latin words)
+    """
+    initial_h = word.startswith("h")
+    # Soft c sounds like s before front vowels
+    word = re.sub(r"c(?=[eiy])", "s", word)
+    for group, replacement in _DIGRAPHS:
+        word = word.replace(group, replacement)
+
+    code = ["H"] if initial_h and word.startswith("h") else []
+    for char in word:
+        # Digraph replacements are already phonetic symbols
+        symbol = char if char.isupper() or char == "0" else _LETTERS.get(char, "")
+        for part in symbol:
+            if not code or code[-1] != part:
+                code.append(part)
+    return "".join(code)
+
+
+class BoundedEditDistance:
+    def __init__(self, pattern, max_distance):
+        """
+        Levenshtein matcher against a fixed pattern that gives up past max_distance.
+
+        The DP row is the state of the Levenshtein automaton for the pattern;
+        once every cell exceeds the bound no continuation can match, so the
+        scan stops early.
+
+        Args:
+            pattern (str): String to match against
+            max_distance (int): Largest distance worth reporting
+        """
+        self.pattern = pattern
+        self.max_distance = max_distance
+        self.initial_row = list(range(len(pattern) + 1))
+
+    def distance(self, text):
+        """
+        Edit distance between text and the pattern.
+
+        Returns:
+            int: The distance, or None if it exceeds max_distance
+        """
+        pattern = self.pattern
+        k = self.max_distance
+        if abs(len(text) - len(pattern)) > k:
+            return None
+
+        row = self.initial_row
+        for i, char in enumerate(text, 1):
+            new_row = [i]
+            row_min = i
+            for j, pattern_char in enumerate(pattern, 1):
+                cost = row[j - 1] + (pattern_char != char)
+                if row[j] + 1 < cost:
+                    cost = row[j] + 1
+                if new_row[j - 1] + 1 < cost:
+                    cost = new_row[j - 1] + 1
+                new_row.append(cost)
+                if cost < row_min:
+                    row_min = cost
+            if row_min > k:
+                return None
+            row = new_row
+
+        return row[-1] if row[-1] <= k else None
+
+
+class WakeMatch:
+    __slots__ = ("wake_word", "alias", "heard", "score", "candidate")
+
+    def __init__(self, wake_word, alias, heard, score, candidate):
+        """
+        Best match found by WakeWordMatcher.
+
+        Args:
+            wake_word (str): Canonical wake word that matched
+            alias (str): The wake word or alias spelling that matched
+            heard (str): Token(s) from the transcript that matched
+            score (float): Match score in [0, 1]
+            candidate (int): Index of the hypothesis/segment that matched
+        """
+        self.wake_word = wake_word
+        self.alias = alias
+        self.heard = heard
+        self.score = score
+        self.candidate = candidate
+
+    def __repr__(self):
+        return f"WakeMatch({self.wake_word!r}, heard={self.heard!r}, score={self.score:.2f})"
+
+
+class _CompiledWord:
+    __slots__ = ("wake_word", "alias", "n_tokens", "spelling", "phonetic", "onset")
+
+    def __init__(self, wake_word, alias, max_spelling_distance, max_phonetic_distance):
+        self.wake_word = wake_word
+        self.alias = alias
+        tokens = TOKEN_PATTERN.findall(alias.lower())
+        self.n_tokens = len(tokens)
+        joined = "".join(tokens)
+        code = "".join(phonetic_code(token) for token in tokens)
+        self.spelling = BoundedEditDistance(joined, max_spelling_distance)
+        self.phonetic = BoundedEditDistance(code, max_phonetic_distance)
+        self.onset = code[:1]
+
+
+class WakeWordMatcher:
+    def __init__(self, wake_words, max_spelling_distance=2, max_phonetic_distance=1, cache_size=4096):
+        """
+        Precompile wake words and aliases for fast matching.
+
+        Args:
+            wake_words (dict | list | str): {wake_word: [aliases]}, a list of wake words, or one wake word.
+                Multi-word wake phrases ("hey serina") are supported.
+            max_spelling_distance (int): Largest spelling edit distance that still scores
+            max_phonetic_distance (int): Largest phonetic-code edit distance that still scores
+            cache_size (int): Scored (token, n-gram) strings remembered between calls
+        """
+        if isinstance(wake_words, str):
+            wake_words = {wake_words: []}
+        elif not isinstance(wake_words, dict):
+            wake_words = {word: [] for word in wake_words}
+
+        self.compiled = []
+        for wake_word, aliases in wake_words.items():
+            for alias in [wake_word, *aliases]:
+                self.compiled.append(_CompiledWord(
+                    wake_word.lower(), alias.lower(), max_spelling_distance, max_phonetic_distance
+                ))
+        self.max_tokens = max(word.n_tokens for word in self.compiled)
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def _score_span(self, span):
+        """Score one token or joined n-gram against every compiled word: (score, word) or None."""
+        cached = self._cache.get(span)
+        if cached is not None or span in self._cache:
+            return cached
+
+        code = None
+        best = None
+        for word in self.compiled:
+            if word.spelling.pattern == span:
+                best = (1.0, word)
+                break
+
+            spelling_distance = word.spelling.distance(span)
+            spelling_score = 0.0
+            if spelling_distance is not None:
+                spelling_score = (1.0 - spelling_distance / max(len(span), len(word.spelling.pattern))) ** 2
+
+            if code is None:
+                code = phonetic_code(span)
+            phonetic_score = 0.0
+            # A different first sound (marina, arena) is a different word; non-Latin
+            # aliases have no phonetic code and match on spelling only
+            if code and code[:1] == word.onset:
+                phonetic_distance = word.phonetic.distance(code)
+                if phonetic_distance is not None:
+                    phonetic_score = (1.0 - phonetic_distance / max(len(code), len(word.phonetic.pattern))) ** 2
+
+            score = 0.5 * spelling_score + 0.5 * phonetic_score
+            if score > 0 and (best is None or score > best[0]):
+                best = (score, word)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[span] = best
+        return best
+
+    def match(self, candidates):
+        """
+        Score transcripts against all wake words in one pass.
+
+        Args:
+            candidates (str | list): A transcript, or a list of n-best hypotheses / segment texts.
+                Items may be (text, weight) pairs, where weight in [0, 1] is the
+                recognizer's confidence in that hypothesis.
+
+        Returns:
+            WakeMatch: Best match across all candidates, or None if nothing scored
+        """
+        if isinstance(candidates, str):
+            candidates = [candidates]
+
+        best = None
+        for index, candidate in enumerate(candidates):
+            text, weight = candidate if isinstance(candidate, tuple) else (candidate, 1.0)
+            if not text:
+                continue
+            tokens = TOKEN_PATTERN.findall(text.lower())
+
+            for start in range(len(tokens)):
+                # One extra token lets "se rina" style splits join back up
+                for n in range(1, min(self.max_tokens + 1, len(tokens) - start) + 1):
+                    span = "".join(tokens[start:start + n])
+                    scored = self._score_span(span)
+                    if scored is None:
+                        continue
+                    score, word = scored
+                    if word.n_tokens != n and score < 1.0:
+                        # Only exact hits may bridge a different number of words
+                        score *= 0.9
+                    score *= weight
+                    if best is None or score > best.score:
+                        best = WakeMatch(word.wake_word, word.alias, " ".join(tokens[start:start + n]), score, index)
+                    if best.score >= 1.0:
+                        return best
+        return best
+
+    def score(self, candidates):
+        """Best match score in [0, 1] for the given transcript(s)."""
+        match = self.match(candidates)
+        return match.score if match else 0.0
@@ -0,0 +1,239 @@
+"""
+Wake-word verification by scoring the wake word against the audio.
+
+Transcribing a wake window decodes every word of whatever was said, and
+string matching then throws most of it away. The verifier instead encodes
+the window once with Whisper's audio encoder and runs the decoder
+teacher-forced over a few short candidate prefixes ("Serina", "Hey Sarina",
+...), all in one batch: the cost is one encoder pass plus one decoder pass
+over a dozen tokens, however much background chatter the window holds.
+
+Each candidate's mean token log probability given the audio is compared
+with the same candidate given a silent window. The difference (a per-token
+log-likelihood ratio) removes the decoder's language-model prior, and a
+logistic calibration turns the best ratio into a probability that the
+wake word was said. Fit the calibration on a recorded corpus with
+benchmarks/bench_wake_verify.py --calibrate.
+
+Scoring runs on the model wake windows are already transcribed with: in an
+ASR worker process when "asr_workers" is set, otherwise on the in-process
+scheduler's thread between batches. Only the PyTorch engine exposes decoder
+logits, so with another "asr_backend" a PyTorch copy of the model is loaded
+next to it, once, where the scoring runs.
+"""
+import math
+import threading
+import time
+
+from asr_backends import WhisperBackend, create_backend
+from asr_scheduler import get_scheduler
+from asr_workers import get_worker_pool
+from json_handle import read_settings
+
+# Whisper often hears a lead-in before the name; these are scored as part of the candidate
+WAKE_PREFIXES = ("", "Hey ", "Hi ", "Okay ", "OK ")
+
+
+class WakeScore:
+    __slots__ = ("confidence", "phrase", "llr", "seconds")
+
+    def __init__(self, confidence, phrase, llr, seconds):
+        """
+        Result of one verification.
+
+        Args:
+            confidence (float): Calibrated probability that the wake word was said
+            phrase (str): Best-scoring candidate, e.g. "Hey Serina"
+            llr (float): Its per-token log-likelihood ratio against silence (nats)
+            seconds (float): Time spent scoring
+        """
+        self.confidence = confidence
+        self.phrase = phrase
+        self.llr = llr
+        self.seconds = seconds
+
+
+class WakeScorer:
+    def __init__(self, backend, phrases):
+        """
+        Teacher-forced scoring of wake-word phrases on a loaded PyTorch Whisper model.
+
+        Not thread-safe: use it only from the thread that owns the model (the
+        scheduler thread, or an ASR worker process), so it never runs while the
+        same model is decoding.
+
+        Args:
+            backend (ASRBackend): Loaded backend; anything but WhisperBackend gets a PyTorch copy
+            phrases (tuple): Candidate phrases, e.g. ("Serina", "Hey Serina", ...)
+        """
+        import torch
+        import whisper
+
+        if not isinstance(backend, WhisperBackend):
+            backend = _torch_backend(backend.model_name)
+        self.torch = torch
+        self.whisper = whisper
+        self.backend = backend
+        self.model = backend.model
+        self.phrases = list(phrases)
+        # Per-language token batches and silence baselines, built on first use
+        self._candidates = {}
+
+    def _prepare(self, language):
+        """Candidate token batch and silence baseline for one decoding language."""
+        torch = self.torch
+        tokenizer = self.whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual, num_languages=self.model.num_languages,
+            language=language if self.model.is_multilingual else None, task="transcribe"
+        )
+        prompt = list(tokenizer.sot_sequence_including_notimestamps)
+        sequences = [tokenizer.encode(" " + phrase) for phrase in self.phrases]
+
+        width = len(prompt) + max(len(sequence) for sequence in sequences)
+        tokens = torch.full((len(sequences), width), tokenizer.eot, dtype=torch.long)
+        # Logits at position i predict token i + 1, so each target is read one step earlier
+        mask = torch.zeros((len(sequences), width - 1))
+        for row, sequence in enumerate(sequences):
+            tokens[row, :len(prompt) + len(sequence)] = torch.tensor(prompt + sequence)
+            mask[row, len(prompt) - 1:len(prompt) - 1 + len(sequence)] = 1.0
+
+        candidates = {"tokens": tokens.to(self.model.device), "mask": mask.to(self.model.device)}
+        silence = self._log_likelihoods(torch.zeros(self.whisper.audio.N_SAMPLES), candidates)
+        candidates["silence"] = silence
+        return candidates
+
+    def _log_likelihoods(self, samples, candidates):
+        """Mean token log probability of every candidate given one audio window."""
+        torch = self.torch
+        whisper = self.whisper
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), n_mels=self.model.dims.n_mels)
+        mel = mel.to(self.model.device)
+        if self.backend.fp16:
+            mel = mel.half()
+
+        tokens, mask = candidates["tokens"], candidates["mask"]
+        with torch.no_grad():
+            audio_features = self.model.embed_audio(mel.unsqueeze(0))
+            logits = self.model.logits(tokens, audio_features.expand(len(tokens), -1, -1))
+            log_probs = torch.log_softmax(logits[:, :-1].float(), dim=-1)
+            token_log_probs = log_probs.gather(-1, tokens[:, 1:].unsqueeze(-1)).squeeze(-1)
+        return (token_log_probs * mask).sum(dim=1) / mask.sum(dim=1)
+
+    def score(self, samples, language):
+        """
+        Best candidate for one wake window.
+
+        Args:
+            samples (np.ndarray): 16 kHz mono float32 audio, at most 30 s
+            language (str): Whisper language code for the decoder prompt
+
+        Returns:
+            tuple: (best phrase, its per-token log-likelihood ratio against silence)
+        """
+        if language not in self._candidates:
+            self._candidates[language] = self._prepare(language)
+        candidates = self._candidates[language]
+        scores = self._log_likelihoods(self.torch.from_numpy(samples), candidates) - candidates["silence"]
+        best = int(scores.argmax())
+        return self.phrases[best], float(scores[best])
+
+
+# PyTorch models loaded for scoring next to a backend without logits, per model name
+_torch_backends = {}
+# Scorers per (backend, phrases), living in whichever process owns the backend
+_scorers = {}
+
+
+def _torch_backend(model):
+    if model not in _torch_backends:
+        print(f"ℹ️ Wake-word scoring needs decoder logits, loading PyTorch Whisper '{model}' next to the ASR backend")
+        _torch_backends[model] = create_backend(model, backend="whisper", beam_size=1)
+    return _torch_backends[model]
+
+
+def score_wake_phrases(backend, samples, phrases, language):
+    """
+    Score a wake window on an already loaded backend, reusing its scorer between calls.
+
+    Called on the thread that owns the backend: the scheduler thread or an ASR worker.
+
+    Returns:
+        tuple: (best phrase, per-token log-likelihood ratio)
+    """
+    key = (id(backend), phrases)
+    if key not in _scorers:
+        _scorers[key] = WakeScorer(backend, phrases)
+    return _scorers[key].score(samples, language)
+
+
+class WakeWordVerifier:
+    def __init__(self, wake_words, model="tiny", calibration=None, prefixes=WAKE_PREFIXES):
+        """
+        Wake-word candidates and calibration; the scoring runs on the shared ASR model.
+
+        Args:
+            wake_words (dict | list): Wake words, or {wake_word: [aliases]} as in settings.json
+            model (str): Whisper model used for scoring, the one wake windows are transcribed with
+            calibration (list): [scale, offset] of the logistic calibration,
+                defaults to "wake_verify_calibration" in settings.json
+            prefixes (tuple): Lead-ins scored in front of every wake word
+        """
+        self.model = model
+        if isinstance(wake_words, dict):
+            words = [word for wake_word, aliases in wake_words.items() for word in [wake_word, *aliases]]
+        else:
+            words = list(wake_words)
+        names = list(dict.fromkeys(word.strip().title() for word in words if word.strip()))
+        self.phrases = tuple(f"{prefix}{name}" for name in names for prefix in prefixes)
+
+        self.scale, self.offset = calibration or read_settings("wake_verify_calibration")
+        self.use_workers = bool(read_settings("asr_workers"))
+
+    def calibrate(self, llr):
+        """Map a per-token log-likelihood ratio to a probability."""
+        return 1.0 / (1.0 + math.exp(-self.scale * (llr - self.offset)))
+
+    def verify(self, samples, language=None):
+        """
+        Score a wake window against every wake-word candidate.
+
+        Args:
+            samples (np.ndarray): 16 kHz mono float32 audio, at most 30 s
+            language (str): Whisper language code for the decoder prompt, None means English
+
+        Returns:
+            WakeScore: Calibrated confidence and the best candidate
+        """
+        language = language or "en"
+        start = time.perf_counter()
+        if self.use_workers:
+            future = get_worker_pool(self.model).score_wake(samples, self.phrases, language)
+        else:
+            phrases = self.phrases
+            future = get_scheduler(self.model).run(
+                lambda backend: score_wake_phrases(backend, samples, phrases, language)
+            )
+        phrase, llr = future.result()
+        return WakeScore(self.calibrate(llr), phrase, llr, time.perf_counter() - start)
+
+
+_verifiers = {}
+_verifiers_lock = threading.Lock()
+
+
+def get_wake_verifier(wake_words, model="tiny"):
+    """
+    Shared verifier for a set of wake words.
+
+    Args:
+        wake_words (dict): {wake_word: [aliases]}
+        model (str): Whisper model name
+
+    Returns:
+        WakeWordVerifier: One verifier per model and wake-word set per process
+    """
+    key = (model, tuple(sorted((word, tuple(aliases)) for word, aliases in wake_words.items())))
+    with _verifiers_lock:
+        if key not in _verifiers:
+            _verifiers[key] = WakeWordVerifier(wake_words, model=model)
+        return _verifiers[key]